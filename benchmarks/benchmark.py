@@ -0,0 +1,209 @@
+"""
+benchmark.py : Time the simulation hot path and compare the timings against
+stored baselines.
+
+Usage (from the repository root):
+    python -m benchmarks.benchmark                 # run and compare
+    python -m benchmarks.benchmark --save          # store new baselines
+    python -m benchmarks.benchmark -k simulate     # run matching cases only
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+from drone.studies.design.study import PIDController
+from drone.studies.simulation.study import NonSymmetricQuadrotor
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'baselines.json'
+
+# A case regresses when it is this many times slower than its baseline
+DEFAULT_THRESHOLD = 1.5
+
+def make_quadrotor() -> NonSymmetricQuadrotor:
+    """
+    Build the example asymmetric airframe of the design study.
+    """
+
+    masses_positions = [
+        (1.0, np.array([0, 0, 0])),
+        (0.1, np.array([0.15, 0, 0])),
+        (0.1, np.array([-0.15, 0, 0])),
+        (0.1, np.array([0, 0.2, 0])),
+        (0.1, np.array([0, -0.2, 0]))
+    ]
+
+    return NonSymmetricQuadrotor(
+        rotor_positions=np.array([
+            [0.15, 0, 0],
+            [-0.15, 0, 0],
+            [0, 0.2, 0],
+            [0, -0.2, 0]
+        ]),
+        kf=np.array([3e-6, 3.1e-6, 2.9e-6, 3e-6]),
+        km=np.array([1e-7, 1.05e-7, 0.95e-7, 1e-7]),
+        masses_positions=masses_positions,
+        I_body=np.diag([0.005, 0.005, 0.009]),
+        Cd=np.diag([0.1, 0.1, 0.2]),
+        Ctau=np.diag([0.01, 0.01, 0.02]),
+        rotor_dirs=np.array([1, 1, -1, -1])
+    )
+
+def get_cases() -> dict:
+    """
+    Get the benchmark cases as a mapping of name -> zero-argument callable.
+    """
+
+    quad = make_quadrotor()
+    rng = np.random.default_rng(0)
+
+    x = np.zeros(12)
+    x[6:12] = [0.1, -0.2, 0.3, 0.5, -0.4, 0.1]
+    omega = np.array([600.0, 610.0, 590.0, 605.0])
+    setpoint = np.array([0, 0, 1, 0, 0, 0])
+
+    # Softer attitude gains keep the closed loop non-stiff, so the timings
+    # measure per-step overhead rather than step size control
+    pid = PIDController(quad, kp_ang=[20.0, 20.0, 10.0], kd_ang=[2.0, 2.0, 1.0])
+
+    def pid_omega(t, x):
+        return pid.control(t, x, setpoint)
+
+    cases = {
+        'dynamics': lambda: quad.dynamics(0.0, x, omega),
+        'rotation_matrix': lambda: quad.rotation_matrix(0.1, -0.2, 0.3),
+        'W_matrix': lambda: quad.W_matrix(0.1, -0.2),
+        'jacobian': lambda: quad.jacobian(0.0, x, omega),
+        'pid_control': lambda: pid.control(0.0, x, setpoint)
+    }
+
+    for n in (100, 10000):
+        X = rng.normal(scale=0.3, size=(n, 12))
+        Omega = rng.uniform(500.0, 700.0, size=(n, 4))
+        cases[f'dynamics_batch[N={n}]'] = (
+            lambda X=X, Omega=Omega: quad.dynamics_batch(0.0, X, Omega)
+        )
+
+    for horizon in (1.0, 5.0):
+        t_eval = np.linspace(0, horizon, 101)
+        cases[f'simulate_rk45_pid[T={horizon:g}]'] = (
+            lambda horizon=horizon, t_eval=t_eval: quad.simulate(
+                pid_omega, np.zeros(12), (0, horizon), t_eval
+            )
+        )
+        cases[f'simulate_rk4_pid[T={horizon:g}]'] = (
+            lambda horizon=horizon, t_eval=t_eval: quad.simulate(
+                pid_omega, np.zeros(12), (0, horizon), t_eval, integrator='rk4_fixed', dt=2e-3
+            )
+        )
+
+    hover = np.sqrt(quad.m * 9.81 / np.sum(quad.kf))
+    for n in (10, 1000):
+        X0 = np.zeros((n, 12))
+        X0[:, 9:12] = rng.normal(scale=0.1, size=(n, 3))
+        kf = quad.kf * rng.uniform(0.95, 1.05, size=(n, 4))
+        cases[f'simulate_ensemble_rk4[N={n}]'] = (
+            lambda X0=X0, kf=kf: quad.simulate_ensemble(
+                lambda t, X: np.full((len(X), 4), hover), X0, (0, 1.0),
+                np.linspace(0, 1.0, 101), integrator='rk4_fixed', dt=2e-3, kf=kf
+            )
+        )
+
+    return cases
+
+def time_case(
+    func,
+    repeat: int = 5,
+    min_time: float = 0.2
+) -> float:
+    """
+    Get the best time per call in seconds over several repeats.
+    """
+
+    timer = timeit.Timer(func)
+    number, total = timer.autorange()
+
+    # Scale the loop count so every repeat lasts at least min_time
+    if total < min_time:
+        number = max(int(number * min_time / max(total, 1e-9)), 1)
+
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def compare(
+    timings: dict,
+    baselines: dict,
+    threshold: float
+) -> list:
+    """
+    Get the names of the cases slower than threshold times their baseline.
+    """
+
+    return [
+        name for name, seconds in timings.items()
+        if name in baselines and seconds > threshold * baselines[name]
+    ]
+
+def main() -> int:
+    """
+    Run the benchmarks and report regressions.
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark the simulation hot path."
+    )
+    parser.add_argument('-k', type=str, default='',
+        help="Only run cases whose name contains this string.")
+    parser.add_argument('--save', action='store_true',
+        help="Store the timings as the new baselines.")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+        help="Slowdown factor that counts as a regression.")
+    parser.add_argument('--repeat', type=int, default=5,
+        help="Number of timing repeats per case.")
+    args = parser.parse_args()
+
+    baselines = {}
+    if BASELINE_PATH.exists():
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            baselines = json.load(f)
+
+    timings = {}
+    for name, func in get_cases().items():
+        if args.k not in name:
+            continue
+
+        timings[name] = time_case(
+            func=func,
+            repeat=args.repeat
+        )
+
+        ratio = ''
+        if name in baselines:
+            ratio = f'{timings[name] / baselines[name]:6.2f}x baseline'
+
+        print(f'{name:36s} {timings[name] * 1e6:14.2f} us  {ratio}')
+
+    if args.save:
+        baselines.update(timings)
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=4, sort_keys=True)
+        print(f'\nBaselines saved to {BASELINE_PATH}')
+        return 0
+
+    regressions = compare(
+        timings=timings,
+        baselines=baselines,
+        threshold=args.threshold
+    )
+
+    if regressions:
+        print(f'\nRegressions (> {args.threshold}x baseline): ' + ', '.join(regressions))
+        return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
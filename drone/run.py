@@ -1,19 +1,15 @@
 """
 run.py : Run a simulation for the quad rotor model of a drone or design
 a quad rotor drone based on the model and its parameters.
+
+The study modules, and scipy with them, are imported by the workflow that
+needs them, so parsing arguments and starting sweep workers stays cheap.
 """
 
 import sys
 import argparse
 from pathlib import Path
-from drone.studies.simulation.study import (
-    NonSymmetricQuadrotor
-)
-from drone.studies.design.study import (
-    PIDController
-)
 from drone.utils import loaders
-from drone.utils import plotters
 from drone.utils import timers
 
 def get_config_path() -> Path:
@@ -50,72 +46,115 @@ def get_config() -> dict:
 
     return config
 
-def get_simulation_study(
+def run_simulation(
     config:dict
-):
+) -> tuple:
     """
-    Get the simulation study.
+    Run a simulation of the configured airframe and controller and write
+    its outputs. Returns the results, the experimental data, the compute
+    time of every stage and the solver flags.
     """
 
-    workflow = config['workflow']
+    from drone.studies.simulation import workflow
 
-    if workflow == 'simulation':
-        log_path = loaders.get_log_file_path(
-            file_name='simulation.log',
-            config=config
-        )
-
-        timers.start_logging(
-            log_path=log_path,
-            purpose='running a simulation'
-        )
-
-        warning = True
+    log_path = loaders.get_log_file_path(
+        file_name='simulation.log',
+        config=config
+    )
 
-    else:
-        log_path = None
-        warning = False
+    timers.start_logging(
+        log_path=log_path,
+        purpose='running a simulation',
+        buffered=True
+    )
 
-    study = NonSymmetricQuadrotor()
+    try:
+        return workflow.run_simulation(
+            config=config,
+            log_path=log_path
+        )
 
-    return study
+    finally:
+        loaders.close_log(
+            log_file_path=log_path
+        )
 
-def run_simulation(
+def run_sweep(
     config:dict
 ) -> tuple:
     """
-    Run a simulation.
+    Run a parallel sweep over a grid of simulation scenarios.
     """
 
-    study = get_simulation_study(
+    from drone.studies.simulation import sweep
+
+    log_path = loaders.get_log_file_path(
+        file_name='sweep.log',
         config=config
     )
 
-    return study.__execute__()
-
-def get_design_study(
-    config:dict
-):
-    """
-    Get the design study.
-    """
+    timers.start_logging(
+        log_path=log_path,
+        purpose='running a simulation sweep',
+        buffered=True,
+        background=True
+    )
 
-    study = PIDController()
+    try:
+        return sweep.run_sweep(
+            config=config,
+            log_path=log_path
+        )
 
-    return study
+    finally:
+        loaders.close_log(
+            log_file_path=log_path
+        )
 
 def run_estimation(
     config:dict
 ) -> tuple:
     """
-    Run a model parameter estimation workflow.
+    Run a model parameter estimation workflow, identifying the airframe
+    of the simulation config from recorded flights.
     """
 
-    study = get_design_study(
+    from drone.studies.estimation import identification
+
+    log_path = loaders.get_log_file_path(
+        file_name='estimation.log',
         config=config
     )
 
-    return study.__execute__()
+    timers.start_logging(
+        log_path=log_path,
+        purpose='running a parameter estimation',
+        buffered=True
+    )
+
+    # Every generation appends a record to the metrics file, which stays
+    # open for the whole search
+    metrics_path = timers.get_metrics_path(
+        log_path=log_path
+    )
+
+    loaders.open_log(
+        log_file_path=metrics_path
+    )
+
+    try:
+        return identification.run_estimation(
+            config=config,
+            log_path=log_path
+        )
+
+    finally:
+        loaders.close_log(
+            log_file_path=log_path
+        )
+        loaders.close_log(
+            log_file_path=metrics_path
+        )
 
 def main(
     config:dict
@@ -146,8 +185,18 @@ def main(
                 config=config
             )
 
+    elif workflow == 'sweep':
+        loaders.create_directory_with_config(
+            config=config
+        )
+
+        results, compute_times \
+            = run_sweep(
+                config=config
+            )
+
     else:
-        print("Please select a workflow: simulation or estimation.")
+        print("Please select a workflow: simulation, sweep or estimation.")
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -1,20 +1,52 @@
-import matplotlib.pyplot as plt
 import numpy as np
 
-from drone.studies.simulation.study import NonSymmetricQuadrotor
-
 # PID controller for altitude + attitude hover
 class PIDController:
-    def __init__(self):
-        self.kp_pos = np.array([1.0, 1.0, 15.0])
-        self.kd_pos = np.array([2.0, 2.0, 7.0])
-        self.kp_ang = np.array([200.0, 200.0, 100.0])
-        self.kd_ang = np.array([20.0, 20.0, 10.0])
+    def __init__(self, quad, kp_pos=None, kd_pos=None, kp_ang=None, kd_ang=None):
+        """
+        Parameters:
+        quad: NonSymmetricQuadrotor the controller allocates rotor speeds for
+        kp_pos, kd_pos: (3,) position gains
+        kp_ang, kd_ang: (3,) attitude gains
+        """
+        self.quad = quad
+        self.kp_pos = np.array(kp_pos) if kp_pos is not None else np.array([1.0, 1.0, 15.0])
+        self.kd_pos = np.array(kd_pos) if kd_pos is not None else np.array([2.0, 2.0, 7.0])
+        self.kp_ang = np.array(kp_ang) if kp_ang is not None else np.array([200.0, 200.0, 100.0])
+        self.kd_ang = np.array(kd_ang) if kd_ang is not None else np.array([20.0, 20.0, 10.0])
         self.integral_error_pos = np.zeros(3)
         self.integral_error_ang = np.zeros(3)
         self.last_error_pos = None
         self.last_error_ang = None
 
+        # Control allocation, built once per airframe
+        self.update_allocation()
+
+    @classmethod
+    def from_config(cls, quad, controller):
+        """
+        quad: NonSymmetricQuadrotor
+        controller: validated ControllerConfig
+        """
+        return cls(quad, controller.kp_pos, controller.kd_pos, controller.kp_ang, controller.kd_ang)
+
+    def update_allocation(self):
+        # Rebuild the allocation matrix and its pseudo-inverse, call again
+        # after changing the quadrotor's kf, km or rotor geometry
+        quad = self.quad
+        Lx = quad.r_pos_rel[:, 0]
+        Ly = quad.r_pos_rel[:, 1]
+
+        # Allocation matrix B:
+        B = np.zeros((4,4))
+        B[0,:] = quad.kf  # thrust
+        B[1,:] = quad.kf * Ly  # tau_phi
+        B[2,:] = -quad.kf * Lx # tau_theta
+        B[3,:] = quad.km * quad.rotor_dirs  # tau_psi
+
+        self.B = B
+        self.B_pinv = np.linalg.pinv(B)
+
     def control(self, t, x, setpoint):
         p = x[0:3]
         v = x[3:6]
@@ -43,84 +75,82 @@ class PIDController:
         tau_des = self.kp_ang * error_ang + self.kd_ang * error_omega
 
         # Compute rotor speeds from thrust and torque demands
-        # Build control allocation matrix
-        l = np.array([np.linalg.norm(r[:2]) for r in quad.r_pos_rel])
-        Lx = np.array([r[0] for r in quad.r_pos_rel])
-        Ly = np.array([r[1] for r in quad.r_pos_rel])
-
-        # Allocation matrix B:
-        B = np.zeros((4,4))
-        B[0,:] = quad.kf  # thrust
-        B[1,:] = quad.kf * Ly  # tau_phi
-        B[2,:] = -quad.kf * Lx # tau_theta
-        B[3,:] = quad.km * quad.rotor_dirs  # tau_psi
-
         # Desired forces and moments vector
         force_moments = np.array([
-            thrust_des[2] * quad.m,  # total thrust (z axis)
+            thrust_des[2] * self.quad.m,  # total thrust (z axis)
             tau_des[0],
             tau_des[1],
             tau_des[2]
         ])
 
         # Solve for rotor thrust squares
-        omega_squared = np.linalg.pinv(B) @ force_moments
+        omega_squared = self.B_pinv @ force_moments
         omega_squared = np.clip(omega_squared, 0, None)  # no negative thrust
 
         omega = np.sqrt(omega_squared)
         return omega
 
-# Define mass distribution (example)
-masses_positions = [
-    (1.0, np.array([0, 0, 0])),       # body mass at center
-    (0.1, np.array([0.15, 0, 0])),    # right arm
-    (0.1, np.array([-0.15, 0, 0])),   # left arm
-    (0.1, np.array([0, 0.2, 0])),     # front arm
-    (0.1, np.array([0, -0.2, 0]))     # rear arm
-]
-
-# Rotor positions
-rotor_positions = np.array([
-    [0.15, 0, 0],
-    [-0.15, 0, 0],
-    [0, 0.2, 0],
-    [0, -0.2, 0]
-])
-
-# Motor parameters
-kf = np.array([3e-6, 3.1e-6, 2.9e-6, 3e-6])
-km = np.array([1e-7, 1.05e-7, 0.95e-7, 1e-7])
-rotor_dirs = np.array([1, -1, 1, -1])
-
-# Body inertia (assumed diagonal here)
-I_body = np.diag([0.005, 0.005, 0.009])
-
-# Drag matrices
-Cd = np.diag([0.1, 0.1, 0.2])
-Ctau = np.diag([0.01, 0.01, 0.02])
-
-# Initialize quadrotor
-quad = NonSymmetricQuadrotor(rotor_positions, kf, km, masses_positions, I_body, Cd, Ctau, rotor_dirs)
-
-# Initial state (hover at origin)
-x0 = np.zeros(12)
-t_span = (0, 5)
-t_eval = np.linspace(*t_span, 500)
-
-# Controller instance
-pid = PIDController()
-
-def omega_func(t, x):
-    return pid.control(t, x, np.array([0,0,1,0,0,0]))
-
-# Simulate
-sol = quad.simulate(omega_func, x0, t_span, t_eval)
-
-# Plot altitude over time
-import matplotlib.pyplot as plt
-plt.plot(sol.t, sol.y[2])
-plt.xlabel('Time (s)')
-plt.ylabel('Altitude (m)')
-plt.title('Hover altitude of non-symmetric quadrotor')
-plt.grid()
-plt.show()
\ No newline at end of file
+def main():
+    # Demo: hover an example asymmetric airframe and plot its altitude
+    import matplotlib.pyplot as plt
+
+    from drone.studies.simulation.study import NonSymmetricQuadrotor
+
+    # Define mass distribution (example)
+    masses_positions = [
+        (1.0, np.array([0, 0, 0])),       # body mass at center
+        (0.1, np.array([0.15, 0, 0])),    # right arm
+        (0.1, np.array([-0.15, 0, 0])),   # left arm
+        (0.1, np.array([0, 0.2, 0])),     # front arm
+        (0.1, np.array([0, -0.2, 0]))     # rear arm
+    ]
+
+    # Rotor positions
+    rotor_positions = np.array([
+        [0.15, 0, 0],
+        [-0.15, 0, 0],
+        [0, 0.2, 0],
+        [0, -0.2, 0]
+    ])
+
+    # Motor parameters
+    kf = np.array([3e-6, 3.1e-6, 2.9e-6, 3e-6])
+    km = np.array([1e-7, 1.05e-7, 0.95e-7, 1e-7])
+    # Rotors 1-2 and 3-4 sit on opposite arms and must share a spin
+    # direction, otherwise the yaw allocation saturates and the loop diverges
+    rotor_dirs = np.array([1, 1, -1, -1])
+
+    # Body inertia (assumed diagonal here)
+    I_body = np.diag([0.005, 0.005, 0.009])
+
+    # Drag matrices
+    Cd = np.diag([0.1, 0.1, 0.2])
+    Ctau = np.diag([0.01, 0.01, 0.02])
+
+    # Initialize quadrotor
+    quad = NonSymmetricQuadrotor(rotor_positions, kf, km, masses_positions, I_body, Cd, Ctau, rotor_dirs)
+
+    # Initial state (hover at origin)
+    x0 = np.zeros(12)
+    t_span = (0, 5)
+    t_eval = np.linspace(*t_span, 500)
+
+    # Controller instance
+    pid = PIDController(quad)
+
+    def omega_func(t, x):
+        return pid.control(t, x, np.array([0,0,1,0,0,0]))
+
+    # Simulate
+    sol = quad.simulate(omega_func, x0, t_span, t_eval)
+
+    # Plot altitude over time
+    plt.plot(sol.t, sol.y[2])
+    plt.xlabel('Time (s)')
+    plt.ylabel('Altitude (m)')
+    plt.title('Hover altitude of non-symmetric quadrotor')
+    plt.grid()
+    plt.show()
+
+if __name__ == "__main__":
+    main()
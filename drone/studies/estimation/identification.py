@@ -0,0 +1,505 @@
+"""
+identification.py : Identify the thrust and moment coefficients, drag
+matrices and body inertia of an airframe from recorded flights with a
+population-based direct search whose candidates are evaluated in
+parallel across worker processes.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from drone.studies.simulation.study import NonSymmetricQuadrotor
+from drone.utils import loaders
+from drone.utils import schema
+from drone.utils import timers
+
+# State rows whose derivatives depend on the identified parameters, the
+# translational and rotational accelerations
+FITTED_ROWS = np.r_[3:6, 9:12]
+FITTED_LABELS = ('ax', 'ay', 'az', 'p_dot', 'q_dot', 'r_dot')
+
+# Values identified per parameter, the drag matrices and the body inertia
+# by their diagonals
+PARAMETER_SIZES = {
+    'kf': 4,
+    'km': 4,
+    'Cd': 3,
+    'Ctau': 3,
+    'I_body': 3
+}
+
+class EquationErrorProblem:
+    """
+    Equation-error fit of the quadrotor dynamics to recorded flights. The
+    accelerations of the model at the recorded states and rotor speeds
+    are compared with the derivatives of the recorded velocities and body
+    rates, so a candidate costs a few matrix products over all samples
+    instead of a simulation. A candidate holds the log of the factors
+    between the identified values and their nominal ones.
+    The derivatives are finite differences of the samples, so the logs
+    must resolve the attitude loop. The thrust is fixed by the mass, but
+    the yaw axis only sees km and the yaw drag relative to the yaw
+    inertia; identify at most two of the three.
+    """
+
+    def __init__(
+        self,
+        quad: NonSymmetricQuadrotor,
+        flights: list,
+        parameters: tuple
+    ) -> None:
+        """
+        Stack the samples of all flights and the nominal values of the
+        identified parameters.
+        """
+
+        self.quad = quad
+        self.parameters = tuple(parameters)
+
+        self.layout = {}
+        n_dims = 0
+        for name in self.parameters:
+            self.layout[name] = slice(n_dims, n_dims + PARAMETER_SIZES[name])
+            n_dims += PARAMETER_SIZES[name]
+
+        self.n_dims = n_dims
+
+        self.nominal = np.concatenate([
+            self._get_nominal(name=name) for name in self.parameters
+        ])
+
+        if np.any(self.nominal <= 0):
+            raise schema.ConfigError(
+                'estimation.parameters: identified values need a positive '
+                'nominal value in the airframe.'
+            )
+
+        states, rotor_speeds, targets = [], [], []
+        for flight in flights:
+            y = np.asarray(flight.y, dtype=float)
+
+            states.append(y.T)
+            rotor_speeds.append(np.asarray(flight.rotor_speeds, dtype=float).T)
+            targets.append(np.gradient(y[FITTED_ROWS], flight.t, axis=1).T)
+
+        X = np.concatenate(states)
+        phi, theta = X[:, 6], X[:, 7]
+        psi = X[:, 8]
+
+        # Everything but the parameters is fixed by the recorded samples: the
+        # thrust axis, the third column of R, and the squared rotor speeds
+        self.thrust_axis = np.stack([
+            np.cos(phi) * np.sin(theta) * np.cos(psi) + np.sin(phi) * np.sin(psi),
+            np.cos(phi) * np.sin(theta) * np.sin(psi) - np.sin(phi) * np.cos(psi),
+            np.cos(phi) * np.cos(theta)
+        ], axis=1)
+        self.omega2 = np.concatenate(rotor_speeds)**2
+        self.v = np.ascontiguousarray(X[:, 3:6])
+        self.omega_body = np.ascontiguousarray(X[:, 9:12])
+        self.target = np.ascontiguousarray(np.concatenate(targets))
+
+        # Squared errors are relative to the spread of each channel
+        self.scale = np.maximum(np.var(self.target, axis=0), 1e-12)
+
+        # Inertia of the point masses, fixed by the mass distribution
+        self.I_point = quad.I - quad.I_body
+
+        return None
+
+    def _get_nominal(
+        self,
+        name: str
+    ) -> np.ndarray:
+        """
+        Nominal values of a parameter in the airframe.
+        """
+
+        value = np.asarray(getattr(self.quad, name), dtype=float)
+
+        return np.diag(value) if value.ndim == 2 else value
+
+    @property
+    def n_samples(self) -> int:
+        return len(self.target)
+
+    def values(
+        self,
+        theta: np.ndarray
+    ) -> dict:
+        """
+        Airframe values of a candidate, with the drag matrices and body
+        inertia keeping the nominal off-diagonal entries.
+        """
+
+        scaled = self.nominal * np.exp(theta)
+
+        values = {}
+        for name in PARAMETER_SIZES:
+            nominal = np.asarray(getattr(self.quad, name), dtype=float)
+
+            if name not in self.layout:
+                values[name] = nominal
+                continue
+
+            value = scaled[self.layout[name]]
+
+            if nominal.ndim == 2:
+                value = nominal.copy()
+                np.fill_diagonal(value, scaled[self.layout[name]])
+
+            values[name] = value
+
+        return values
+
+    def candidate(
+        self,
+        values: dict
+    ) -> np.ndarray:
+        """
+        Candidate of a set of airframe values, e.g. a historical parameter
+        set. Parameters the set does not hold keep their nominal values.
+        """
+
+        theta = np.zeros(self.n_dims)
+
+        for name, rows in self.layout.items():
+            if values.get(name) is None:
+                continue
+
+            value = np.asarray(values[name], dtype=float)
+            if value.ndim == 2:
+                value = np.diag(value)
+
+            theta[rows] = np.log(value / self.nominal[rows])
+
+        return theta
+
+    def errors(
+        self,
+        theta: np.ndarray
+    ) -> np.ndarray:
+        """
+        Normalized mean squared equation error of each fitted channel.
+        """
+
+        values = self.values(
+            theta=theta
+        )
+
+        m = self.quad.m
+        I = self.I_point + values['I_body']
+
+        torque_mixer = self.quad.torque_arm_matrix * values['kf']
+        torque_mixer[2] = self.quad.rotor_dirs * values['km']
+
+        # The accelerations of batch_dynamics, with the parameter-free
+        # factors precomputed
+        dXdt = np.empty_like(self.target)
+        dXdt[:, 0:3] = (self.thrust_axis * (self.omega2 @ values['kf'])[:, None] - self.v @ values['Cd'].T) / m
+        dXdt[:, 2] -= 9.81
+
+        omega_body = self.omega_body
+        rhs = self.omega2 @ torque_mixer.T - np.cross(omega_body, omega_body @ I.T) - omega_body @ values['Ctau'].T
+        dXdt[:, 3:6] = rhs @ np.linalg.inv(I).T
+
+        residual = dXdt - self.target
+
+        return np.mean(residual**2, axis=0) / self.scale
+
+    def errors_block(
+        self,
+        thetas: np.ndarray
+    ) -> np.ndarray:
+        """
+        Errors of a block of candidates, one row each.
+        """
+
+        return np.array([self.errors(theta=theta) for theta in thetas]).reshape(-1, len(FITTED_ROWS))
+
+    def quadrotor(
+        self,
+        theta: np.ndarray
+    ) -> NonSymmetricQuadrotor:
+        """
+        Quadrotor with the values of a candidate.
+        """
+
+        values = self.values(
+            theta=theta
+        )
+
+        return NonSymmetricQuadrotor(
+            self.quad.r_pos, values['kf'], values['km'], self.quad.masses_positions,
+            values['I_body'], values['Cd'], values['Ctau'], self.quad.rotor_dirs
+        )
+
+# Problem of a worker process, installed once when the worker starts
+_PROBLEM = None
+
+def _install_problem(
+    problem: EquationErrorProblem
+) -> None:
+    """
+    Keep the problem in the worker, so each generation only sends the
+    candidates.
+    """
+
+    global _PROBLEM
+    _PROBLEM = problem
+
+    return None
+
+def _evaluate_block(
+    thetas: np.ndarray
+) -> np.ndarray:
+    """
+    Evaluate a block of candidates in a worker process.
+    """
+
+    return _PROBLEM.errors_block(
+        thetas=thetas
+    )
+
+def direct_search(
+    problem: EquationErrorProblem,
+    settings: schema.EstimationConfig,
+    initial: np.ndarray = None,
+    executor: ProcessPoolExecutor = None,
+    n_blocks: int = 1,
+    log_path: str = None
+) -> dict:
+    """
+    Minimize the mean equation error with differential evolution
+    (current-to-best/1/bin) over the box of log factors within
+    settings.bounds. The
+    first member starts at the initial candidate, the nominal airframe by
+    default. With an executor the candidates of a generation are split
+    into n_blocks evaluated in parallel. The search stops once the costs
+    of the population agree to the relative tolerance or after
+    n_generations, and every generation is logged.
+    """
+
+    rng = np.random.default_rng(settings.seed)
+    bound = np.log(settings.bounds)
+    n_pop, n_dims = settings.population_size, problem.n_dims
+
+    def evaluate(population: np.ndarray) -> np.ndarray:
+        if executor is None:
+            return problem.errors_block(
+                thetas=population
+            )
+
+        blocks = np.array_split(population, min(n_blocks, len(population)))
+
+        return np.concatenate(list(executor.map(_evaluate_block, blocks)))
+
+    start_time = timers.get_time()
+    generation_time = start_time
+
+    population = rng.uniform(-bound, bound, size=(n_pop, n_dims))
+    if initial is not None:
+        population[0] = np.clip(initial, -bound, bound)
+    else:
+        population[0] = 0.0
+
+    errors = evaluate(population)
+    costs = errors.mean(axis=1)
+
+    history = []
+    generation_times = []
+    converged = False
+
+    # Random keys pick two other members per row, the row itself sorts last
+    keys = np.empty((n_pop, n_pop))
+
+    for n_gen in range(1, settings.n_generations + 1):
+        keys[:] = rng.random((n_pop, n_pop))
+        np.fill_diagonal(keys, np.inf)
+        r1, r2 = np.argsort(keys, axis=1)[:, :2].T
+
+        best = population[np.argmin(costs)]
+        mutants = population + settings.mutation * (best - population + population[r1] - population[r2])
+        np.clip(mutants, -bound, bound, out=mutants)
+
+        # Every trial takes at least one dimension from its mutant
+        cross = rng.random((n_pop, n_dims)) < settings.crossover
+        cross[np.arange(n_pop), rng.integers(n_dims, size=n_pop)] = True
+        trials = np.where(cross, mutants, population)
+
+        trial_errors = evaluate(trials)
+        trial_costs = trial_errors.mean(axis=1)
+
+        better = trial_costs <= costs
+        population[better] = trials[better]
+        errors[better] = trial_errors[better]
+        costs[better] = trial_costs[better]
+
+        history.append(float(costs.min()))
+
+        if log_path is not None:
+            curr_time = timers.update_parameter_estimation_log_direct_search(
+                start_time=generation_time,
+                log_path=log_path,
+                n_gen=n_gen,
+                solution_set=errors,
+                duration=timers.get_duration(
+                    start_time=start_time
+                )
+            )
+
+        else:
+            curr_time = timers.get_time()
+
+        generation_times.append(curr_time - generation_time)
+        generation_time = curr_time
+
+        if np.std(costs) <= settings.tolerance * np.abs(np.mean(costs)):
+            converged = True
+            break
+
+    best = int(np.argmin(costs))
+
+    search = {
+        'theta': population[best].copy(),
+        'cost': float(costs[best]),
+        'errors': errors[best].copy(),
+        'n_generations': len(history),
+        'n_evaluations': n_pop * (len(history) + 1),
+        'converged': converged,
+        'history': history,
+        'generation_times': generation_times
+    }
+
+    return search
+
+def run_estimation(
+    config: dict,
+    log_path: str = None
+) -> tuple:
+    """
+    Identify the parameters of the airframe in the simulation config of
+    an estimation config from its flight logs, starting from the
+    historical parameter set if there is one. The identified values are
+    written to 'identified_parameters.json' in the airframe format, which
+    can serve as the historical parameter set of a later run, and the
+    search to 'summary.json'. Returns the results and compute times.
+    """
+
+    start_time = timers.get_time()
+    compute_times = {}
+
+    simulation_settings = schema.QuadrotorConfig.from_config(
+        config=config['simulation_config']
+    )
+    settings = schema.EstimationConfig.from_config(
+        section=config.get('estimation', {})
+    )
+
+    quad = NonSymmetricQuadrotor.from_config(
+        airframe=simulation_settings.airframe
+    )
+
+    flights = [
+        flight for path in settings.flight_logs
+        for flight in loaders.load_flight_logs(path=path)
+    ]
+
+    problem = EquationErrorProblem(
+        quad=quad,
+        flights=flights,
+        parameters=settings.parameters
+    )
+
+    initial = None
+    if config.get('historical_parameter_set'):
+        initial = problem.candidate(
+            values=config['historical_parameter_set']
+        )
+
+    compute_times['load'] = timers.get_duration(
+        start_time=start_time
+    )
+
+    if log_path is not None:
+        loaders.add_entry_to_log(
+            log_file_path=log_path,
+            entry=f'Fitting {problem.n_dims} values of {", ".join(problem.parameters)} '
+                f'to {problem.n_samples} samples of {len(flights)} flights.\n'
+        )
+
+    n_workers = settings.n_workers or os.cpu_count() or 1
+    search_time = timers.get_time()
+
+    if n_workers == 1:
+        search = direct_search(
+            problem=problem,
+            settings=settings,
+            initial=initial,
+            log_path=log_path
+        )
+
+    else:
+        # Workers receive the samples once, then only candidates
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_install_problem,
+            initargs=(problem,)
+        ) as executor:
+            search = direct_search(
+                problem=problem,
+                settings=settings,
+                initial=initial,
+                executor=executor,
+                n_blocks=n_workers,
+                log_path=log_path
+            )
+
+    compute_times['search'] = timers.get_duration(
+        start_time=search_time
+    )
+    compute_times['generations'] = search['generation_times']
+
+    values = problem.values(
+        theta=search['theta']
+    )
+    parameters = {
+        name: values[name].tolist() for name in problem.parameters
+    }
+    errors = dict(zip(FITTED_LABELS, search['errors'].tolist()))
+
+    loaders.write_json(
+        path=os.path.join(config['output_directory'], 'identified_parameters.json'),
+        data=parameters
+    )
+
+    compute_times['total'] = timers.get_duration(
+        start_time=start_time
+    )
+
+    loaders.write_json(
+        path=os.path.join(config['output_directory'], 'summary.json'),
+        data={
+            'cost': search['cost'],
+            'errors': errors,
+            'n_generations': search['n_generations'],
+            'n_evaluations': search['n_evaluations'],
+            'converged': search['converged'],
+            'history': search['history'],
+            'compute_times': compute_times
+        }
+    )
+
+    results = {
+        'parameters': parameters,
+        'quadrotor': problem.quadrotor(
+            theta=search['theta']
+        ),
+        'cost': search['cost'],
+        'errors': errors,
+        'converged': search['converged'],
+        'history': search['history']
+    }
+
+    return results, compute_times
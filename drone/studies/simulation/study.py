@@ -1,5 +1,15 @@
+from dataclasses import dataclass
+
 import numpy as np
-from scipy.integrate import solve_ivp
+
+from drone.studies.simulation.trajectory import Trajectory
+from drone.utils.schema import AirframeConfig
+
+# solve_ivp methods that use a jacobian
+IMPLICIT_METHODS = ("BDF", "Radau", "LSODA")
+
+# Rate (1/s) at which drift of the quaternion norm is pulled back to one
+QUATERNION_NORM_GAIN = 1.0
 
 class NonSymmetricQuadrotor:
     def __init__(self, rotor_positions, kf, km, masses_positions, I_body, Cd=None, Ctau=None, rotor_dirs=None):
@@ -25,6 +35,16 @@ class NonSymmetricQuadrotor:
 
         self.compute_mass_properties()
 
+    # Parameters the cached mass properties and mixing matrices depend on
+    _MASS_PROPERTY_ATTRS = ('r_pos', 'kf', 'km', 'masses_positions', 'I_body', 'rotor_dirs')
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        # Reassigning a parameter invalidates the cache; in-place edits of
+        # the arrays need an explicit call to compute_mass_properties
+        if name in self._MASS_PROPERTY_ATTRS and 'I' in self.__dict__:
+            self.compute_mass_properties()
+
     def compute_mass_properties(self):
         masses = np.array([m for m, _ in self.masses_positions])
         positions = np.array([pos for _, pos in self.masses_positions])
@@ -50,6 +70,31 @@ class NonSymmetricQuadrotor:
         # Update rotor positions relative to CoM
         self.r_pos_rel = self.r_pos - self.CoM
 
+        # Cached quantities used by the dynamics on every call
+        self.I_inv = np.linalg.inv(self.I)
+
+        # Rotor thrust -> body torque, r_i x [0, 0, F_i] = [r_y F_i, -r_x F_i, 0]
+        self.torque_arm_matrix = np.zeros((3,4))
+        self.torque_arm_matrix[0] = self.r_pos_rel[:, 1]
+        self.torque_arm_matrix[1] = -self.r_pos_rel[:, 0]
+
+        # Rotor speed squared -> yaw torque
+        self.yaw_moment = self.rotor_dirs * self.km
+
+        # Rotor speed squared -> total body torque
+        self.torque_mixer = self.torque_arm_matrix * self.kf
+        self.torque_mixer[2] = self.yaw_moment
+
+    @classmethod
+    def from_config(cls, airframe):
+        """
+        airframe: validated AirframeConfig
+        """
+        return cls(
+            airframe.rotor_positions, airframe.kf, airframe.km, list(airframe.masses_positions),
+            airframe.I_body, airframe.Cd, airframe.Ctau, airframe.rotor_dirs
+        )
+
     def rotation_matrix(self, phi, theta, psi):
         cphi = np.cos(phi); sphi = np.sin(phi)
         cth = np.cos(theta); sth = np.sin(theta)
@@ -83,19 +128,10 @@ class NonSymmetricQuadrotor:
         R = self.rotation_matrix(phi, theta, psi)
         W = self.W_matrix(phi, theta)
 
-        # Forces and torques from rotors
-        F_i = self.kf * omega**2
-        tau_psi_i = self.rotor_dirs * self.km * omega**2
-
-        # Total thrust force in body frame
-        F_total = np.array([0,0,np.sum(F_i)])
-
-        # Total torque
-        tau_total = np.zeros(3)
-        for i in range(4):
-            r_i = self.r_pos_rel[i]
-            F_vec = np.array([0, 0, F_i[i]])
-            tau_total += np.cross(r_i, F_vec) + np.array([0, 0, tau_psi_i[i]])
+        # Total thrust force in body frame and total torque from rotors
+        omega2 = omega**2
+        F_total = np.array([0,0,self.kf @ omega2])
+        tau_total = self.torque_mixer @ omega2
 
         # Aerodynamic drag forces
         F_drag = -self.Cd @ v
@@ -105,7 +141,7 @@ class NonSymmetricQuadrotor:
         a = (1/self.m) * (self.m * np.array([0,0,-9.81]) + R @ F_total + F_drag)
 
         # Rotational acceleration
-        omega_dot = np.linalg.inv(self.I) @ (tau_total - np.cross(omega_body, self.I @ omega_body) + tau_drag)
+        omega_dot = self.I_inv @ (tau_total - np.cross(omega_body, self.I @ omega_body) + tau_drag)
 
         # Euler angle rates
         eta_dot = W @ omega_body
@@ -118,16 +154,862 @@ class NonSymmetricQuadrotor:
 
         return dxdt
 
-    def simulate(self, omega_func, x0, t_span, t_eval):
+    def rotor_wrench(self, omega):
+        """
+        Collective thrust and body torque produced by rotor speeds.
+        omega: (4,) or (4,T) rotor speeds
+        Returns thrust () or (T,) and torque (3,) or (3,T)
+        """
+        omega2 = np.asarray(omega)**2
+        return self.kf @ omega2, self.torque_mixer @ omega2
+
+    def jacobian(self, t, x, omega):
+        """
+        Analytic Jacobian d(dynamics)/dx at fixed rotor speeds.
+        x: state vector (12,)
+        omega: rotor speeds array (4,)
+        Returns (12,12) array
+        """
+        v = x[3:6]
+        phi, theta, psi = x[6:9]
+        omega_body = x[9:12]
+        p, q, r = omega_body
+
+        cphi = np.cos(phi); sphi = np.sin(phi)
+        cth = np.cos(theta); sth = np.sin(theta); tth = sth / cth
+        cpsi = np.cos(psi); spsi = np.sin(psi)
+
+        # Thrust per unit mass along the third column of R
+        T_m = (self.kf @ omega**2) / self.m
+
+        J = np.zeros((12, 12))
+        J[0:3, 3:6] = np.eye(3)
+
+        # Translational acceleration
+        J[3:6, 3:6] = -self.Cd / self.m
+        J[3:6, 6] = T_m * np.array([-sphi*sth*cpsi + cphi*spsi, -sphi*sth*spsi - cphi*cpsi, -sphi*cth])
+        J[3:6, 7] = T_m * np.array([cphi*cth*cpsi, cphi*cth*spsi, -cphi*sth])
+        J[3:6, 8] = T_m * np.array([-cphi*sth*spsi + sphi*cpsi, cphi*sth*cpsi + sphi*spsi, 0.0])
+
+        # Euler angle rates, W(phi, theta) @ omega_body
+        J[6:9, 6] = [(cphi*q - sphi*r) * tth, -sphi*q - cphi*r, (cphi*q - sphi*r) / cth]
+        J[6:9, 7] = [(sphi*q + cphi*r) / cth**2, 0.0, (sphi*q + cphi*r) * sth / cth**2]
+        J[6:9, 9:12] = self.W_matrix(phi, theta)
+
+        # Rotational acceleration, d/dw (w x Iw) = [w]x I - [Iw]x
+        I_omega = self.I @ omega_body
+        J[9:12, 9:12] = self.I_inv @ (_skew(I_omega) - _skew(omega_body) @ self.I - self.Ctau)
+
+        return J
+
+    def dynamics_batch(self, t, X, Omega):
+        """
+        Vectorized dynamics for many states at once.
+        t: time (unused, kept for symmetry with dynamics)
+        X: (N,12) array of states
+        Omega: (N,4) array of rotor speeds, or (4,) shared by all states
+        Returns (N,12) array of state derivatives
+        """
+        return batch_dynamics(
+            X, Omega, self.m, self.I, self.I_inv, self.kf, self.torque_mixer, self.Cd, self.Ctau
+        )
+
+    def ensemble_parameters(self, n, m=None, kf=None, km=None, com_offset=None, I=None, Cd=None, Ctau=None):
+        """
+        Stack per-vehicle parameters for an ensemble of n airframes dispersed
+        around this one. Parameters left as None are shared by all vehicles.
+        m: (n,) total mass per vehicle; unless I is given, the inertia is
+            scaled by m / self.m, i.e. the mass distribution keeps its shape
+        kf: (n,4) thrust coefficients per vehicle
+        km: (n,4) moment coefficients per vehicle
+        com_offset: (n,3) shift of the CoM relative to the rotors in the body
+            frame. The whole mass distribution is displaced rigidly (e.g. a
+            mounting offset), so the inertia about the CoM is unchanged and
+            only the rotor arms move. Pass a matching I for any other model.
+        I: (n,3,3) inertia tensor about the CoM per vehicle, overrides the
+            scaling implied by m
+        Cd: (n,3,3) translational drag matrix per vehicle
+        Ctau: (n,3,3) rotational drag matrix per vehicle
+        Returns a dict with the keyword arguments of batch_dynamics
+        """
+        def stacked(value, default, shape):
+            if value is None:
+                return default
+            value = np.asarray(value, dtype=float)
+            if value.shape != (n,) + shape:
+                raise ValueError(f'Expected an ensemble parameter of shape {(n,) + shape}, got {value.shape}.')
+            return value
+
+        kf = stacked(kf, self.kf, (4,))
+        km = stacked(km, self.km, (4,))
+        m = stacked(m, self.m, ())
+
+        if I is not None:
+            I = stacked(I, None, (3,3))
+        elif m is not self.m:
+            I = (m / self.m)[:, None, None] * self.I
+        else:
+            I = self.I
+
+        r_pos_rel = self.r_pos_rel
+        if com_offset is not None:
+            r_pos_rel = r_pos_rel - stacked(com_offset, None, (3,))[:, None, :]
+
+        # Same layout as torque_mixer, with a leading vehicle axis when dispersed
+        torque_mixer = np.stack(np.broadcast_arrays(
+            r_pos_rel[..., 1] * kf, -r_pos_rel[..., 0] * kf, self.rotor_dirs * km
+        ), axis=-2)
+
+        return {
+            'm': m,
+            'I': I,
+            'I_inv': self.I_inv if I is self.I else np.linalg.inv(I),
+            'kf': kf,
+            'torque_mixer': torque_mixer,
+            'Cd': stacked(Cd, self.Cd, (3,3)),
+            'Ctau': stacked(Ctau, self.Ctau, (3,3))
+        }
+
+    def dynamics_quaternion(self, t, x, omega):
+        """
+        Dynamics of the 13-element state [p, v, q, omega_body] with the
+        attitude as a unit quaternion q = [w, x, y, z] (body->inertial).
+        The quaternion is normalized before use and a small feedback term
+        pulls its norm back to one during integration.
+        """
+        v = x[3:6]
+        q = x[6:10]
+        omega_body = x[10:13]
+        qw, qx, qy, qz = q / np.linalg.norm(q)
+        p, q_rate, r = omega_body
+
+        # Thrust acts along body z, the third column of R(q)
+        omega2 = omega**2
+        thrust = self.kf @ omega2
+        R3 = np.array([2*(qx*qz + qw*qy), 2*(qy*qz - qw*qx), 1 - 2*(qx*qx + qy*qy)])
+
+        tau_total = self.torque_mixer @ omega2
+        F_drag = -self.Cd @ v
+        tau_drag = -self.Ctau @ omega_body
+
+        dxdt = np.empty(13)
+        dxdt[0:3] = v
+        dxdt[3:6] = (thrust * R3 + F_drag) / self.m
+        dxdt[5] -= 9.81
+
+        # q_dot = 0.5 q (x) [0, omega_body] plus norm stabilization
+        norm_error = 1.0 - (x[6:10] @ x[6:10])
+        dxdt[6] = 0.5 * (-qx*p - qy*q_rate - qz*r)
+        dxdt[7] = 0.5 * (qw*p + qy*r - qz*q_rate)
+        dxdt[8] = 0.5 * (qw*q_rate + qz*p - qx*r)
+        dxdt[9] = 0.5 * (qw*r + qx*q_rate - qy*p)
+        dxdt[6:10] += QUATERNION_NORM_GAIN * norm_error * x[6:10]
+
+        dxdt[10:13] = self.I_inv @ (tau_total - np.cross(omega_body, self.I @ omega_body) + tau_drag)
+
+        return dxdt
+
+    def simulate(self, omega_func, x0, t_span, t_eval=None, integrator="solve_ivp", dt=None, method="RK45",
+                 attitude="euler", events=None, dtype=None, record_inputs=False):
         """
         omega_func: function omega(t, x) -> rotor speeds array (4,)
         x0: initial state vector (12,)
         t_span: (t0, tf)
         t_eval: times at which to store results
+        integrator: "solve_ivp" or "rk4_fixed"
+        dt: step size, required for "rk4_fixed"
+        method: solve_ivp method; the implicit ones (BDF, Radau, LSODA)
+            get the analytic jacobian, holding the rotor speeds fixed
+        attitude: "euler" integrates the 12-state directly, "quaternion"
+            integrates the 13-state of dynamics_quaternion, which has no
+            singularity at pitch +-90 deg. omega_func still receives, and
+            sol.y still holds, the 12-state; sol.quaternion holds (4,T)
+        events: event function or list of them, g(t, x) on the 12-state
+            with terminal/direction attributes as for solve_ivp, e.g. from
+            ground_contact_event or divergence_event. A terminal event ends
+            the run early with status 1; crossings are in sol.t_events and
+            sol.y_events
+        dtype: storage type of the returned trajectory, e.g. np.float32;
+            the integration itself always runs in double precision
+        record_inputs: also store the rotor speeds, collective thrust and
+            body torque at the output times in the trajectory buffer. The
+            commands are captured while integrating: rk4_fixed keeps the
+            first-stage command of every step, and solve_ivp is stepped
+            here and keeps the command at every accepted step, which the
+            explicit methods already evaluated there. Both are sampled at
+            the output times like the state
+        Returns a Trajectory, which also carries the solver information
+        (success, status, message, nfev, ...) as attributes
         """
+        if callable(events):
+            events = [events]
+
+        if attitude == "quaternion":
+            def command(t, x):
+                return omega_func(t, state_to_euler(x))
+            dynamics = self.dynamics_quaternion
+
+            if events is not None:
+                events = [
+                    _event(lambda t, x, event=event: event(t, state_to_euler(x)),
+                           getattr(event, 'terminal', False), getattr(event, 'direction', 0))
+                    for event in events
+                ]
+
+            x0 = state_to_quaternion(np.asarray(x0, dtype=float))
+
+        elif attitude == "euler":
+            command = omega_func
+            dynamics = self.dynamics
+
+        else:
+            raise ValueError(f'Unknown attitude representation: {attitude}.')
+
+        # Most recent command and the point it was computed at
+        last = {}
+
         def fun(t, x):
-            omega = omega_func(t, x)
-            return self.dynamics(t, x, omega)
+            omega = command(t, x)
+            last['t'], last['x'], last['omega'] = t, x, omega
+            return dynamics(t, x, omega)
+
+        if integrator == "solve_ivp":
+            options = {}
+            if method in IMPLICIT_METHODS and attitude == "euler":
+                # Plant jacobian only, the controller's own feedback is not
+                # differentiated
+                def jac(t, x):
+                    return self.jacobian(t, x, omega_func(t, x))
+                options['jac'] = jac
+
+            if record_inputs:
+                def record(t, x):
+                    # Explicit methods end each step on this point already
+                    if last.get('t') == t and np.array_equal(last['x'], x):
+                        return last['omega']
+                    return command(t, x)
+
+                sol = _solve_ivp_recorded(fun, t_span, x0, method, t_eval, events, record, **options)
+
+            else:
+                from scipy.integrate import solve_ivp
+
+                sol = solve_ivp(fun, t_span, x0, method=method, t_eval=t_eval, events=events, **options)
+                sol = dict(sol)
+
+        elif integrator == "rk4_fixed":
+            if dt is None:
+                raise ValueError('A step size dt is required for the rk4_fixed integrator.')
+
+            record = (lambda: last['omega']) if record_inputs else None
+            result = rk4_fixed(fun, t_span, x0, dt, t_eval, events, record=record)
+
+            if events is None:
+                sol = dict(
+                    t=result[0], y=result[1], status=0, success=True,
+                    message='The fixed-step integration reached the end of the interval.'
+                )
+            else:
+                t, y, t_events, y_events, status = result[:5]
+                sol = dict(
+                    t=t, y=y, t_events=t_events, y_events=y_events, status=status, success=True,
+                    message='A termination event occurred.' if status == 1 else
+                        'The fixed-step integration reached the end of the interval.'
+                )
+            if record_inputs:
+                sol['rotor_speeds'] = result[-1]
+
+        else:
+            raise ValueError(f'Unknown integrator: {integrator}.')
+
+        if attitude == "quaternion":
+            y = sol['y']
+            y[6:10] /= np.linalg.norm(y[6:10], axis=0)
+            sol['quaternion'] = y[6:10]
+            sol['y'] = state_to_euler(y)
+            if events is not None:
+                sol['y_events'] = [
+                    state_to_euler(np.reshape(y_event, (-1, 13)).T).T for y_event in sol['y_events']
+                ]
+
+        if record_inputs:
+            sol['thrust'], sol['torque'] = self.rotor_wrench(sol['rotor_speeds'])
+
+        return Trajectory(dtype=dtype, **sol)
+
+    def simulate_discrete_control(self, controller, rate_hz, x0, t_span, t_eval=None, integrator="solve_ivp", dt=None,
+                                  method="RK45", dtype=None, record_inputs=False):
+        """
+        Simulate a sampled-data loop: the controller runs once per control
+        period and its rotor speeds are held (zero-order hold) while the
+        plant is integrated up to the next update.
+        controller: function omega(t, x) -> rotor speeds array (4,)
+        rate_hz: control rate in Hz
+        x0: initial state vector (12,)
+        t_span: (t0, tf), the last period is shortened to land on tf
+        t_eval: times at which to store results, the control update times
+            and tf if None
+        integrator: "solve_ivp" (adaptive) or "rk4_fixed" for the plant
+        dt: plant step size, required for "rk4_fixed"
+        method: solve_ivp method of the plant, e.g. "RK45" or "LSODA"
+        dtype: storage type of the returned trajectory
+        record_inputs: also store the held rotor speeds and the thrust and
+            torque they produce at the output times, without extra
+            controller calls
+        Returns a Trajectory as for simulate, with the command history
+        t_control (K,) and omega (4,K) as attributes
+        """
+        if rate_hz <= 0:
+            raise ValueError(f'The control rate must be positive, got {rate_hz}.')
+        if integrator not in ("solve_ivp", "rk4_fixed"):
+            raise ValueError(f'Unknown integrator: {integrator}.')
+        if integrator == "rk4_fixed" and dt is None:
+            raise ValueError('A step size dt is required for the rk4_fixed integrator.')
+
+        t0, tf = t_span
+        period = 1.0 / rate_hz
+        n_periods = max(int(np.ceil((tf - t0) / period - 1e-9)), 1)
+        t_control = np.append(t0 + period * np.arange(n_periods), tf)
+
+        t_eval = t_control if t_eval is None else np.asarray(t_eval, dtype=float)
+        if np.any(t_eval < t0) or np.any(t_eval > tf):
+            raise ValueError('Values in t_eval are not within t_span.')
+
+        # Output samples in [t_k, t_k+1) belong to period k, tf to the last one
+        bounds = np.searchsorted(t_eval, t_control, side='left')
+        bounds[-1] = len(t_eval)
+
+        y = np.empty((12, len(t_eval)))
+        omega_log = np.empty((4, n_periods))
+        nfev = 0
+
+        x = np.asarray(x0, dtype=float)
+        for k in range(n_periods):
+            tk, tk1 = t_control[k], t_control[k+1]
+            omega = controller(tk, x)
+            omega_log[:, k] = omega
+            seg_eval = t_eval[bounds[k]:bounds[k+1]]
+            n_seg = len(seg_eval)
+            # Also sample the end of the period to carry the state forward
+            if n_seg == 0 or seg_eval[-1] < tk1:
+                seg_eval = np.append(seg_eval, tk1)
+
+            def fun(t, x):
+                return self.dynamics(t, x, omega)
+
+            if integrator == "solve_ivp":
+                from scipy.integrate import solve_ivp
+
+                seg = solve_ivp(fun, (tk, tk1), x, method=method, t_eval=seg_eval)
+                if not seg.success:
+                    return Trajectory(
+                        t_eval[:bounds[k]], y[:, :bounds[k]], dtype=dtype, t_control=t_control[:k+1],
+                        omega=omega_log[:, :k+1], nfev=nfev + seg.nfev, status=-1,
+                        success=False, message=seg.message
+                    )
+                nfev += seg.nfev
+                y_seg = seg.y
+
+            else:
+                _, y_seg = rk4_fixed(fun, (tk, tk1), x, min(dt, tk1 - tk), seg_eval)
+                nfev += 4 * max(int(np.ceil((tk1 - tk) / dt - 1e-9)), 1)
+
+            y[:, bounds[k]:bounds[k+1]] = y_seg[:, :n_seg]
+            x = y_seg[:, -1]
+
+        inputs = {}
+        if record_inputs:
+            # Each output sample sees the command held over its period
+            omega = omega_log[:, np.repeat(np.arange(n_periods), np.diff(bounds))]
+            thrust, torque = self.rotor_wrench(omega)
+            inputs = dict(rotor_speeds=omega, thrust=thrust, torque=torque)
+
+        return Trajectory(
+            t_eval, y, dtype=dtype, t_control=t_control[:-1], omega=omega_log, nfev=nfev, **inputs,
+            status=0, success=True,
+            message='The discrete control loop reached the end of the interval.'
+        )
+
+    def simulate_ensemble(self, omega_func, X0, t_span, t_eval=None, integrator="solve_ivp", dt=None, **dispersion):
+        """
+        Integrate N vehicles in lockstep as one vectorized ODE.
+        omega_func: function Omega(t, X) -> rotor speeds array (N,4)
+        X0: initial states (N,12)
+        t_span: (t0, tf)
+        t_eval: times at which to store results
+        integrator: "solve_ivp" (adaptive RK45, one step size for the whole
+            ensemble) or "rk4_fixed"
+        dt: step size, required for "rk4_fixed"
+        dispersion: per-vehicle parameters, see ensemble_parameters
+        Returns an EnsembleResult
+        """
+        X0 = np.asarray(X0, dtype=float)
+        n = X0.shape[0]
+        params = self.ensemble_parameters(n, **dispersion)
+
+        def fun(t, X):
+            return batch_dynamics(X, omega_func(t, X), **params)
+
+        if integrator == "solve_ivp":
+            def fun_flat(t, y):
+                return fun(t, y.reshape(n, 12)).ravel()
+
+            from scipy.integrate import solve_ivp
+
+            sol = solve_ivp(fun_flat, t_span, X0.ravel(), t_eval=t_eval)
+            return EnsembleResult(
+                t=sol.t, y=sol.y.reshape(n, 12, -1), parameters=params,
+                success=sol.success, status=sol.status, message=sol.message, nfev=sol.nfev
+            )
+
+        if integrator == "rk4_fixed":
+            if dt is None:
+                raise ValueError('A step size dt is required for the rk4_fixed integrator.')
+            t, y = rk4_fixed(fun, t_span, X0, dt, t_eval)
+            # Contiguous per vehicle, so that trajectory(i) is a view
+            return EnsembleResult(
+                t=t, y=np.ascontiguousarray(y), parameters=params, success=True, status=0,
+                message='The fixed-step integration reached the end of the interval.'
+            )
+
+        raise ValueError(f'Unknown integrator: {integrator}.')
+
+def build_quadrotor(airframe):
+    """
+    Build a quadrotor from the airframe section of a configuration.
+    airframe: AirframeConfig, or a dict with rotor_positions, kf, km,
+        masses_positions as [[m_j, [x, y, z]], ...], I_body and optionally
+        Cd, Ctau, rotor_dirs, which is validated first
+    """
+    if not isinstance(airframe, AirframeConfig):
+        airframe = AirframeConfig.from_config(airframe)
+
+    return NonSymmetricQuadrotor.from_config(airframe)
+
+@dataclass
+class EnsembleResult:
+    """
+    Result of NonSymmetricQuadrotor.simulate_ensemble.
+    t: (T,) output times
+    y: (N,12,T) states, y[i] has the layout of sol.y for vehicle i
+    parameters: stacked per-vehicle parameters used for the run
+    """
+    t: np.ndarray
+    y: np.ndarray
+    parameters: dict
+    success: bool
+    status: int
+    message: str
+    nfev: int = 0
+
+    @property
+    def n_vehicles(self):
+        return self.y.shape[0]
+
+    def trajectory(self, i):
+        """
+        Trajectory of vehicle i, a view into y without copying.
+        """
+        return Trajectory(
+            self.t, self.y[i], success=self.success, status=self.status, message=self.message
+        )
+
+def euler_to_quaternion(phi, theta, psi):
+    """
+    Unit quaternion [w, x, y, z] of the ZYX Euler angles used by
+    rotation_matrix. Works elementwise on arrays, stacking on axis 0.
+    """
+    cphi = np.cos(phi/2); sphi = np.sin(phi/2)
+    cth = np.cos(theta/2); sth = np.sin(theta/2)
+    cpsi = np.cos(psi/2); spsi = np.sin(psi/2)
+
+    return np.array([
+        cphi*cth*cpsi + sphi*sth*spsi,
+        sphi*cth*cpsi - cphi*sth*spsi,
+        cphi*sth*cpsi + sphi*cth*spsi,
+        cphi*cth*spsi - sphi*sth*cpsi
+    ])
+
+def quaternion_to_euler(q):
+    """
+    ZYX Euler angles [phi, theta, psi] of a quaternion [w, x, y, z], which
+    need not be normalized. Works on (4,) or (4,T) arrays.
+    """
+    qw, qx, qy, qz = q / np.linalg.norm(q, axis=0)
+
+    return np.array([
+        np.arctan2(2*(qw*qx + qy*qz), 1 - 2*(qx*qx + qy*qy)),
+        np.arcsin(np.clip(2*(qw*qy - qz*qx), -1.0, 1.0)),
+        np.arctan2(2*(qw*qz + qx*qy), 1 - 2*(qy*qy + qz*qz))
+    ])
+
+def state_to_quaternion(x):
+    """
+    Convert a 12-state [p, v, euler, omega_body] to the 13-state
+    [p, v, q, omega_body]. Works on (12,) or (12,T) arrays.
+    """
+    return np.concatenate((x[0:6], euler_to_quaternion(*x[6:9]), x[9:12]))
+
+def state_to_euler(x):
+    """
+    Convert a 13-state [p, v, q, omega_body] to the 12-state
+    [p, v, euler, omega_body]. Works on (13,) or (13,T) arrays.
+    """
+    return np.concatenate((x[0:6], quaternion_to_euler(x[6:10]), x[10:13]))
+
+def _skew(w):
+    """
+    Cross product matrix, _skew(a) @ b == np.cross(a, b).
+    """
+    return np.array([
+        [0, -w[2], w[1]],
+        [w[2], 0, -w[0]],
+        [-w[1], w[0], 0]
+    ])
+
+def _matvec(A, X):
+    """
+    Row-wise A @ x for X of shape (N,k), with A either shared (j,k) or
+    stacked per row (N,j,k).
+    """
+    if A.ndim == 2:
+        return X @ A.T
+    return np.einsum('nij,nj->ni', A, X)
+
+def batch_dynamics(X, Omega, m, I, I_inv, kf, torque_mixer, Cd, Ctau):
+    """
+    Vectorized quadrotor dynamics shared by dynamics_batch and the ensemble
+    simulation. Every parameter is either shared by all rows or stacked with
+    a leading axis of length N (see NonSymmetricQuadrotor.ensemble_parameters).
+    X: (N,12) array of states
+    Omega: (N,4) array of rotor speeds, or (4,) shared by all states
+    Returns (N,12) array of state derivatives
+    """
+    X = np.asarray(X, dtype=float)
+    Omega2 = np.broadcast_to(np.asarray(Omega, dtype=float)**2, (X.shape[0], 4))
+
+    v = X[:, 3:6]
+    phi = X[:, 6]; theta = X[:, 7]; psi = X[:, 8]
+    omega_body = X[:, 9:12]
+
+    cphi = np.cos(phi); sphi = np.sin(phi)
+    cth = np.cos(theta); sth = np.sin(theta); tth = np.tan(theta)
+    cpsi = np.cos(psi); spsi = np.sin(psi)
+
+    # Total thrust and torque from rotors
+    F_sum = np.sum(Omega2 * kf, axis=-1)
+    tau_total = _matvec(torque_mixer, Omega2)
+
+    # Aerodynamic drag forces
+    F_drag = -_matvec(Cd, v)
+    tau_drag = -_matvec(Ctau, omega_body)
+
+    dXdt = np.empty_like(X)
+    dXdt[:, 0:3] = v
+
+    # Thrust acts along body z, so only the third column of R is needed
+    dXdt[:, 3] = (F_sum * (cphi*sth*cpsi + sphi*spsi) + F_drag[:, 0]) / m
+    dXdt[:, 4] = (F_sum * (cphi*sth*spsi - sphi*cpsi) + F_drag[:, 1]) / m
+    dXdt[:, 5] = (F_sum * (cphi*cth) + F_drag[:, 2]) / m - 9.81
+
+    # Euler angle rates, W @ omega_body row by row
+    p = omega_body[:, 0]; q = omega_body[:, 1]; r = omega_body[:, 2]
+    dXdt[:, 6] = p + (sphi*q + cphi*r) * tth
+    dXdt[:, 7] = cphi*q - sphi*r
+    dXdt[:, 8] = (sphi*q + cphi*r) / cth
+
+    # Rotational acceleration
+    I_omega = _matvec(I, omega_body)
+    rhs = tau_total - np.cross(omega_body, I_omega) + tau_drag
+    dXdt[:, 9:12] = _matvec(I_inv, rhs)
+
+    return dXdt
+
+def rk4_fixed(fun, t_span, x0, dt, t_eval=None, events=None, record=None):
+    """
+    Classic fixed-step fourth order Runge-Kutta integration.
+    fun: function f(t, x) -> dx/dt, x of any shape
+    t_span: (t0, tf), the last step is shortened to land on tf
+    x0: initial state
+    dt: step size
+    t_eval: times at which to store results, linearly interpolated
+        between steps; every step is returned if None
+    events: list of event functions g(t, x) with optional terminal and
+        direction attributes, as for solve_ivp. Zero crossings are located
+        by linear interpolation within the step.
+    record: function called without arguments after the first stage of
+        every step, e.g. to fetch the input fun just applied at (t_k, x_k).
+        Its values are sampled at the output times like the state, holding
+        the last one over the final step
+    Returns (t, y) with y of shape (*x0.shape, len(t)), followed by
+    t_events, y_events (one array per event) and the status (1 if a
+    terminal event stopped the integration, else 0) when events are given,
+    and by the recorded values u of shape (*value.shape, len(t)) when
+    record is given
+    """
+    t0, tf = t_span
+    if not tf > t0:
+        raise ValueError(f'The fixed-step integrator needs tf > t0, got t_span={t_span}.')
+    if not 0 < dt <= tf - t0:
+        raise ValueError(f'The step size dt must lie in (0, tf - t0], got dt={dt}.')
+    if t_eval is not None:
+        t_eval = np.asarray(t_eval, dtype=float)
+        if np.any(t_eval < t0) or np.any(t_eval > tf):
+            raise ValueError('Values in t_eval are not within t_span.')
+
+    x0 = np.asarray(x0, dtype=float)
+    n_steps = max(int(np.ceil((tf - t0) / dt - 1e-9)), 1)
+
+    t = t0 + dt * np.arange(n_steps + 1)
+    t[-1] = tf
+
+    # Preallocate the whole trajectory, one contiguous row per step
+    y = np.empty((n_steps + 1,) + x0.shape)
+    y[0] = x0
+
+    if events is not None:
+        t_events = [[] for _ in events]
+        y_events = [[] for _ in events]
+        g_prev = [event(t0, x0) for event in events]
+    status = 0
+
+    if record is not None:
+        u = None
+
+    x = x0
+    for k in range(n_steps):
+        tk = t[k]
+        h = t[k+1] - tk
+        k1 = fun(tk, x)
+        if record is not None:
+            value = np.asarray(record(), dtype=float)
+            if u is None:
+                u = np.empty((n_steps + 1,) + value.shape)
+            u[k] = u[k+1] = value
+        k2 = fun(tk + 0.5*h, x + 0.5*h*k1)
+        k3 = fun(tk + 0.5*h, x + 0.5*h*k2)
+        k4 = fun(tk + h, x + h*k3)
+        x = x + (h/6) * (k1 + 2*k2 + 2*k3 + k4)
+        y[k+1] = x
+
+        if events is None:
+            continue
+
+        t_stop = None
+        for i, event in enumerate(events):
+            g_new = event(t[k+1], x)
+            if _crossed(g_prev[i], g_new, getattr(event, 'direction', 0)):
+                frac = g_prev[i] / (g_prev[i] - g_new)
+                t_events[i].append(tk + frac*h)
+                y_events[i].append(y[k] + frac*(x - y[k]))
+                if getattr(event, 'terminal', False) and (t_stop is None or t_events[i][-1] < t_stop[0]):
+                    t_stop = (t_events[i][-1], y_events[i][-1])
+            g_prev[i] = g_new
+
+        if t_stop is not None:
+            # End the trajectory at the earliest terminal event
+            n_steps = k + 1
+            t = t[:k+2]
+            y = y[:k+2]
+            if record is not None:
+                u = u[:k+2]
+            t[-1], y[-1] = t_stop
+            status = 1
+            break
+
+    if t_eval is not None:
+        t_eval = t_eval[t_eval <= t[-1]]
+        idx = np.clip(np.searchsorted(t, t_eval, side='right') - 1, 0, n_steps - 1)
+        w = ((t_eval - t[idx]) / np.maximum(t[idx+1] - t[idx], 1e-300)).reshape((-1,) + (1,) * x0.ndim)
+        y = (1 - w) * y[idx] + w * y[idx+1]
+        if record is not None:
+            w = w.reshape((-1,) + (1,) * (u.ndim - 1))
+            u = (1 - w) * u[idx] + w * u[idx+1]
+        t = t_eval
+
+    result = (t, np.moveaxis(y, 0, -1))
+
+    if events is not None:
+        t_events = [np.array(te) for te in t_events]
+        y_events = [np.array(ye).reshape((-1,) + x0.shape) for ye in y_events]
+        result += (t_events, y_events, status)
+
+    if record is not None:
+        result += (np.moveaxis(u, 0, -1),)
+
+    return result
+
+def _crossed(g_prev, g_new, direction):
+    """
+    Whether an event function changed sign in the given direction.
+    """
+    if g_prev == g_new:
+        return False
+    up = g_prev <= 0 <= g_new
+    down = g_prev >= 0 >= g_new
+    if direction > 0:
+        return up
+    if direction < 0:
+        return down
+    return up or down
+
+def _solve_ivp_recorded(fun, t_span, x0, method, t_eval, events, record, **options):
+    """
+    solve_ivp for one trajectory, stepping the OdeSolver here so that the
+    input is recorded at the start and at every accepted step.
+    record: function u(t, x) called once per accepted step
+    Output times, events and the returned fields follow solve_ivp; the
+    recorded values are interpolated linearly between the accepted steps
+    to the output times and returned as rotor_speeds (4,T)
+    """
+    import scipy.integrate
+    from scipy.optimize import brentq
+
+    solver_class = getattr(scipy.integrate, method, None) if isinstance(method, str) else method
+    if not (isinstance(solver_class, type) and issubclass(solver_class, scipy.integrate.OdeSolver)):
+        raise ValueError(f'Unknown solve_ivp method: {method}.')
+
+    t0, tf = map(float, t_span)
+    x = np.asarray(x0, dtype=float)
+    if t_eval is not None:
+        t_eval = np.asarray(t_eval, dtype=float)
+        if np.any(t_eval < min(t0, tf)) or np.any(t_eval > max(t0, tf)):
+            raise ValueError('Values in t_eval are not within t_span.')
+
+    # The solvers evaluate fun at the initial state while choosing their
+    # first step; keep that input instead of asking for it again
+    initial = {}
+
+    def fun_initial(t, y):
+        dy = fun(t, y)
+        if not initial and t == t0:
+            initial['u'] = record(t, y)
+        return dy
+
+    solver = solver_class(fun_initial, t0, x, tf, **options)
+
+    t_steps = [t0]
+    u_steps = [np.asarray(initial['u'] if initial else record(t0, x), dtype=float)]
+    if t_eval is None:
+        t_out, y_out = [t0], [x[:, None]]
+    else:
+        t_out, y_out = [], []
+        i_eval = 0
+
+    if events is not None:
+        g_prev = [event(t0, x) for event in events]
+        t_events = [[] for _ in events]
+        y_events = [[] for _ in events]
+
+    status = None
+    message = 'The solver successfully reached the end of the integration interval.'
+    while status is None:
+        step_message = solver.step()
+        if solver.status == 'failed':
+            status, message = -1, step_message
+            break
+
+        t_old, t, x = solver.t_old, solver.t, solver.y
+        dense = solver.dense_output()
+
+        if events is not None:
+            found = []
+            for i, event in enumerate(events):
+                g_new = event(t, x)
+                if _crossed(g_prev[i], g_new, getattr(event, 'direction', 0)):
+                    root = brentq(lambda tau: event(tau, dense(tau)), t_old, t) if g_prev[i] != 0 else t_old
+                    found.append((root, i))
+                g_prev[i] = g_new
+
+            # Events after the first terminal one in this step never happen
+            t_stop = min(
+                (root for root, i in found if getattr(events[i], 'terminal', False)), default=None
+            )
+            for root, i in sorted(found):
+                if t_stop is None or root <= t_stop:
+                    t_events[i].append(root)
+                    y_events[i].append(dense(root))
+
+            if t_stop is not None:
+                t, x = t_stop, dense(t_stop)
+                status, message = 1, 'A termination event occurred.'
+
+        if status is None and solver.status == 'finished':
+            status = 0
+
+        t_steps.append(t)
+        u_steps.append(np.asarray(record(t, x), dtype=float))
+
+        if t_eval is None:
+            t_out.append(t)
+            y_out.append(x[:, None])
+        else:
+            i_new = np.searchsorted(t_eval, t, side='right')
+            if i_new > i_eval:
+                t_out.extend(t_eval[i_eval:i_new])
+                y_out.append(dense(t_eval[i_eval:i_new]))
+            i_eval = i_new
+
+    t_out = np.array(t_out, dtype=float)
+    u_steps = np.array(u_steps)
+
+    sol = dict(
+        t=t_out,
+        y=np.hstack(y_out) if y_out else np.empty((len(x), 0)),
+        rotor_speeds=np.array([np.interp(t_out, t_steps, u) for u in u_steps.T]),
+        nfev=solver.nfev, njev=solver.njev, nlu=solver.nlu,
+        status=status, message=message, success=status >= 0
+    )
+    if events is not None:
+        sol['t_events'] = [np.array(te) for te in t_events]
+        sol['y_events'] = [np.array(ye).reshape(-1, len(x)) for ye in y_events]
+
+    return sol
+
+def _event(func, terminal, direction):
+    func.terminal = terminal
+    func.direction = direction
+    return func
+
+def ground_contact_event(z_ground=0.0, terminal=True):
+    """
+    Event when the altitude drops through z_ground.
+    """
+    return _event(lambda t, x: x[2] - z_ground, terminal, -1)
+
+def attitude_singularity_event(margin=0.1, terminal=True):
+    """
+    Event when the pitch comes within margin (rad) of +-90 deg, where the
+    Euler angle rates blow up. Only meaningful with attitude="euler"; the
+    quaternion mode has no singularity and its pitch turns back below 90
+    deg, which large steps can skip over.
+    """
+    limit = np.sin(margin)
+    return _event(lambda t, x: np.cos(x[7]) - limit, terminal, -1)
+
+def divergence_event(max_position=1e3, max_velocity=1e2, max_rate=1e2, terminal=True):
+    """
+    Event when any position, velocity or body rate component exceeds its
+    bound in magnitude, or the state stops being finite.
+    """
+    def event(t, x):
+        margin = min(
+            max_position - np.max(np.abs(x[0:3])),
+            max_velocity - np.max(np.abs(x[3:6])),
+            max_rate - np.max(np.abs(x[9:12]))
+        )
+        return margin if np.isfinite(margin) else -1.0
+    return _event(event, terminal, -1)
 
-        sol = solve_ivp(fun, t_span, x0, t_eval=t_eval)
-        return sol
+def setpoint_reached_event(setpoint, position_tol=0.05, velocity_tol=0.05, terminal=True):
+    """
+    Event when the position is within position_tol of setpoint[0:3] and
+    the speed below velocity_tol.
+    """
+    target = np.asarray(setpoint, dtype=float)[0:3]
+    def event(t, x):
+        return max(
+            np.max(np.abs(x[0:3] - target)) / position_tol,
+            np.max(np.abs(x[3:6])) / velocity_tol
+        ) - 1.0
+    return _event(event, terminal, -1)
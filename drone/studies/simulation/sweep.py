@@ -0,0 +1,292 @@
+"""
+sweep.py : Run a grid of simulation scenarios in parallel across worker
+processes and stream the results to disk as they complete.
+"""
+
+import copy
+import itertools
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from drone.studies.simulation.study import NonSymmetricQuadrotor
+from drone.studies.simulation import workflow
+from drone.utils import loaders
+from drone.utils import schema
+from drone.utils import timers
+
+def set_by_path(
+    config: dict,
+    path: str,
+    value
+) -> None:
+    """
+    Set a value in a nested dictionary given a dotted path, e.g.
+    'airframe.kf'.
+    """
+
+    *parents, key = path.split('.')
+
+    node = config
+    for parent in parents:
+        node = node.setdefault(parent, {})
+
+    node[key] = value
+
+    return None
+
+def expand_grid(
+    config: dict
+) -> list:
+    """
+    Expand the parameter grid of a sweep configuration into a list of
+    scenarios. Every grid key is a dotted path into the scenario and the
+    scenarios span the cartesian product of all grid values.
+    """
+
+    grid = config['sweep'].get('grid', {})
+    base = {
+        key: config[key] for key in ('airframe', 'controller', 'simulation', 'outputs')
+        if key in config
+    }
+
+    paths = list(grid.keys())
+    scenarios = []
+
+    for run_id, values in enumerate(itertools.product(
+        *(grid[path] for path in paths)
+    )):
+        scenario = copy.deepcopy(base)
+
+        for path, value in zip(paths, values):
+            set_by_path(
+                config=scenario,
+                path=path,
+                value=value
+            )
+
+        scenario['run_id'] = run_id
+        scenario['grid_point'] = dict(zip(paths, values))
+
+        scenarios.append(scenario)
+
+    return scenarios
+
+def validate_scenario(
+    scenario: dict
+) -> tuple:
+    """
+    Validate the airframe, controller, simulation and outputs sections of
+    a scenario. Without a controller section the scenario runs open loop.
+    """
+
+    airframe = schema.AirframeConfig.from_config(
+        section=scenario['airframe']
+    )
+
+    controller = scenario.get('controller')
+    if controller is not None:
+        controller = schema.ControllerConfig.from_config(
+            section=controller
+        )
+
+    simulation = schema.SimulationConfig.from_config(
+        section=scenario['simulation']
+    )
+
+    outputs = schema.OutputsConfig.from_config(
+        section=scenario.get('outputs', {})
+    )
+
+    return airframe, controller, simulation, outputs
+
+def run_scenario(
+    scenario: dict
+) -> dict:
+    """
+    Build the airframe and controller of a scenario and simulate it. This
+    runs inside a worker process.
+    """
+
+    start_time = timers.get_time()
+
+    airframe, controller, simulation, outputs = validate_scenario(
+        scenario=scenario
+    )
+
+    quad = NonSymmetricQuadrotor.from_config(
+        airframe=airframe
+    )
+
+    sol = workflow.simulate(
+        quad=quad,
+        simulation=simulation,
+        controller=controller,
+        outputs=outputs
+    )
+
+    result = {
+        'run_id': scenario['run_id'],
+        'grid_point': scenario['grid_point'],
+        'trajectory': sol,
+        'success': bool(sol.success),
+        'status': int(sol.status),
+        'compute_time': timers.get_duration(
+            start_time=start_time
+        )
+    }
+
+    return result
+
+def run_chunk(
+    chunk: list
+) -> list:
+    """
+    Run a chunk of scenarios in one worker task.
+    """
+
+    return [run_scenario(scenario=scenario) for scenario in chunk]
+
+def _write_chunk(
+    results: list,
+    writer: loaders.TrajectoryWriter,
+    summary: list,
+    export_path: str = None
+) -> None:
+    """
+    Stream the trajectories of a completed chunk into the trajectory
+    store, and the campaign export if there is one, and record them in
+    the sweep summary.
+    """
+
+    if export_path is not None:
+        loaders.export_simulation_results(
+            path=export_path,
+            results=[
+                (result['run_id'], result['trajectory'], result['grid_point'])
+                for result in results
+            ],
+            mode='a' if summary else 'w'
+        )
+
+    for result in results:
+        writer.write_trajectory(
+            run_id=result['run_id'],
+            trajectory=result['trajectory'],
+            parameters=result['grid_point']
+        )
+
+        summary.append({
+            'run_id': result['run_id'],
+            'grid_point': result['grid_point'],
+            'success': result['success'],
+            'status': result['status'],
+            'compute_time': result['compute_time'],
+            'path': writer.directory
+        })
+
+    return None
+
+def run_sweep(
+    config: dict,
+    log_path: str = None
+) -> tuple:
+    """
+    Fan the scenarios of a sweep out across a process pool. At most two
+    chunks per worker are in flight at a time, and the trajectories of a
+    chunk are streamed into the trajectory store under 'trajectories' and
+    released as soon as it completes, so memory use does not grow with the
+    number of scenarios.
+    """
+
+    start_time = timers.get_time()
+
+    sweep_config = config['sweep']
+    scenarios = expand_grid(
+        config=config
+    )
+
+    # Fail before any work is submitted if a grid point is invalid
+    for scenario in scenarios:
+        validate_scenario(
+            scenario=scenario
+        )
+
+    chunk_size = sweep_config.get('chunk_size', 16)
+    chunks = (
+        scenarios[i:i + chunk_size]
+        for i in range(0, len(scenarios), chunk_size)
+    )
+
+    n_workers = sweep_config.get('n_workers') or os.cpu_count() or 1
+    max_in_flight = 2 * n_workers
+
+    writer = loaders.TrajectoryWriter(
+        directory=os.path.join(config['output_directory'], 'trajectories')
+    )
+
+    # Optional single campaign file for dashboards, Parquet or HDF5
+    export_path = sweep_config.get('export')
+    if export_path is not None:
+        export_path = os.path.join(config['output_directory'], export_path)
+
+    summary = []
+
+    def collect(in_flight: set) -> set:
+        # Wait for at least one chunk, write it and drop its future
+        done, in_flight = wait(
+            in_flight,
+            return_when=FIRST_COMPLETED
+        )
+
+        for future in done:
+            _write_chunk(
+                results=future.result(),
+                writer=writer,
+                summary=summary,
+                export_path=export_path
+            )
+
+            if log_path is not None:
+                time_str = timers.get_readable_time(
+                    timestamp=timers.get_time()
+                )
+
+                loaders.add_entry_to_log(
+                    log_file_path=log_path,
+                    entry=f'{time_str}: {len(summary)}/{len(scenarios)} scenarios done.'
+                )
+
+        return in_flight
+
+    # Workers start with the parsed configuration files of this process
+    with writer, ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=loaders.install_config_snapshot,
+        initargs=(loaders.get_config_resolver().snapshot(),)
+    ) as executor:
+        in_flight = set()
+
+        for chunk in chunks:
+            if len(in_flight) >= max_in_flight:
+                in_flight = collect(in_flight)
+
+            in_flight.add(executor.submit(run_chunk, chunk))
+
+        while in_flight:
+            in_flight = collect(in_flight)
+
+    summary.sort(key=lambda entry: entry['run_id'])
+
+    loaders.write_json(
+        path=os.path.join(config['output_directory'], 'summary.json'),
+        data=summary
+    )
+
+    compute_times = {
+        'total': timers.get_duration(
+            start_time=start_time
+        ),
+        'scenarios': [entry['compute_time'] for entry in summary]
+    }
+
+    return summary, compute_times
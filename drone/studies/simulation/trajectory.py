@@ -0,0 +1,197 @@
+from functools import cached_property
+
+import numpy as np
+
+# Rows of the 12-state in the trajectory buffer
+STATE_CHANNELS = {
+    "position": slice(0, 3),
+    "velocity": slice(3, 6),
+    "euler": slice(6, 9),
+    "body_rates": slice(9, 12),
+}
+
+# Optional input channels and their number of rows, stored after the state
+INPUT_CHANNELS = {
+    "rotor_speeds": 4,
+    "thrust": 1,
+    "torque": 3,
+}
+
+# Column labels of the rows of each channel, for tabular exports
+CHANNEL_LABELS = {
+    "position": ("x", "y", "z"),
+    "velocity": ("vx", "vy", "vz"),
+    "euler": ("phi", "theta", "psi"),
+    "body_rates": ("p", "q", "r"),
+    "rotor_speeds": ("omega_1", "omega_2", "omega_3", "omega_4"),
+    "thrust": ("thrust",),
+    "torque": ("tau_x", "tau_y", "tau_z"),
+}
+
+class Trajectory:
+    """
+    Simulated trajectory held in one contiguous (C,T) buffer, data. Rows
+    0-11 are the 12-state, followed by whichever of rotor_speeds (4),
+    thrust (1) and torque (3) were recorded. The named attributes are views
+    into data, so slicing them never copies, and derived quantities are
+    computed on first access only.
+    t: (T,) output times
+    y: (12,T) states, wrapped without a copy when already contiguous and
+        of the storage dtype and no inputs are given
+    rotor_speeds, thrust, torque: optional inputs (4,T), (T,), (3,T)
+    dtype: storage type, e.g. np.float32 to halve the memory of large
+        ensembles; defaults to the type of y
+    info: solver information kept as attributes, e.g. success, status,
+        message, nfev, t_events, y_events
+    """
+    def __init__(self, t, y, rotor_speeds=None, thrust=None, torque=None, dtype=None, **info):
+        y = np.asarray(y)
+        if y.ndim != 2 or y.shape[0] != 12:
+            raise ValueError(f'Expected states of shape (12,T), got {y.shape}.')
+
+        inputs = {
+            name: value for name, value in
+            (("rotor_speeds", rotor_speeds), ("thrust", thrust), ("torque", torque))
+            if value is not None
+        }
+        dtype = np.dtype(dtype if dtype is not None else np.result_type(y.dtype, np.float32))
+
+        self.t = np.asarray(t, dtype=float)
+        if not inputs and y.dtype == dtype and y.flags.c_contiguous:
+            self.data = y
+        else:
+            n_rows = 12 + sum(INPUT_CHANNELS[name] for name in inputs)
+            self.data = np.empty((n_rows, y.shape[1]), dtype=dtype)
+            self.data[:12] = y
+
+        self.channels = dict(STATE_CHANNELS)
+        row = 12
+        for name, size in INPUT_CHANNELS.items():
+            if name in inputs:
+                self.channels[name] = slice(row, row + size)
+                self.data[row:row + size] = np.reshape(inputs[name], (size, -1))
+                row += size
+
+        self.success = True
+        self.status = 0
+        self.message = ''
+        self.nfev = 0
+        self.t_events = None
+        self.y_events = None
+        self.__dict__.update(info)
+
+    def __len__(self):
+        return len(self.t)
+
+    def __repr__(self):
+        return (f'Trajectory(T={len(self)}, channels={list(self.channels)}, '
+                f'dtype={self.data.dtype}, status={self.status})')
+
+    def channel(self, name):
+        """
+        View of a named channel, None if it was not recorded.
+        """
+        if name not in self.channels:
+            if name in STATE_CHANNELS or name in INPUT_CHANNELS:
+                return None
+            raise KeyError(f'Unknown trajectory channel: {name}.')
+        return self.data[self.channels[name]]
+
+    def columns(self):
+        """
+        One labelled (T,) row view per stored row, e.g. {"x": ..., "omega_1": ...}.
+        """
+        return {
+            label: row
+            for name in self.channels
+            for label, row in zip(CHANNEL_LABELS[name], self.data[self.channels[name]])
+        }
+
+    @property
+    def y(self):
+        return self.data[:12]
+
+    @property
+    def position(self):
+        return self.data[STATE_CHANNELS["position"]]
+
+    @property
+    def velocity(self):
+        return self.data[STATE_CHANNELS["velocity"]]
+
+    @property
+    def euler(self):
+        return self.data[STATE_CHANNELS["euler"]]
+
+    @property
+    def body_rates(self):
+        return self.data[STATE_CHANNELS["body_rates"]]
+
+    @property
+    def rotor_speeds(self):
+        return self.channel("rotor_speeds")
+
+    @property
+    def thrust(self):
+        # (T,) rather than (1,T)
+        thrust = self.channel("thrust")
+        return None if thrust is None else thrust[0]
+
+    @property
+    def torque(self):
+        return self.channel("torque")
+
+    def astype(self, dtype):
+        """
+        Copy of the trajectory stored as dtype.
+        """
+        # Derived quantities are left to be recomputed at the new precision
+        derived = {key for key, value in vars(Trajectory).items() if isinstance(value, cached_property)}
+        info = {
+            key: value for key, value in self.__dict__.items()
+            if key not in ("t", "data", "channels") and key not in derived
+        }
+
+        return Trajectory(
+            self.t, self.y, rotor_speeds=self.rotor_speeds, thrust=self.thrust,
+            torque=self.torque, dtype=dtype, **info
+        )
+
+    @cached_property
+    def speed(self):
+        """
+        (T,) magnitude of the world frame velocity.
+        """
+        return np.linalg.norm(self.velocity, axis=0)
+
+    @cached_property
+    def rotation_matrices(self):
+        """
+        (T,3,3) body to world rotation at each output time.
+        """
+        phi, theta, psi = self.euler
+        cphi = np.cos(phi); sphi = np.sin(phi)
+        cth = np.cos(theta); sth = np.sin(theta)
+        cpsi = np.cos(psi); spsi = np.sin(psi)
+
+        R = np.array([
+            [cth*cpsi, sphi*sth*cpsi - cphi*spsi, cphi*sth*cpsi + sphi*spsi],
+            [cth*spsi, sphi*sth*spsi + cphi*cpsi, cphi*sth*spsi - sphi*cpsi],
+            [-sth,     sphi*cth,                  cphi*cth]
+        ])
+        return np.moveaxis(R, -1, 0)
+
+    @cached_property
+    def body_velocity(self):
+        """
+        (3,T) velocity expressed in the body frame.
+        """
+        return np.einsum('tji,jt->it', self.rotation_matrices, self.velocity)
+
+    @cached_property
+    def tilt(self):
+        """
+        (T,) angle between the body z axis and the world z axis.
+        """
+        phi, theta = self.euler[0], self.euler[1]
+        return np.arccos(np.clip(np.cos(phi) * np.cos(theta), -1.0, 1.0))
@@ -0,0 +1,318 @@
+"""
+workflow.py : Run a single simulation end to end from a validated
+configuration: build the airframe and controller, integrate with the
+selected integrator and write the outputs, timing every stage.
+"""
+
+import os
+
+import numpy as np
+
+from drone.studies.design.study import PIDController
+from drone.studies.simulation.study import (
+    NonSymmetricQuadrotor,
+    attitude_singularity_event,
+    divergence_event,
+    ground_contact_event,
+    setpoint_reached_event
+)
+from drone.utils import loaders
+from drone.utils import plotters
+from drone.utils import schema
+from drone.utils import timers
+
+EVENTS = {
+    'ground_contact': ground_contact_event,
+    'attitude_singularity': attitude_singularity_event,
+    'divergence': divergence_event,
+    'setpoint_reached': setpoint_reached_event
+}
+
+def _log(
+    log_path: str,
+    entry: str
+) -> None:
+    """
+    Add a time stamped entry to the log, if there is one.
+    """
+
+    if log_path is None:
+        return None
+
+    time_str = timers.get_readable_time(
+        timestamp=timers.get_time()
+    )
+
+    loaders.add_entry_to_log(
+        log_file_path=log_path,
+        entry=f'{time_str}: {entry}'
+    )
+
+    return None
+
+def get_rotor_speeds(
+    quad: NonSymmetricQuadrotor,
+    simulation: schema.SimulationConfig
+) -> np.ndarray:
+    """
+    Get the constant rotor speeds of an open-loop simulation. The keyword
+    'hover' selects equal speeds whose total thrust balances gravity.
+    """
+
+    if isinstance(simulation.rotor_speeds, str):
+        return np.sqrt(quad.m * 9.81 / np.sum(quad.kf)) * np.ones(4)
+
+    return np.array(simulation.rotor_speeds)
+
+def get_events(
+    simulation: schema.SimulationConfig
+) -> list:
+    """
+    Build the event functions of a simulation from its 'events' entry,
+    which maps event names to the keyword arguments of their factories,
+    so that failing candidates stop early.
+    """
+
+    if not simulation.events:
+        return None
+
+    return [EVENTS[name](**options) for name, options in simulation.events]
+
+def get_omega_func(
+    quad: NonSymmetricQuadrotor,
+    simulation: schema.SimulationConfig,
+    controller: schema.ControllerConfig = None
+):
+    """
+    Get the rotor speed command of a simulation: the PID controller
+    tracking its setpoint if there is a controller, constant rotor speeds
+    otherwise.
+    """
+
+    if controller is None:
+        omega = get_rotor_speeds(
+            quad=quad,
+            simulation=simulation
+        )
+
+        return lambda t, x: omega
+
+    pid = PIDController.from_config(
+        quad=quad,
+        controller=controller
+    )
+    setpoint = controller.setpoint
+
+    return lambda t, x: pid.control(t, x, setpoint)
+
+def simulate(
+    quad: NonSymmetricQuadrotor,
+    simulation: schema.SimulationConfig,
+    controller: schema.ControllerConfig = None,
+    outputs: schema.OutputsConfig = schema.OutputsConfig()
+):
+    """
+    Integrate the quadrotor with the configured integrator. A controller
+    with a rate runs as a sampled-data loop on the Euler plant, which does
+    not support events, so configuring both is an error; otherwise the
+    controller or the constant rotor speeds are evaluated at every
+    integrator stage.
+    """
+
+    integrator = simulation.integrator
+
+    omega_func = get_omega_func(
+        quad=quad,
+        simulation=simulation,
+        controller=controller
+    )
+
+    if controller is not None and controller.rate_hz is not None:
+        if integrator.attitude != 'euler':
+            raise schema.ConfigError(
+                'simulation.attitude: a controller with a rate runs on the '
+                f'euler plant, got {integrator.attitude!r}.'
+            )
+
+        if simulation.events:
+            raise schema.ConfigError(
+                'simulation.events: a controller with a rate does not support '
+                f'events, got {[name for name, _ in simulation.events]}.'
+            )
+
+        return quad.simulate_discrete_control(
+            omega_func,
+            controller.rate_hz,
+            simulation.x0,
+            simulation.t_span,
+            simulation.t_eval,
+            integrator=integrator.name,
+            dt=integrator.dt,
+            method=integrator.method,
+            dtype=outputs.dtype,
+            record_inputs=outputs.record_inputs
+        )
+
+    return quad.simulate(
+        omega_func,
+        simulation.x0,
+        simulation.t_span,
+        simulation.t_eval,
+        integrator=integrator.name,
+        dt=integrator.dt,
+        method=integrator.method,
+        attitude=integrator.attitude,
+        events=get_events(
+            simulation=simulation
+        ),
+        dtype=outputs.dtype,
+        record_inputs=outputs.record_inputs
+    )
+
+def get_flags(
+    trajectory,
+    settings: schema.QuadrotorConfig
+) -> dict:
+    """
+    Summarize how the integration ended, including which of the configured
+    events fired.
+    """
+
+    events = []
+    if trajectory.t_events is not None:
+        names = [name for name, _ in settings.simulation.events]
+        events = [
+            name for name, t_event in zip(names, trajectory.t_events)
+            if len(t_event)
+        ]
+
+    flags = {
+        'success': bool(trajectory.success),
+        'status': int(trajectory.status),
+        'terminated': int(trajectory.status) == 1,
+        'message': str(trajectory.message),
+        'events': events,
+        't_final': float(trajectory.t[-1]) if len(trajectory) else None
+    }
+
+    return flags
+
+def write_outputs(
+    trajectory,
+    settings: schema.QuadrotorConfig
+) -> dict:
+    """
+    Write the trajectory to the trajectory store, the tabular export and
+    the plot selected in the outputs section, and return their paths.
+    """
+
+    outputs = settings.outputs
+    output_directory = settings.output_directory
+    paths = {}
+
+    if outputs.store:
+        paths['store'] = os.path.join(output_directory, 'trajectories')
+
+        with loaders.TrajectoryWriter(directory=paths['store']) as writer:
+            writer.write_trajectory(
+                run_id=0,
+                trajectory=trajectory
+            )
+
+    if outputs.export is not None:
+        paths['export'] = os.path.join(output_directory, outputs.export)
+
+        loaders.export_simulation_results(
+            path=paths['export'],
+            results=[(0, trajectory, {})],
+            mode='w'
+        )
+
+    if outputs.plot:
+        paths['plot'] = os.path.join(output_directory, 'trajectory.png')
+
+        plotters.plot_trajectory(
+            trajectory=trajectory,
+            path=paths['plot']
+        )
+
+    return paths
+
+def run_simulation(
+    config: dict,
+    log_path: str = None
+) -> tuple:
+    """
+    Run the simulation described by a configuration and write its outputs
+    under the output directory, with a summary of the run in
+    'summary.json'. Returns the results, the experimental data of the
+    configuration, the compute time of every stage and the solver flags.
+    """
+
+    start_time = timers.get_time()
+    compute_times = {}
+
+    settings = schema.QuadrotorConfig.from_config(
+        config=config
+    )
+
+    quad = NonSymmetricQuadrotor.from_config(
+        airframe=settings.airframe
+    )
+
+    compute_times['build'] = timers.get_duration(
+        start_time=start_time
+    )
+    _log(log_path, f'Built the airframe in {compute_times["build"]:.3f} s.')
+
+    stage_time = timers.get_time()
+    trajectory = simulate(
+        quad=quad,
+        simulation=settings.simulation,
+        controller=settings.controller,
+        outputs=settings.outputs
+    )
+
+    compute_times['simulate'] = timers.get_duration(
+        start_time=stage_time
+    )
+
+    flags = get_flags(
+        trajectory=trajectory,
+        settings=settings
+    )
+    _log(log_path,
+        f'Simulated {len(trajectory)} samples with {settings.simulation.integrator.name} '
+        f'in {compute_times["simulate"]:.3f} s: {flags["message"]}'
+    )
+
+    stage_time = timers.get_time()
+    paths = write_outputs(
+        trajectory=trajectory,
+        settings=settings
+    )
+
+    compute_times['write'] = timers.get_duration(
+        start_time=stage_time
+    )
+    compute_times['total'] = timers.get_duration(
+        start_time=start_time
+    )
+
+    loaders.write_json(
+        path=os.path.join(settings.output_directory, 'summary.json'),
+        data={
+            'flags': flags,
+            'compute_times': compute_times,
+            'paths': paths
+        }
+    )
+    _log(log_path, f'Wrote the outputs in {compute_times["write"]:.3f} s.')
+
+    results = {
+        'trajectory': trajectory,
+        'quadrotor': quad,
+        'paths': paths
+    }
+
+    return results, config.get('experimental_data'), compute_times, flags
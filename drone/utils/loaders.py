@@ -3,14 +3,29 @@ This module contains functions for loading data for running a
 simulation.
 """
 
+from collections.abc import ItemsView, KeysView, ValuesView
 from pathlib import Path
 
+import atexit
+import copy
 import csv
+import itertools
 import json
 import os
+import shutil
+import threading
+import time
 import numpy as np
 
-from pypetal.utils import parsers
+from drone.studies.simulation.trajectory import CHANNEL_LABELS, STATE_CHANNELS, Trajectory
+from drone.utils import schema
+
+# Byte alignment of the records in a trajectory store
+TRAJECTORY_STORE_ALIGNMENT = 64
+
+# Width reserved for string columns of HDF5 tables, which cannot grow
+# once the table exists
+HDF5_STRING_SIZE = 64
 
 def get_log_file_path(
     file_name:str,
@@ -27,16 +42,197 @@ def get_log_file_path(
 
     return log_file_path
 
+class LogWriter:
+    """
+    Buffered writer for a log file. The file handle stays open, entries
+    are collected in memory and written out once max_entries are pending
+    or flush_interval seconds have passed since the last write, and on
+    close. With background=True a daemon thread does the periodic flushes,
+    so the caller never waits on the disk between flushes.
+    """
+
+    def __init__(
+        self,
+        log_file_path: str,
+        flush_interval: float = 1.0,
+        max_entries: int = 100,
+        background: bool = False
+    ) -> None:
+        """
+        Open a log file for appending.
+        """
+
+        self.log_file_path = log_file_path
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+
+        self._file = open(log_file_path, 'a', encoding='utf-8')
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+        self._closed = threading.Event()
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(
+                target=self._flush_periodically,
+                name=f'LogWriter({os.path.basename(log_file_path)})',
+                daemon=True
+            )
+            self._thread.start()
+
+        return None
+
+    def _flush_periodically(
+        self
+    ) -> None:
+        """
+        Flush every flush_interval seconds until the writer is closed.
+        """
+
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+        return None
+
+    def write(
+        self,
+        entry: str
+    ) -> None:
+        """
+        Buffer an entry, flushing when the buffer or the interval is full.
+        """
+
+        with self._lock:
+            self._buffer.append(entry)
+            pending = len(self._buffer)
+
+        if pending >= self.max_entries or (
+            self._thread is None
+            and time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+        return None
+
+    def flush(
+        self
+    ) -> None:
+        """
+        Write all buffered entries to the file.
+        """
+
+        with self._lock:
+            if self._file.closed:
+                return None
+
+            if self._buffer:
+                self._file.write(''.join(self._buffer))
+                self._buffer.clear()
+
+            self._file.flush()
+            self._last_flush = time.monotonic()
+
+        return None
+
+    def close(
+        self
+    ) -> None:
+        """
+        Stop the background thread, flush and close the file.
+        """
+
+        self._closed.set()
+
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+        self.flush()
+
+        with self._lock:
+            self._file.close()
+
+        return None
+
+# Open buffered log writers by absolute log file path
+_LOG_WRITERS = {}
+
+def open_log(
+    log_file_path: str,
+    flush_interval: float = 1.0,
+    max_entries: int = 100,
+    background: bool = False
+) -> LogWriter:
+    """
+    Route the entries of a log file through a buffered LogWriter until
+    close_log is called. Returns the writer already open for the file, if
+    any.
+    """
+
+    key = os.path.abspath(log_file_path)
+
+    if key not in _LOG_WRITERS:
+        _LOG_WRITERS[key] = LogWriter(
+            log_file_path=log_file_path,
+            flush_interval=flush_interval,
+            max_entries=max_entries,
+            background=background
+        )
+
+    return _LOG_WRITERS[key]
+
+def close_log(
+    log_file_path: str
+) -> None:
+    """
+    Flush and close the buffered writer of a log file, if it has one.
+    """
+
+    writer = _LOG_WRITERS.pop(os.path.abspath(log_file_path), None)
+
+    if writer is not None:
+        writer.close()
+
+    return None
+
+def close_all_logs() -> None:
+    """
+    Flush and close all buffered log writers.
+    """
+
+    for log_file_path in list(_LOG_WRITERS):
+        close_log(
+            log_file_path=log_file_path
+        )
+
+    return None
+
+# Buffered entries are written out at interpreter exit, and forked worker
+# processes must not flush copies of the parent's buffers
+atexit.register(close_all_logs)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_LOG_WRITERS.clear)
+
 def add_entry_to_log(
     log_file_path:str,
     entry:str
 ) -> None:
     """
-    Add an entry to the log file.
+    Add an entry to the log file, through its buffered writer if one was
+    opened with open_log.
     """
 
     entry = "\n" + entry
 
+    writer = _LOG_WRITERS.get(os.path.abspath(log_file_path))
+
+    if writer is not None:
+        writer.write(
+            entry=entry
+        )
+
+        return None
+
     with open(log_file_path, 'a', encoding='utf-8') as log_file:
         log_file.write(
             entry
@@ -44,14 +240,63 @@ def add_entry_to_log(
 
     return None
 
+def add_record_to_metrics(
+    metrics_path:str,
+    record:dict
+) -> None:
+    """
+    Append a record to a JSON Lines metrics file, through its buffered
+    writer if one was opened with open_log. Non-finite floats are written
+    as null to keep every line valid JSON.
+    """
+
+    record = {
+        key: None if isinstance(value, float) and not np.isfinite(value) else value
+        for key, value in record.items()
+    }
+
+    line = json.dumps(record) + "\n"
+
+    writer = _LOG_WRITERS.get(os.path.abspath(metrics_path))
+
+    if writer is not None:
+        writer.write(
+            entry=line
+        )
+
+        return None
+
+    with open(metrics_path, 'a', encoding='utf-8') as metrics_file:
+        metrics_file.write(
+            line
+        )
+
+    return None
+
+def load_metrics(
+    metrics_path:str
+) -> list:
+    """
+    Load the records of a JSON Lines metrics file.
+    """
+
+    with open(metrics_path, encoding='utf-8') as metrics_file:
+        records = [json.loads(line) for line in metrics_file if line.strip()]
+
+    return records
+
 def create_log_file(
     start_time:str,
     log_file_path:str
 ) -> None:
     """
-    Create a log file.
+    Create a log file, replacing any earlier one and its buffered writer.
     """
 
+    close_log(
+        log_file_path=log_file_path
+    )
+
     with open(log_file_path, 'w', encoding='utf-8') as log_file:
         log_file.write(
             f"{start_time}: Log file created.\n"
@@ -103,18 +348,160 @@ def create_directory_with_path(
         exist_ok=True
     )
 
+def _is_number(
+    field: str
+) -> bool:
+    """
+    Check whether a CSV field parses as a number.
+    """
+
+    try:
+        float(field)
+
+    except ValueError:
+        return False
+
+    return True
+
+def read_csv_header(
+    path: Path,
+    delimiter: str = ','
+) -> list:
+    """
+    Read the column names of a CSV file, or an empty list if its first
+    row is numeric and there is no header.
+    """
+
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        first_row = next(csv.reader(csvfile, delimiter=delimiter), [])
+
+    if all(_is_number(field) for field in first_row):
+        return []
+
+    return [field.strip() for field in first_row]
+
+def _get_csv_columns(
+    header: list,
+    usecols: list = None
+) -> list:
+    """
+    Get the column indices to read, given by index or by header name.
+    """
+
+    if usecols is None:
+        return None
+
+    columns = []
+    for column in usecols:
+        if isinstance(column, str):
+            if column not in header:
+                raise ValueError(f"Column {column} is not in the CSV header {header}.")
+            column = header.index(column)
+
+        columns.append(int(column))
+
+    return columns
+
+def iter_csv_chunks(
+    path: Path,
+    chunk_rows: int = 100_000,
+    usecols: list = None,
+    dtype: type = np.float64,
+    delimiter: str = ','
+):
+    """
+    Stream a numeric CSV file as (n, k) arrays of at most chunk_rows rows,
+    so files larger than memory can be processed piece by piece. A header
+    row is detected and skipped, and usecols selects columns by index or
+    header name.
+    """
+
+    header = read_csv_header(
+        path=path,
+        delimiter=delimiter
+    )
+
+    columns = _get_csv_columns(
+        header=header,
+        usecols=usecols
+    )
+
+    with open(path, encoding='utf-8') as csvfile:
+        if header:
+            next(csvfile)
+
+        while True:
+            # The lines of one chunk are parsed by the C reader of loadtxt
+            lines = list(itertools.islice(csvfile, chunk_rows))
+
+            if not lines:
+                break
+
+            # Blank lines, such as a trailing newline, do not make a chunk
+            lines = [line for line in lines if line.strip()]
+
+            if not lines:
+                continue
+
+            yield np.loadtxt(
+                lines,
+                delimiter=delimiter,
+                usecols=columns,
+                dtype=dtype,
+                ndmin=2
+            )
+
 def load_csv(
-    path: Path
+    path: Path,
+    usecols: list = None,
+    dtype: type = None,
+    delimiter: str = ',',
+    chunk_rows: int = None
 ) -> np.ndarray:
     """
-    Load a CSV file and return it as a NumPy array.
+    Load a numeric CSV file into an (n, k) array. A header row is
+    detected and skipped, see read_csv_header for the column names, and
+    usecols selects columns by index or header name. With dtype None the
+    values are read as float64 and returned as int64 if they are all
+    integers. With chunk_rows the file is parsed in chunks of that many
+    rows to bound the parser's working memory.
     """
 
-    with open(path, newline='', encoding='utf-8') as csvfile:
-        reader = csv.reader(csvfile)
-        data = [row for row in reader]
+    read_dtype = np.float64 if dtype is None else dtype
+
+    if chunk_rows is None:
+        header = read_csv_header(
+            path=path,
+            delimiter=delimiter
+        )
+
+        data = np.loadtxt(
+            path,
+            delimiter=delimiter,
+            skiprows=1 if header else 0,
+            usecols=_get_csv_columns(
+                header=header,
+                usecols=usecols
+            ),
+            dtype=read_dtype,
+            ndmin=2
+        )
+
+    else:
+        chunks = list(iter_csv_chunks(
+            path=path,
+            chunk_rows=chunk_rows,
+            usecols=usecols,
+            dtype=read_dtype,
+            delimiter=delimiter
+        ))
+
+        data = np.concatenate(chunks) if chunks else np.empty((0, 0), dtype=read_dtype)
+
+    if dtype is None and data.size and np.all(np.isfinite(data)) and np.all(data == np.round(data)):
+        data = data.astype(np.int64)
 
-    return np.array(data)
+    return data
 
 def load_json(
     path: Path
@@ -145,45 +532,328 @@ def write_json(
             indent=4
         )
 
-def get_no_flow_rates() -> dict:
-    """
-    Get the zero flow rates in case when there is no extraction or 
-    permeation.
-    """
-
-    no_flow_rate_dict = {
-            "start_time_point":{
-                "value": 0,
-                "unit": "h"
-            },
-            "end_time_point":{
-                "value": 0,
-                "unit": "h"
-            },
-            "volume":{
-                "value": 0.0,
-                "unit": "mL"
-            },
-            "events":{
-                "enabled": False,
-                "value": np.nan,
-                "unit": np.nan
-            }
+class ConfigResolver:
+    """
+    Memoize parsed JSON files by absolute path, modification time and
+    size, so a file is only parsed again once it changes. Parsed files
+    are shared and must be treated as read-only; resolve returns a
+    LazyConfig, which copies each level before it can be modified.
+    """
+
+    def __init__(
+        self,
+        snapshot: dict = None
+    ) -> None:
+        """
+        Start with an empty cache or with the files of a snapshot.
+        """
+
+        self._cache = dict(snapshot or {})
+        self.hits = 0
+        self.misses = 0
+
+        return None
+
+    def load(
+        self,
+        path: Path
+    ):
+        """
+        Get the parsed content of a JSON file, parsing it only if it is not
+        cached or changed on disk. Files cached from a snapshot are used as
+        they are if they do not exist here.
+        """
+
+        key = os.path.abspath(path)
+
+        try:
+            stat = os.stat(key)
+            version = (stat.st_mtime_ns, stat.st_size)
+
+        except FileNotFoundError:
+            version = None
+
+        entry = self._cache.get(key)
+        if entry is not None and (version is None or entry[0] == version):
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        data = load_json(
+            path=key
+        )
+        self._cache[key] = (version, data)
+
+        return data
+
+    def resolve(
+        self,
+        config_path: Path
+    ) -> 'LazyConfig':
+        """
+        Load a configuration whose referenced files are resolved lazily on
+        first access.
+        """
+
+        return LazyConfig(
+            data=self.load(
+                path=config_path
+            ),
+            resolver=self
+        )
+
+    def snapshot(
+        self
+    ) -> dict:
+        """
+        Picklable copy of the cache for worker processes, see from_snapshot.
+        """
+
+        return dict(self._cache)
+
+    @classmethod
+    def from_snapshot(
+        cls,
+        snapshot: dict
+    ) -> 'ConfigResolver':
+        """
+        Resolver that serves the files of a snapshot without parsing them.
+        """
+
+        return cls(
+            snapshot=snapshot
+        )
+
+def _get_config_reference(
+    key: str,
+    value
+) -> tuple:
+    """
+    Get the key and path of a referenced file: {'key': {'path': file}}
+    refers to a file for 'key', and 'key_path': 'file.json' to a file for
+    'key'. Returns None for anything else.
+    """
+
+    if isinstance(value, dict) and list(value) == ['path']:
+        return key, value['path']
+
+    if key.endswith('_path') and isinstance(value, str) and value.endswith('.json'):
+        return key[:-len('_path')], value
+
+    return None
+
+class LazyConfig(dict):
+    """
+    Configuration dictionary whose referenced files, see
+    _get_config_reference, are loaded through a ConfigResolver the first
+    time their key is accessed. Referenced keys are listed by keys, len
+    and iteration before they are loaded, and items, values, dict() and
+    == load them. Nested dictionaries are wrapped and other values are
+    copied on first access, so the resolver's cached files are never
+    modified. Use to_dict for a fully resolved plain dictionary.
+    """
+
+    def __init__(
+        self,
+        data: dict,
+        resolver: ConfigResolver
+    ) -> None:
+        """
+        Wrap one level of a configuration.
+        """
+
+        super().__init__()
+
+        self._resolver = resolver
+        self._references = {}
+        # Keys whose values are private to this config
+        self._owned = set()
+
+        for key, value in data.items():
+            reference = _get_config_reference(
+                key=key,
+                value=value
+            )
+
+            if reference is not None:
+                self._references[reference[0]] = reference[1]
+
+            if reference is None or reference[0] != key:
+                super().__setitem__(key, value)
+
+        return None
+
+    def __missing__(self, key):
+        if key not in self._references:
+            raise KeyError(key)
+
+        data = self._resolver.load(
+            path=self._references.pop(key)
+        )
+
+        # A file holding a single entry named after its key is unwrapped
+        if isinstance(data, dict) and list(data) == [key]:
+            data = data[key]
+
+        super().__setitem__(key, data)
+
+        return self[key]
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+
+        if key in self._owned:
+            return value
+
+        if type(value) is dict:
+            value = LazyConfig(
+                data=value,
+                resolver=self._resolver
+            )
+
+        else:
+            value = copy.deepcopy(value)
+
+        super().__setitem__(key, value)
+        self._owned.add(key)
+
+        return value
+
+    def __contains__(self, key):
+        return super().__contains__(key) or key in self._references
+
+    def __setitem__(self, key, value):
+        self._references.pop(key, None)
+        self._owned.add(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        if self._references.pop(key, None) is None:
+            super().__delitem__(key)
+
+        self._owned.discard(key)
+
+    def __iter__(self):
+        yield from super().__iter__()
+        yield from list(self._references)
+
+    def __len__(self):
+        return super().__len__() + len(self._references)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyConfig):
+            other = other.to_dict()
+
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __reduce__(self):
+        # Copies and pickles are plain, fully resolved dictionaries
+        return dict, (self.to_dict(),)
+
+    def keys(self):
+        return KeysView(self)
+
+    def items(self):
+        return ItemsView(self)
+
+    def values(self):
+        return ValuesView(self)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+
+        except KeyError:
+            return default
+
+    def pop(self, key, *default):
+        if key not in self:
+            if default:
+                return default[0]
+
+            raise KeyError(key)
+
+        value = self[key]
+        del self[key]
+
+        return value
+
+    def to_dict(
+        self
+    ) -> dict:
+        """
+        Resolve every reference and return plain nested dictionaries.
+        """
+
+        return {
+            key: value.to_dict() if isinstance(value, LazyConfig) else value
+            for key, value in self.items()
         }
 
-    return no_flow_rate_dict
+# Resolver shared by the loaders of this process
+_CONFIG_RESOLVER = ConfigResolver()
+
+def get_config_resolver() -> ConfigResolver:
+    """
+    Get the configuration resolver of this process.
+    """
+
+    return _CONFIG_RESOLVER
+
+def install_config_snapshot(
+    snapshot: dict
+) -> None:
+    """
+    Seed the resolver of this process with a snapshot of another one,
+    e.g. as the initializer of a process pool.
+    """
+
+    global _CONFIG_RESOLVER
+    _CONFIG_RESOLVER = ConfigResolver.from_snapshot(
+        snapshot=snapshot
+    )
+
+    return None
+
+def load_cached_json(
+    path: Path
+):
+    """
+    Load a JSON file through the resolver of this process. The result is
+    a copy, which the caller may modify.
+    """
+
+    return copy.deepcopy(_CONFIG_RESOLVER.load(
+        path=path
+    ))
+
+def resolve_config(
+    config_path: Path
+) -> LazyConfig:
+    """
+    Load a configuration file whose referenced files are only read when
+    they are first accessed, through the resolver of this process.
+    """
+
+    return _CONFIG_RESOLVER.resolve(
+        config_path=config_path
+    )
 
 def load_config(
     config_path: Path
-) -> dict:
+) -> LazyConfig:
     """
-    Load the configuration file.
+    Load the configuration file. Referenced files are read when they are
+    first accessed, see resolve_config.
     """
 
     # Check if the configuration file exists.
     try:
-        config = load_json(
-            path=config_path
+        config = resolve_config(
+            config_path=config_path
         )
 
     except Exception as exc:
@@ -192,259 +862,673 @@ def load_config(
 
     return config
 
-def _get_simulation_parameters(
+def _get_experimental_data(
     config: dict
 ) -> dict:
     """
-    Get the simulation parameters.
+    Get the experimental data, which is read when it is first accessed.
     """
 
-    # Check if the path for the simulation parameters is defined.
-    try:
-        sim_params_path = config['parameters']['path']
+    exp_data_path = config.pop('experimental_data_path', None)
 
-        params = load_json(
-            path=sim_params_path
-        )
+    if 'experimental_data' in config:
+        return config
 
-        config['parameters'] = params
+    if exp_data_path is None:
+        print('\nExperimental data not provided. '
+            'No experimental data will be plotted.\n')
 
-    except Exception as exc:
-        print('Simulation parameters not defined.')
-        raise FileNotFoundError from exc
+        config['experimental_data'] = None
+
+    else:
+        config['experimental_data'] = load_cached_json(
+            path=exp_data_path
+        )
 
     return config
 
-def _get_initial_conditions_from_json(
-    config: dict
+def load_data(
+    config_path: Path
 ) -> dict:
     """
-    Get the initial conditions.
+    Load the data for running a simulation. Every file is parsed once per
+    process and then served from the resolver cache until it changes on
+    disk, and referenced files that validation does not need, such as
+    the experimental data, are only read when they are first accessed.
+    Simulation configs are validated against the schema here, so mistakes
+    surface before a long run, as are the estimation settings.
     """
 
-    # Check if the path for the initial conditions is defined.
-    try:
-        init_cond_path = config['initial_conditions']['path']
+    config = load_config(
+        config_path=config_path
+    )
+
+    if config['workflow'] == 'estimation':
+        simulation_config_path \
+            = Path(config.pop('simulation_config_path'))
 
-        init_cond = load_json(
-            path=init_cond_path
+        config['simulation_config'] = load_data(
+            config_path=simulation_config_path
         )
 
-        config['initial_conditions'] = init_cond['initial_conditions']
+        # A historical parameter set is optional
+        historical_parameter_set_path \
+            = config.pop('historical_parameter_set_path', None)
 
-    except Exception as exc:
-        raise ValueError('Initial conditions must be defined.') from exc
+        if historical_parameter_set_path is not None and 'historical_parameter_set' not in config:
+            config['historical_parameter_set'] = load_cached_json(
+                path=Path(historical_parameter_set_path)
+            )
+
+        elif 'historical_parameter_set' not in config:
+            config['historical_parameter_set'] = None
+
+        schema.EstimationConfig.from_config(
+            section=config.get('estimation', {})
+        )
+
+    elif config['workflow'] == 'simulation':
+        schema.QuadrotorConfig.from_config(
+            config=config
+        )
+
+    config = _get_experimental_data(
+        config=config
+    )
 
     return config
 
-def _get_feed_schedule(
-    config: dict
-) -> dict:
+class TrajectoryWriter:
     """
-    Get the feed schedule.
+    Stream trajectories into an on-disk store: one flat binary file that
+    the records are appended to, and a JSON index mapping each run id to
+    the byte offset, shape, dtype and parameters of its record. Only the
+    record being written is ever held in memory.
     """
 
-    # Check if the path for the feed schedule is defined.
-    try:
-        feed_schedule_path \
-            = config['stream_model']['feed_schedule']['path']
-
-        feed_schedule =  load_json(
-            path=feed_schedule_path
+    def __init__(
+        self,
+        directory: str,
+        mode: str = 'w'
+    ) -> None:
+        """
+        Open a store for writing. Mode 'w' starts a new store and 'a'
+        appends to an existing one.
+        """
+
+        if mode not in ('w', 'a'):
+            raise ValueError(f"Unknown trajectory store mode: {mode}.")
+
+        self.directory = directory
+        self.data_path = os.path.join(directory, 'trajectories.bin')
+        self.index_path = os.path.join(directory, 'index.json')
+
+        os.makedirs(
+            directory,
+            exist_ok=True
         )
 
-        config['stream_model']['feed_schedule'] \
-            = feed_schedule['feed_schedule']
+        self.index = {}
+        if mode == 'a' and os.path.exists(self.index_path):
+            self.index = load_json(
+                path=self.index_path
+            )
+
+        self._file = open(self.data_path, 'ab' if mode == 'a' else 'wb')
+
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write_array(
+        self,
+        array: np.ndarray
+    ) -> int:
+        """
+        Append an array at the next aligned offset and return the offset.
+        """
+
+        offset = self._file.tell()
+        padding = -offset % TRAJECTORY_STORE_ALIGNMENT
+
+        self._file.write(bytes(padding))
+        self._file.write(np.ascontiguousarray(array).tobytes())
+
+        return offset + padding
+
+    def write(
+        self,
+        run_id,
+        t: np.ndarray,
+        data: np.ndarray,
+        channels: dict = None,
+        parameters: dict = None,
+        info: dict = None
+    ) -> dict:
+        """
+        Append one trajectory, its (T,) times and (C,T) data, to the store.
+        Channels map names to [start, stop) rows of data.
+        """
+
+        t = np.asarray(t, dtype=float)
+        data = np.asarray(data)
+
+        key = str(run_id)
+        if key in self.index:
+            raise ValueError(f"Run {run_id} is already in the trajectory store.")
+
+        entry = {
+            't_offset': self._write_array(
+                array=t
+            ),
+            'offset': self._write_array(
+                array=data
+            ),
+            'length': t.size,
+            'shape': list(data.shape),
+            'dtype': data.dtype.str,
+            'nbytes': data.nbytes,
+            'channels': channels or {},
+            'parameters': parameters or {},
+            'info': info or {}
+        }
 
-    except Exception as exc:
-        raise ValueError('\nFeed schedule must be defined.\n') from exc
+        self.index[key] = entry
 
-    return config
+        return entry
 
-def _get_extr_schedule(
-    config: dict
-) -> dict:
-    """
-    Get the extraction schedule.
-    """
+    def write_trajectory(
+        self,
+        run_id,
+        trajectory: Trajectory,
+        parameters: dict = None
+    ) -> dict:
+        """
+        Append a Trajectory with its channel layout and solver status.
+        """
 
-    # Check if the path for the extraction schedule is defined.
-    try:
-        extract_schedule_path \
-            = config['stream_model']['extract_schedule']['path']
+        channels = {
+            name: [rows.start, rows.stop] for name, rows in trajectory.channels.items()
+        }
 
-        extr_schedule = load_json(
-            path=extract_schedule_path
+        info = {
+            'success': bool(trajectory.success),
+            'status': int(trajectory.status)
+        }
+
+        return self.write(
+            run_id=run_id,
+            t=trajectory.t,
+            data=trajectory.data,
+            channels=channels,
+            parameters=parameters,
+            info=info
         )
 
-        config['stream_model']['extract_schedule'] \
-            = extr_schedule['extr_schedule']
+    def flush(
+        self
+    ) -> None:
+        """
+        Flush the data file and rewrite the index atomically, so that a
+        reader never sees entries whose data is not on disk.
+        """
 
-    except (KeyError, TypeError) as e:
-        message = (f'\nStream Model: Extraction schedule not defined. '
-            f'No samples will be extracted.\n{e}')
-        print(message)
+        self._file.flush()
 
-        config['stream_model']['extract_schedule'] = {}
+        tmp_path = self.index_path + '.tmp'
+        write_json(
+            path=tmp_path,
+            data=self.index
+        )
+        os.replace(tmp_path, self.index_path)
 
-    return config
+        return None
 
-def _get_perm_schedule(
-    config: dict
-) -> dict:
+    def close(
+        self
+    ) -> None:
+        """
+        Flush and close the store.
+        """
+
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+        return None
+
+class TrajectoryReader:
     """
-    Get the permeate schedule.
+    Read trajectories from a store written by TrajectoryWriter. The data
+    file is memory-mapped once, and records are returned as read-only
+    views into it, so only the pages that are sliced are loaded.
     """
 
-    # Check if the path for the permeate schedule is defined.
-    try:
-        permeate_schedule_path \
-            = config['stream_model']['permeate_schedule']['path']
+    def __init__(
+        self,
+        directory: str
+    ) -> None:
+        """
+        Open a store for reading.
+        """
+
+        self.directory = directory
+        self.index = load_json(
+            path=os.path.join(directory, 'index.json')
+        )
 
-        perm_schedule = load_json(
-            path=permeate_schedule_path
+        data_path = os.path.join(directory, 'trajectories.bin')
+        self._buffer = None
+        if os.path.getsize(data_path) > 0:
+            self._buffer = np.memmap(
+                data_path,
+                dtype=np.uint8,
+                mode='r'
+            )
+
+        return None
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, run_id):
+        return str(run_id) in self.index
+
+    @property
+    def run_ids(self) -> list:
+        """
+        Run ids in the order they were written.
+        """
+
+        return list(self.index.keys())
+
+    def _view(
+        self,
+        offset: int,
+        dtype: np.dtype,
+        shape: tuple
+    ) -> np.ndarray:
+        """
+        View of an array in the memory-mapped data file.
+        """
+
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+
+        return self._buffer[offset:offset + nbytes].view(dtype).reshape(shape)
+
+    def entry(
+        self,
+        run_id
+    ) -> dict:
+        """
+        Index entry of a run.
+        """
+
+        try:
+            return self.index[str(run_id)]
+
+        except KeyError as exc:
+            raise KeyError(f"Run {run_id} is not in the trajectory store.") from exc
+
+    def parameters(
+        self,
+        run_id
+    ) -> dict:
+        """
+        Parameters recorded with a run.
+        """
+
+        return self.entry(
+            run_id=run_id
+        )['parameters']
+
+    def read_times(
+        self,
+        run_id
+    ) -> np.ndarray:
+        """
+        Output times of a run as a memory-mapped view.
+        """
+
+        entry = self.entry(
+            run_id=run_id
         )
 
-        config['stream_model']['permeate_schedule'] \
-            = perm_schedule['perm_schedule']
+        return self._view(
+            offset=entry['t_offset'],
+            dtype=np.float64,
+            shape=(entry['length'],)
+        )
 
-    except (KeyError, TypeError):
-        message = ('\nStream Model: Permeate schedule not defined.\n'
-            'No permeation will happen.\n')
-        print(message)
+    def read(
+        self,
+        run_id,
+        channel: str = None,
+        time_slice: slice = None
+    ) -> np.ndarray:
+        """
+        The (C,T) data of a run as a memory-mapped view, optionally
+        restricted to one named channel and a slice of the output times.
+        Nothing is copied until the result is computed with.
+        """
+
+        entry = self.entry(
+            run_id=run_id
+        )
 
-        config['stream_model']['permeate_schedule'] = {}
+        data = self._view(
+            offset=entry['offset'],
+            dtype=entry['dtype'],
+            shape=tuple(entry['shape'])
+        )
 
-    return config
+        if channel is not None:
+            if channel not in entry['channels']:
+                raise KeyError(f"Channel {channel} was not stored for run {run_id}.")
+            start, stop = entry['channels'][channel]
+            data = data[start:stop]
 
-def _get_natural_constants(
-    config: dict
-) -> dict:
-    """
-    Get the natural constants.
-    """
+        if time_slice is not None:
+            data = data[:, time_slice]
 
-    natural_constants \
-        = load_config(
-        config_path=Path('data/natural_constants.json')
-    )
+        return data
 
-    config['natural_constants'] = natural_constants
+    def read_trajectory(
+        self,
+        run_id
+    ) -> Trajectory:
+        """
+        A run as a Trajectory. The state is wrapped without a copy when no
+        inputs were stored.
+        """
 
-    return config
+        entry = self.entry(
+            run_id=run_id
+        )
 
-def _get_experimental_data(
-    config: dict
-) -> dict:
+        data = self.read(
+            run_id=run_id
+        )
+
+        inputs = {
+            name: data[start:stop] for name, (start, stop) in entry['channels'].items()
+            if start >= 12
+        }
+
+        return Trajectory(
+            self.read_times(
+                run_id=run_id
+            ),
+            data[:12],
+            **inputs,
+            **entry['info']
+        )
+
+def load_flight_logs(
+    path: str
+) -> list:
     """
-    Get the experimental data.
+    Load recorded flights as Trajectories with their rotor speeds. A
+    directory is read as a trajectory store with one flight per run, e.g.
+    the output of a simulation with record_inputs, and a CSV file as one
+    flight with a column 't' and the state and rotor speed columns named
+    as in the tabular exports (x, ..., r, omega_1, ..., omega_4).
     """
 
-    try:
-        exp_data_path = config['experimental_data_path']
-
-        exp_data = load_json(
-            path=exp_data_path
+    if os.path.isdir(path):
+        reader = TrajectoryReader(
+            directory=path
         )
 
-        config['experimental_data'] = exp_data
+        flights = [
+            reader.read_trajectory(run_id=run_id) for run_id in reader.run_ids
+        ]
 
-        del config['experimental_data_path']
+        for run_id, flight in zip(reader.run_ids, flights):
+            if flight.rotor_speeds is None:
+                raise ValueError(f'{path}: run {run_id} has no recorded rotor speeds.')
 
-    except (KeyError, TypeError) as e:
-        print('\nExperimental data not provided. '
-            'No experimental data will be plotted.\n'
-            f'{e}')
+        return flights
 
-        config['experimental_data'] = None
+    state_columns = [label for name in STATE_CHANNELS for label in CHANNEL_LABELS[name]]
 
-    return config
+    data = load_csv(
+        path=path,
+        usecols=['t', *state_columns, *CHANNEL_LABELS['rotor_speeds']],
+        dtype=np.float64
+    )
 
-def _get_metabolism_data(
-    config: dict
-) -> dict:
+    flight = Trajectory(
+        data[:, 0],
+        data[:, 1:13].T,
+        rotor_speeds=data[:, 13:].T
+    )
+
+    return [flight]
+
+def _import_pandas():
     """
-    Get the metabolism data matrix.
+    Import pandas, which is only needed for tabular exports.
     """
 
     try:
-        config = parsers.setup_flux_balance_analysis(
-            config=config,
-            metabolism_path=config['metabolism_path']
-        )
+        import pandas as pd
 
-    except (KeyError, TypeError) as e:
-        print('\nMetabolism data not provided. '
-            'No stoichiometric layer will be simulated.\n'
-            f'{e}')
+    except ImportError as exc:
+        raise ImportError(
+            'Exporting simulation results requires pandas, plus pyarrow '
+            'for Parquet or PyTables for HDF5.'
+        ) from exc
 
-    return config
+    return pd
 
-def load_data(
-    config_path: Path
+def _get_export_format(
+    path: str,
+    file_format: str = None
+) -> str:
+    """
+    Get the export format, inferred from the extension if not given.
+    """
+
+    if file_format is None:
+        extension = os.path.splitext(path)[1].lower()
+        file_format = 'hdf5' if extension in ('.h5', '.hdf5') else 'parquet'
+
+    if file_format not in ('parquet', 'hdf5'):
+        raise ValueError(f"Unknown export format: {file_format}.")
+
+    return file_format
+
+def flatten_parameters(
+    parameters: dict,
+    prefix: str = ''
 ) -> dict:
     """
-    Load the data for running a simulation.
+    Flatten nested parameters into scalar columns, e.g. {'airframe':
+    {'kf': [1, 2]}} into {'airframe.kf[0]': 1.0, 'airframe.kf[1]': 2.0}.
+    Numbers become floats so that the column types of appended parts
+    agree.
     """
 
-    config = load_config(
-        config_path=config_path
-    )
+    flat = {}
 
-    if config['workflow'] == 'estimation':
-        simulation_config_path \
-            = Path(config['simulation_config_path'])
+    for key, value in parameters.items():
+        name = f'{prefix}{key}'
 
-        sim_config = load_data(
-            config_path=simulation_config_path
-        )
+        if isinstance(value, dict):
+            flat.update(flatten_parameters(
+                parameters=value,
+                prefix=f'{name}.'
+            ))
 
-        config['simulation_config'] = sim_config
-        config.pop('simulation_config_path')
+        elif isinstance(value, (list, tuple, np.ndarray)):
+            for index, item in np.ndenumerate(np.asarray(value)):
+                flat[name + ''.join(f'[{i}]' for i in index)] = _as_column_value(
+                    value=item.item()
+                )
 
-        historical_parameter_set_path \
-            = Path(config['historical_parameter_set_path'])
+        else:
+            flat[name] = _as_column_value(
+                value=value
+            )
 
-        historical_parameter_set \
-            = load_json(
-            path=historical_parameter_set_path
-        )
+    return flat
 
-        config['historical_parameter_set'] = historical_parameter_set
-        config.pop('historical_parameter_set_path')
+def _as_column_value(
+    value
+):
+    """
+    Cast numbers other than booleans to float.
+    """
 
-        return config
+    if isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_)):
+        return float(value)
 
-    config = _get_simulation_parameters(
-        config=config
-    )
+    return value
 
-    config = _get_natural_constants(
-        config=config
-    )
+def export_simulation_results(
+    path: str,
+    results: list,
+    mode: str = 'a',
+    file_format: str = None,
+    compression: str = 'zstd',
+    chunk_rows: int = 100_000
+) -> dict:
+    """
+    Export simulation results to compressed, chunked columnar storage for
+    dashboards. Results are (run_id, trajectory, parameters) tuples and are
+    written as two tables: 'samples', one row per run and output time with
+    a column per stored state and input row, and 'runs', one row per run
+    with its status and flattened parameters.
+
+    Parquet (the default, or any path not ending in .h5/.hdf5) is a
+    directory with one part file per call under samples/ and runs/, which
+    pandas reads back as one table. HDF5 is a single file of appendable
+    tables. Mode 'a' appends to an existing export and 'w' replaces it.
+    All runs of an export must store the same channels.
+    """
 
-    config = _get_initial_conditions_from_json(
-        config=config
-    )
+    pd = _import_pandas()
 
-    config = _get_metabolism_data(
-        config=config
+    file_format = _get_export_format(
+        path=path,
+        file_format=file_format
     )
 
-    config = _get_feed_schedule(
-        config=config
-    )
+    if mode not in ('w', 'a'):
+        raise ValueError(f"Unknown export mode: {mode}.")
+
+    samples = []
+    runs = []
+
+    for run_id, trajectory, parameters in results:
+        samples.append(pd.DataFrame({
+            'run_id': np.full(len(trajectory), run_id),
+            't': trajectory.t,
+            **trajectory.columns()
+        }))
+
+        runs.append({
+            'run_id': run_id,
+            'success': bool(trajectory.success),
+            'status': int(trajectory.status),
+            'n_samples': len(trajectory),
+            **flatten_parameters(
+                parameters=parameters or {}
+            )
+        })
+
+    tables = {
+        'samples': pd.concat(samples, ignore_index=True),
+        'runs': pd.DataFrame(runs)
+    }
+
+    if file_format == 'parquet':
+        if mode == 'w' and os.path.exists(path):
+            shutil.rmtree(path)
+
+        for name, table in tables.items():
+            table_directory = os.path.join(path, name)
+            os.makedirs(
+                table_directory,
+                exist_ok=True
+            )
+
+            n_parts = len([
+                file_name for file_name in os.listdir(table_directory)
+                if file_name.endswith('.parquet')
+            ])
+
+            table.to_parquet(
+                os.path.join(table_directory, f'part-{n_parts:05d}.parquet'),
+                index=False,
+                compression=compression,
+                row_group_size=chunk_rows
+            )
+
+    else:
+        if mode == 'w' and os.path.exists(path):
+            os.remove(path)
+
+        with pd.HDFStore(path, mode='a', complevel=5, complib=f'blosc:{compression}') as store:
+            for name, table in tables.items():
+                strings = {
+                    column: HDF5_STRING_SIZE for column in table.columns
+                    if table[column].dtype == object
+                }
+
+                store.append(
+                    name,
+                    table,
+                    format='table',
+                    index=False,
+                    data_columns=['run_id'],
+                    min_itemsize=strings or None,
+                    chunksize=chunk_rows
+                )
+
+    return {
+        name: len(table) for name, table in tables.items()
+    }
+
+def read_simulation_results(
+    path: str,
+    table: str = 'samples',
+    run_ids: list = None,
+    columns: list = None,
+    file_format: str = None
+):
+    """
+    Read a table of an export written by export_simulation_results into a
+    DataFrame, optionally only some runs and columns. The selection is
+    pushed down to the storage, so unselected data is not read.
+    """
 
-    config = _get_extr_schedule(
-        config=config
-    )
+    pd = _import_pandas()
 
-    config = _get_perm_schedule(
-        config=config
+    file_format = _get_export_format(
+        path=path,
+        file_format=file_format
     )
 
-    config = _get_experimental_data(
-        config=config
-    )
+    if file_format == 'parquet':
+        return pd.read_parquet(
+            os.path.join(path, table),
+            columns=columns,
+            filters=None if run_ids is None else [('run_id', 'in', list(run_ids))]
+        )
 
-    return config
+    where = None if run_ids is None else f'run_id in {list(run_ids)}'
+
+    # Every append restarts the stored index, so it is not meaningful
+    return pd.read_hdf(
+        path,
+        key=table,
+        where=where,
+        columns=columns
+    ).reset_index(drop=True)
@@ -0,0 +1,61 @@
+"""
+This module contains the functions for plotting simulation results.
+"""
+
+def _import_pyplot():
+    """
+    Import matplotlib's pyplot with a non-interactive backend, which is
+    only needed when plots are requested.
+    """
+
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
+    except ImportError as exc:
+        raise ImportError(
+            'Plotting simulation results requires matplotlib.'
+        ) from exc
+
+    return plt
+
+def plot_trajectory(
+    trajectory,
+    path: str
+) -> None:
+    """
+    Plot the position, velocity, attitude and body rates of a trajectory
+    against time and save the figure to a file.
+    """
+
+    plt = _import_pyplot()
+
+    fig, axes = plt.subplots(
+        4, 1,
+        sharex=True,
+        figsize=(8, 10)
+    )
+
+    panels = (
+        ('position', 'Position (m)', ('x', 'y', 'z')),
+        ('velocity', 'Velocity (m/s)', ('vx', 'vy', 'vz')),
+        ('euler', 'Attitude (rad)', ('phi', 'theta', 'psi')),
+        ('body_rates', 'Body rates (rad/s)', ('p', 'q', 'r'))
+    )
+
+    for ax, (name, label, legend) in zip(axes, panels):
+        for row, entry in zip(getattr(trajectory, name), legend):
+            ax.plot(trajectory.t, row, label=entry)
+
+        ax.set_ylabel(label)
+        ax.legend(loc='upper right')
+        ax.grid()
+
+    axes[-1].set_xlabel('Time (s)')
+
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+    return None
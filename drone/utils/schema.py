@@ -0,0 +1,571 @@
+"""
+This module contains the schema of the quadrotor configuration. A
+configuration is validated once into frozen, slotted dataclasses, so
+mistakes fail before a long run and hot code reads typed attributes
+instead of looking up nested dictionaries. Classes holding arrays
+compare by identity.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+INTEGRATORS = ('solve_ivp', 'rk4_fixed')
+ATTITUDES = ('euler', 'quaternion')
+STORAGE_DTYPES = ('float64', 'float32')
+SOLVE_IVP_METHODS = ('RK45', 'RK23', 'DOP853', 'Radau', 'BDF', 'LSODA')
+# Keyword arguments of the event factories, the first of setpoint_reached is required
+EVENT_OPTIONS = {
+    'ground_contact': ('z_ground', 'terminal'),
+    'attitude_singularity': ('margin', 'terminal'),
+    'divergence': ('max_position', 'max_velocity', 'max_rate', 'terminal'),
+    'setpoint_reached': ('setpoint', 'position_tol', 'velocity_tol', 'terminal')
+}
+EVENTS = tuple(EVENT_OPTIONS)
+IDENTIFIABLE_PARAMETERS = ('kf', 'km', 'Cd', 'Ctau', 'I_body')
+
+class ConfigError(ValueError):
+    """
+    A configuration does not match the schema. The message starts with
+    the dotted path of the offending entry.
+    """
+
+def _get(
+    section: dict,
+    key: str,
+    path: str,
+    default=...
+):
+    """
+    Get an entry of a section, which is required if there is no default.
+    """
+
+    if not isinstance(section, dict):
+        raise ConfigError(f'{path}: expected a mapping, got {type(section).__name__}.')
+
+    if key in section and section[key] is not None:
+        return section[key]
+
+    if default is ...:
+        raise ConfigError(f'{path}.{key}: required entry is missing.')
+
+    return default
+
+def _check_keys(
+    section: dict,
+    allowed: tuple,
+    path: str
+) -> None:
+    """
+    Reject entries the schema does not know, which are usually typos.
+    """
+
+    if not isinstance(section, dict):
+        raise ConfigError(f'{path}: expected a mapping, got {type(section).__name__}.')
+
+    unknown = sorted(set(section) - set(allowed))
+
+    if unknown:
+        raise ConfigError(f'{path}: unknown entries {unknown}, expected some of {list(allowed)}.')
+
+    return None
+
+def _array(
+    value,
+    shape: tuple,
+    path: str
+) -> np.ndarray:
+    """
+    Convert a value to a read-only float array of the given shape.
+    """
+
+    try:
+        array = np.array(value, dtype=float)
+
+    except (TypeError, ValueError) as exc:
+        raise ConfigError(f'{path}: expected numbers, got {value!r}.') from exc
+
+    if array.shape != shape:
+        raise ConfigError(f'{path}: expected shape {shape}, got {array.shape}.')
+
+    if not np.all(np.isfinite(array)):
+        raise ConfigError(f'{path}: values must be finite.')
+
+    array.flags.writeable = False
+
+    return array
+
+def _choice(
+    value: str,
+    choices: tuple,
+    path: str
+) -> str:
+    """
+    Check that a value is one of the allowed choices.
+    """
+
+    if value not in choices:
+        raise ConfigError(f'{path}: expected one of {choices}, got {value!r}.')
+
+    return value
+
+def _positive(
+    value,
+    path: str
+) -> float:
+    """
+    Check that a value is a positive number.
+    """
+
+    try:
+        value = float(value)
+
+    except (TypeError, ValueError) as exc:
+        raise ConfigError(f'{path}: expected a number, got {value!r}.') from exc
+
+    if not value > 0:
+        raise ConfigError(f'{path}: must be positive, got {value}.')
+
+    return value
+
+@dataclass(frozen=True, slots=True, eq=False)
+class AirframeConfig:
+    """
+    Geometry, motors, mass distribution and drag of an airframe.
+    """
+
+    # Motors
+    rotor_positions: np.ndarray
+    kf: np.ndarray
+    km: np.ndarray
+    rotor_dirs: np.ndarray
+
+    # Inertia
+    masses_positions: tuple
+    I_body: np.ndarray
+
+    # Drag
+    Cd: np.ndarray
+    Ctau: np.ndarray
+
+    @classmethod
+    def from_config(
+        cls,
+        section: dict,
+        path: str = 'airframe'
+    ) -> 'AirframeConfig':
+        """
+        Validate the airframe section of a configuration.
+        """
+
+        _check_keys(
+            section=section,
+            allowed=('rotor_positions', 'kf', 'km', 'rotor_dirs', 'masses_positions', 'I_body', 'Cd', 'Ctau'),
+            path=path
+        )
+
+        masses_positions = _get(section, 'masses_positions', path)
+        if not isinstance(masses_positions, (list, tuple)) or not masses_positions:
+            raise ConfigError(f'{path}.masses_positions: expected a list of [mass, [x, y, z]].')
+
+        parts = []
+        for i, part in enumerate(masses_positions):
+            part_path = f'{path}.masses_positions[{i}]'
+
+            if not isinstance(part, (list, tuple)) or len(part) != 2:
+                raise ConfigError(f'{part_path}: expected [mass, [x, y, z]], got {part!r}.')
+
+            parts.append((
+                _positive(part[0], part_path),
+                _array(part[1], (3,), part_path)
+            ))
+
+        kf = _array(_get(section, 'kf', path), (4,), f'{path}.kf')
+        if np.any(kf <= 0):
+            raise ConfigError(f'{path}.kf: thrust coefficients must be positive.')
+
+        rotor_dirs = _array(_get(section, 'rotor_dirs', path, [1, -1, 1, -1]), (4,), f'{path}.rotor_dirs')
+        if not np.all(np.abs(rotor_dirs) == 1):
+            raise ConfigError(f'{path}.rotor_dirs: spin directions must be 1 or -1.')
+
+        return cls(
+            rotor_positions=_array(_get(section, 'rotor_positions', path), (4, 3), f'{path}.rotor_positions'),
+            kf=kf,
+            km=_array(_get(section, 'km', path), (4,), f'{path}.km'),
+            rotor_dirs=rotor_dirs,
+            masses_positions=tuple(parts),
+            I_body=_array(_get(section, 'I_body', path), (3, 3), f'{path}.I_body'),
+            Cd=_array(_get(section, 'Cd', path, np.zeros((3, 3))), (3, 3), f'{path}.Cd'),
+            Ctau=_array(_get(section, 'Ctau', path, np.zeros((3, 3))), (3, 3), f'{path}.Ctau')
+        )
+
+@dataclass(frozen=True, slots=True, eq=False)
+class ControllerConfig:
+    """
+    PID gains, setpoint and optional sampling rate of the controller.
+    """
+
+    kp_pos: np.ndarray
+    kd_pos: np.ndarray
+    kp_ang: np.ndarray
+    kd_ang: np.ndarray
+    setpoint: np.ndarray
+    rate_hz: float = None
+
+    @classmethod
+    def from_config(
+        cls,
+        section: dict,
+        path: str = 'controller'
+    ) -> 'ControllerConfig':
+        """
+        Validate the controller section of a configuration.
+        """
+
+        _check_keys(
+            section=section,
+            allowed=('kp_pos', 'kd_pos', 'kp_ang', 'kd_ang', 'setpoint', 'rate_hz'),
+            path=path
+        )
+
+        gains = {
+            name: _array(_get(section, name, path, default), (3,), f'{path}.{name}')
+            for name, default in (
+                ('kp_pos', [1.0, 1.0, 15.0]),
+                ('kd_pos', [2.0, 2.0, 7.0]),
+                ('kp_ang', [200.0, 200.0, 100.0]),
+                ('kd_ang', [20.0, 20.0, 10.0])
+            )
+        }
+
+        rate_hz = _get(section, 'rate_hz', path, None)
+
+        return cls(
+            **gains,
+            setpoint=_array(_get(section, 'setpoint', path, np.zeros(6)), (6,), f'{path}.setpoint'),
+            rate_hz=None if rate_hz is None else _positive(rate_hz, f'{path}.rate_hz')
+        )
+
+@dataclass(frozen=True, slots=True)
+class IntegratorConfig:
+    """
+    Integrator settings of a simulation.
+    """
+
+    name: str = 'solve_ivp'
+    method: str = 'RK45'
+    dt: float = None
+    attitude: str = 'euler'
+
+    @classmethod
+    def from_config(
+        cls,
+        section: dict,
+        path: str = 'simulation'
+    ) -> 'IntegratorConfig':
+        """
+        Validate the integrator entries of the simulation section.
+        """
+
+        name = _choice(_get(section, 'integrator', path, 'solve_ivp'), INTEGRATORS, f'{path}.integrator')
+
+        dt = _get(section, 'dt', path, None)
+        if dt is not None:
+            dt = _positive(dt, f'{path}.dt')
+        elif name == 'rk4_fixed':
+            raise ConfigError(f'{path}.dt: required by the rk4_fixed integrator.')
+
+        return cls(
+            name=name,
+            method=_choice(_get(section, 'method', path, 'RK45'), SOLVE_IVP_METHODS, f'{path}.method'),
+            dt=dt,
+            attitude=_choice(_get(section, 'attitude', path, 'euler'), ATTITUDES, f'{path}.attitude')
+        )
+
+def _check_event_options(
+    name: str,
+    options: dict,
+    path: str
+) -> None:
+    """
+    Check the options of an event against the keyword arguments of its
+    factory, so a misspelled option fails here rather than when the
+    events are built.
+    """
+
+    _check_keys(
+        section=options,
+        allowed=EVENT_OPTIONS[name],
+        path=path
+    )
+
+    for key, value in options.items():
+        if key == 'terminal':
+            if not isinstance(value, bool):
+                raise ConfigError(f'{path}.terminal: expected true or false, got {value!r}.')
+
+        elif key == 'setpoint':
+            if np.ndim(value) != 1 or len(value) < 3:
+                raise ConfigError(f'{path}.setpoint: expected at least a position, got {value!r}.')
+            _array(value, (len(value),), f'{path}.setpoint')
+
+        elif key == 'z_ground':
+            _array(value, (), f'{path}.z_ground')
+
+        else:
+            _positive(value, f'{path}.{key}')
+
+    if name == 'setpoint_reached':
+        _get(options, 'setpoint', path)
+
+    return None
+
+@dataclass(frozen=True, slots=True, eq=False)
+class SimulationConfig:
+    """
+    Initial state, horizon, output grid, integrator and events of a
+    simulation, and the rotor speeds ('hover' or (4,)) when it runs open
+    loop.
+    """
+
+    x0: np.ndarray
+    t_span: tuple
+    n_eval: int
+    integrator: IntegratorConfig
+    events: tuple = ()
+    rotor_speeds: object = 'hover'
+
+    @property
+    def t_eval(self) -> np.ndarray:
+        return np.linspace(*self.t_span, self.n_eval)
+
+    @classmethod
+    def from_config(
+        cls,
+        section: dict,
+        path: str = 'simulation'
+    ) -> 'SimulationConfig':
+        """
+        Validate the simulation section of a configuration.
+        """
+
+        _check_keys(
+            section=section,
+            allowed=('x0', 't_span', 'n_eval', 'integrator', 'method', 'dt', 'attitude', 'events', 'rotor_speeds'),
+            path=path
+        )
+
+        t_span = _array(_get(section, 't_span', path), (2,), f'{path}.t_span')
+        if not t_span[1] > t_span[0]:
+            raise ConfigError(f'{path}.t_span: the end must come after the start.')
+
+        n_eval = _get(section, 'n_eval', path, 100)
+        if not isinstance(n_eval, int) or n_eval < 2:
+            raise ConfigError(f'{path}.n_eval: expected an integer of at least 2, got {n_eval!r}.')
+
+        integrator = IntegratorConfig.from_config(
+            section=section,
+            path=path
+        )
+        if integrator.dt is not None and integrator.dt > t_span[1] - t_span[0]:
+            raise ConfigError(f'{path}.dt: longer than the simulated interval.')
+
+        events = _get(section, 'events', path, {})
+        if not isinstance(events, dict):
+            raise ConfigError(f'{path}.events: expected a mapping of event names to options.')
+        for name, options in events.items():
+            _choice(name, EVENTS, f'{path}.events')
+            _check_event_options(
+                name=name,
+                options={} if options is None else options,
+                path=f'{path}.events.{name}'
+            )
+
+        # Constant rotor speeds of open-loop runs
+        rotor_speeds = _get(section, 'rotor_speeds', path, 'hover')
+        if not (isinstance(rotor_speeds, str) and rotor_speeds == 'hover'):
+            rotor_speeds = _array(rotor_speeds, (4,), f'{path}.rotor_speeds')
+
+        return cls(
+            x0=_array(_get(section, 'x0', path, np.zeros(12)), (12,), f'{path}.x0'),
+            t_span=(float(t_span[0]), float(t_span[1])),
+            n_eval=n_eval,
+            integrator=integrator,
+            events=tuple((name, dict(options or {})) for name, options in events.items()),
+            rotor_speeds=rotor_speeds
+        )
+
+@dataclass(frozen=True, slots=True)
+class OutputsConfig:
+    """
+    What a simulation writes out.
+    """
+
+    dtype: str = 'float64'
+    record_inputs: bool = True
+    store: bool = True
+    export: str = None
+    plot: bool = False
+
+    @classmethod
+    def from_config(
+        cls,
+        section: dict,
+        path: str = 'outputs'
+    ) -> 'OutputsConfig':
+        """
+        Validate the outputs section of a configuration.
+        """
+
+        _check_keys(
+            section=section,
+            allowed=('dtype', 'record_inputs', 'store', 'export', 'plot'),
+            path=path
+        )
+
+        flags = {}
+        for name, default in (('record_inputs', True), ('store', True), ('plot', False)):
+            value = _get(section, name, path, default)
+            if not isinstance(value, bool):
+                raise ConfigError(f'{path}.{name}: expected true or false, got {value!r}.')
+            flags[name] = value
+
+        export = _get(section, 'export', path, None)
+        if export is not None and not isinstance(export, str):
+            raise ConfigError(f'{path}.export: expected a file name, got {export!r}.')
+
+        return cls(
+            dtype=_choice(_get(section, 'dtype', path, 'float64'), STORAGE_DTYPES, f'{path}.dtype'),
+            export=export,
+            **flags
+        )
+
+@dataclass(frozen=True, slots=True, eq=False)
+class QuadrotorConfig:
+    """
+    A validated quadrotor configuration.
+    """
+
+    workflow: str
+    output_directory: str
+    airframe: AirframeConfig
+    simulation: SimulationConfig
+    controller: ControllerConfig = None
+    outputs: OutputsConfig = OutputsConfig()
+
+    @classmethod
+    def from_config(
+        cls,
+        config: dict
+    ) -> 'QuadrotorConfig':
+        """
+        Validate a whole configuration. Without a controller section the
+        simulation runs open loop.
+        """
+
+        controller = _get(config, 'controller', 'config', None)
+
+        return cls(
+            workflow=str(_get(config, 'workflow', 'config')),
+            output_directory=str(_get(config, 'output_directory', 'config')),
+            airframe=AirframeConfig.from_config(
+                section=_get(config, 'airframe', 'config')
+            ),
+            simulation=SimulationConfig.from_config(
+                section=_get(config, 'simulation', 'config')
+            ),
+            controller=None if controller is None else ControllerConfig.from_config(
+                section=controller
+            ),
+            outputs=OutputsConfig.from_config(
+                section=_get(config, 'outputs', 'config', {})
+            )
+        )
+
+def _integer(
+    value,
+    minimum: int,
+    path: str
+) -> int:
+    """
+    Check that a value is an integer of at least the minimum.
+    """
+
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        raise ConfigError(f'{path}: expected an integer of at least {minimum}, got {value!r}.')
+
+    return value
+
+@dataclass(frozen=True, slots=True)
+class EstimationConfig:
+    """
+    Flight logs, identified parameters and direct search settings of a
+    parameter estimation. Parameters are searched on a log scale within a
+    factor of bounds of the nominal airframe.
+    """
+
+    flight_logs: tuple
+    parameters: tuple = IDENTIFIABLE_PARAMETERS
+    bounds: float = 2.0
+    population_size: int = 40
+    n_generations: int = 200
+    mutation: float = 0.7
+    crossover: float = 0.9
+    tolerance: float = 1e-6
+    seed: int = None
+    n_workers: int = None
+
+    @classmethod
+    def from_config(
+        cls,
+        section: dict,
+        path: str = 'estimation'
+    ) -> 'EstimationConfig':
+        """
+        Validate the estimation section of a configuration.
+        """
+
+        _check_keys(
+            section=section,
+            allowed=(
+                'flight_logs', 'parameters', 'bounds', 'population_size', 'n_generations',
+                'mutation', 'crossover', 'tolerance', 'seed', 'n_workers'
+            ),
+            path=path
+        )
+
+        flight_logs = _get(section, 'flight_logs', path)
+        if isinstance(flight_logs, str):
+            flight_logs = [flight_logs]
+        if not flight_logs or not all(isinstance(log, str) for log in flight_logs):
+            raise ConfigError(f'{path}.flight_logs: expected one or more paths, got {flight_logs!r}.')
+
+        parameters = _get(section, 'parameters', path, list(IDENTIFIABLE_PARAMETERS))
+        if not parameters:
+            raise ConfigError(f'{path}.parameters: at least one parameter must be identified.')
+        for name in parameters:
+            _choice(name, IDENTIFIABLE_PARAMETERS, f'{path}.parameters')
+
+        bounds = _positive(_get(section, 'bounds', path, 2.0), f'{path}.bounds')
+        if not bounds > 1:
+            raise ConfigError(f'{path}.bounds: expected a factor above 1, got {bounds}.')
+
+        crossover = float(_get(section, 'crossover', path, 0.9))
+        if not 0 <= crossover <= 1:
+            raise ConfigError(f'{path}.crossover: expected a probability, got {crossover}.')
+
+        seed = _get(section, 'seed', path, None)
+        n_workers = _get(section, 'n_workers', path, None)
+
+        return cls(
+            flight_logs=tuple(flight_logs),
+            parameters=tuple(dict.fromkeys(parameters)),
+            bounds=bounds,
+            population_size=_integer(_get(section, 'population_size', path, 40), 4, f'{path}.population_size'),
+            n_generations=_integer(_get(section, 'n_generations', path, 200), 1, f'{path}.n_generations'),
+            mutation=_positive(_get(section, 'mutation', path, 0.7), f'{path}.mutation'),
+            crossover=crossover,
+            tolerance=float(_get(section, 'tolerance', path, 1e-6)),
+            seed=None if seed is None else _integer(seed, 0, f'{path}.seed'),
+            n_workers=None if n_workers is None else _integer(n_workers, 1, f'{path}.n_workers')
+        )
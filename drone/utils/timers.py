@@ -2,10 +2,11 @@
 This module contains the functions for handling times.
 """
 
+import os
 import time
 from datetime import datetime
 import numpy as np
-from pypetal.utils import loaders
+from drone.utils import loaders
 
 def get_time() -> float:
     """
@@ -28,10 +29,14 @@ def get_readable_time(
 
 def start_logging(
     log_path:str,
-    purpose:str
+    purpose:str,
+    buffered:bool = False,
+    background:bool = False
 ) -> float:
     """
-    This method starts the logging for a given purpose.
+    This method starts the logging for a given purpose. A buffered log
+    keeps its file open and writes entries in batches, from a background
+    thread if requested, until loaders.close_log is called.
     """
 
     start_time = get_time()
@@ -44,6 +49,12 @@ def start_logging(
         log_file_path=log_path
     )
 
+    if buffered:
+        loaders.open_log(
+            log_file_path=log_path,
+            background=background
+        )
+
     loaders.add_entry_to_log(
         log_file_path=log_path,
         entry=f'{start_time_str}: Starting ' + purpose + '.\n'
@@ -56,34 +67,124 @@ def geometric_mean_rows(
 ) -> tuple:
     """
     Calculates the geometric mean of each row in a 2D array,
-    ignoring zeros.
+    ignoring zeros. Rows without nonzero values get NaN, and the maximum
+    is taken over all nonzero values (-inf if there are none).
     """
 
-    geometric_means = []
-    max_val = -np.inf
+    data = np.asarray(data, dtype=float)
+    nonzero = data != 0
+
+    # Zeros contribute nothing to the sums of logarithms
+    logs = np.zeros_like(data)
+    np.log(data, out=logs, where=nonzero)
+
+    counts = np.count_nonzero(nonzero, axis=1)
+    with np.errstate(invalid='ignore'):
+        geometric_means = np.exp(logs.sum(axis=1) / counts)
+
+    max_val = np.max(data, where=nonzero, initial=-np.inf)
+
+    return geometric_means, max_val
+
+class GeometricMeanStatistics:
+    """
+    Streaming statistics of the row-wise geometric means of a matrix
+    that arrives in blocks of rows, e.g. the members of a generation as
+    they are evaluated. After all blocks the statistics equal those of
+    geometric_mean_rows over the whole matrix, without keeping it.
+    """
+
+    def __init__(self) -> None:
+        """
+        Start with no rows.
+        """
+
+        self.reset()
+
+        return None
+
+    def reset(
+        self
+    ) -> None:
+        """
+        Forget all rows, e.g. at the start of a generation.
+        """
+
+        self.n_rows = 0
+        self.n_valid = 0
+        self.min_geometric_mean = np.nan
+        self.max_geometric_mean = np.nan
+        self.max_val = -np.inf
+        self._sum_geometric_mean = 0.0
+
+        return None
 
-    for row in data:
-        row_no_zeros = row[row != 0]
+    def update(
+        self,
+        data: np.ndarray
+    ):
+        """
+        Add a block of rows and return the updated statistics.
+        """
 
-        if row_no_zeros.size > 0:
-            geometric_means.append(np.exp(np.mean(np.log(row_no_zeros))))
-            max_val = max(np.append(row_no_zeros, max_val))
+        data = np.asarray(data, dtype=float)
+        if data.ndim == 1:
+            data = data[None, :]
 
-        else:
-            geometric_means.append(np.nan)
+        geometric_means, max_val \
+            = geometric_mean_rows(
+                data=data
+            )
 
-    return np.array(geometric_means), max_val
+        valid = geometric_means[~np.isnan(geometric_means)]
+
+        self.n_rows += len(geometric_means)
+        self.n_valid += valid.size
+        self.max_val = np.maximum(self.max_val, max_val)
+
+        if valid.size > 0:
+            # fmin/fmax ignore the NaN of the initial state
+            self.min_geometric_mean = np.fmin(self.min_geometric_mean, valid.min())
+            self.max_geometric_mean = np.fmax(self.max_geometric_mean, valid.max())
+            self._sum_geometric_mean += valid.sum()
+
+        return self
+
+    @property
+    def mean_geometric_mean(self) -> float:
+        """
+        Mean of the geometric means of the rows that have one.
+        """
+
+        if self.n_valid == 0:
+            return np.nan
+
+        return self._sum_geometric_mean / self.n_valid
+
+def get_metrics_path(
+    log_path: str
+) -> str:
+    """
+    Get the path of the JSON Lines metrics file that accompanies a log
+    file, e.g. estimation_metrics.jsonl for estimation.log.
+    """
+
+    return os.path.splitext(log_path)[0] + '_metrics.jsonl'
 
 def update_parameter_estimation_log_direct_search(
     start_time: float,
     log_path: str,
     n_gen: int,
     solution_set: list,
-    duration: float
+    duration: float,
+    metrics_path: str = None
 ) -> float:
     """
     This method updates the log file with a given start_time, and 
-    returns an updated start_time.
+    returns an updated start_time. The same statistics are appended as
+    one JSON record per generation to the metrics file, by default the
+    one given by get_metrics_path, for monitoring without parsing the
+    log text.
     """
 
     geometric_means, max_val \
@@ -115,6 +216,25 @@ def update_parameter_estimation_log_direct_search(
         entry=log_info
     )
 
+    if metrics_path is None:
+        metrics_path = get_metrics_path(
+            log_path=log_path
+        )
+
+    loaders.add_record_to_metrics(
+        metrics_path=metrics_path,
+        record={
+            'time': curr_time,
+            'generation': int(n_gen),
+            'generation_time': float(elapsed_time),
+            'overall_time': float(duration),
+            'population_size': len(geometric_means),
+            'min_geometric_mean': float(min_geometric_mean),
+            'max_geometric_mean': float(max_geometric_mean),
+            'max_signal': float(max_val)
+        }
+    )
+
     return curr_time
 
 def get_duration(
@@ -0,0 +1,113 @@
+import unittest
+
+import numpy as np
+
+from drone.studies.design.study import PIDController
+from test_simulation_study import make_quadrotor
+
+class TestDesignStudy(unittest.TestCase):
+    """
+    This class contains the tests for the PIDController class.
+    """
+
+    def setUp(self):
+        self.quad = make_quadrotor()
+        self.pid = PIDController(self.quad)
+
+    def test_allocation_inverts_mixer(self):
+        """
+        The cached allocation matches the quadrotor's own rotor mixing and
+        its pseudo-inverse recovers the squared rotor speeds.
+        """
+
+        omega = np.array([500.0, 520.0, 480.0, 510.0])
+        wrench = np.concatenate((
+            [self.quad.kf @ omega**2], self.quad.torque_mixer @ omega**2
+        ))
+
+        np.testing.assert_allclose(self.pid.B @ omega**2, wrench)
+        np.testing.assert_allclose(self.pid.B_pinv @ wrench, omega**2, rtol=1e-8)
+
+    def test_allocation_is_cached(self):
+        """
+        Control calls reuse the allocation built for the airframe.
+        """
+
+        B_pinv = self.pid.B_pinv
+        self.pid.control(0.0, np.zeros(12), np.zeros(6))
+
+        self.assertIs(self.pid.B_pinv, B_pinv)
+
+    def test_update_allocation(self):
+        """
+        Refreshing the allocation picks up new motor coefficients and
+        rotor geometry.
+        """
+
+        self.quad.kf = 1.5 * self.quad.kf
+        self.quad.r_pos = 1.2 * self.quad.r_pos
+        self.pid.update_allocation()
+
+        np.testing.assert_allclose(self.pid.B[0], self.quad.kf)
+        np.testing.assert_allclose(self.pid.B[1], self.quad.kf * self.quad.r_pos_rel[:, 1])
+        np.testing.assert_allclose(self.pid.B_pinv, np.linalg.pinv(self.pid.B))
+
+    def test_independent_airframes(self):
+        """
+        Controllers bound to different airframes do not share state.
+        """
+
+        heavy = make_quadrotor()
+        heavy.masses_positions = heavy.masses_positions + [(0.5, np.zeros(3))]
+        heavy_pid = PIDController(heavy)
+
+        x = np.zeros(12)
+        setpoint = np.zeros(6)
+
+        self.assertGreater(
+            np.sum(heavy_pid.control(0.0, x, setpoint)**2),
+            np.sum(self.pid.control(0.0, x, setpoint)**2)
+        )
+
+    def test_hover(self):
+        """
+        The closed loop climbs to the altitude setpoint and stays level.
+        The fixed step keeps the run bounded; the attitude loop's fastest
+        pole sits near -kd_ang / I, so dt must stay well below I / kd_ang.
+        """
+
+        setpoint = np.array([0, 0, 1, 0, 0, 0])
+
+        sol = self.quad.simulate(
+            lambda t, x: self.pid.control(t, x, setpoint),
+            np.zeros(12), (0, 3), np.linspace(0, 3, 31),
+            integrator="rk4_fixed", dt=1e-3
+        )
+
+        self.assertTrue(np.all(np.isfinite(sol.y)))
+        self.assertAlmostEqual(sol.y[2, -1], 1.0, delta=0.02)
+        self.assertLess(np.max(np.abs(sol.y[6:9])), 1e-3)
+
+    def test_hover_discrete_control(self):
+        """
+        The PID sampled at 500 Hz holds the altitude setpoint with one
+        controller call per period. The default attitude gains are too stiff
+        for a 2 ms period, so softer ones are used here.
+        """
+
+        setpoint = np.array([0, 0, 1, 0, 0, 0])
+        pid = PIDController(self.quad, kp_ang=[20.0, 20.0, 10.0], kd_ang=[2.0, 2.0, 1.0])
+
+        sol = self.quad.simulate_discrete_control(
+            lambda t, x: pid.control(t, x, setpoint), 500.0,
+            np.zeros(12), (0, 3), np.linspace(0, 3, 31),
+            integrator="rk4_fixed", dt=1e-3
+        )
+
+        self.assertEqual(sol.omega.shape, (4, 1500))
+        self.assertTrue(np.all(np.isfinite(sol.y)))
+        self.assertAlmostEqual(sol.y[2, -1], 1.0, delta=0.02)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestDesignStudy)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,175 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from drone.studies.design.study import PIDController
+from drone.studies.estimation import identification
+from drone.studies.simulation.study import NonSymmetricQuadrotor
+from drone.utils import loaders
+from drone.utils import schema
+
+CONFIG_PATH = Path(__file__).resolve().parents[2] / 'configs' / 'simulation' / 'config_simulation.json'
+
+class TestIdentification(unittest.TestCase):
+    """
+    This class contains the tests for the parameter estimation.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.sim_config = loaders.load_json(
+            path=CONFIG_PATH
+        )
+        cls.nominal = NonSymmetricQuadrotor.from_config(
+            airframe=schema.AirframeConfig.from_config(
+                section=cls.sim_config['airframe']
+            )
+        )
+
+        # The airframe that flew differs from the nominal one in its
+        # thrust coefficients and translational drag
+        cls.kf = cls.nominal.kf * np.array([1.1, 0.9, 1.05, 0.95])
+        cls.Cd = np.diag(np.diag(cls.nominal.Cd) * np.array([1.5, 0.7, 1.2]))
+        quad = NonSymmetricQuadrotor(
+            cls.nominal.r_pos, cls.kf, cls.nominal.km, cls.nominal.masses_positions,
+            cls.nominal.I_body, cls.Cd, cls.nominal.Ctau, cls.nominal.rotor_dirs
+        )
+
+        # Hover with sinusoidal rotor excitation, logged every millisecond
+        pid = PIDController(quad, kp_ang=[20.0, 20.0, 10.0], kd_ang=[3.0, 3.0, 2.0])
+        setpoint = np.array([0, 0, 1, 0, 0, 0])
+        frequencies = np.array([2.0, 3.5, 5.0, 7.0])
+
+        def omega_func(t, x):
+            return pid.control(t, x, setpoint) + 150.0 * np.sin(frequencies * t)
+
+        sol = quad.simulate(
+            omega_func, np.zeros(12), (0, 2), np.linspace(0, 2, 2001),
+            integrator="rk4_fixed", dt=1e-3, record_inputs=True
+        )
+
+        cls.log_directory = os.path.join(cls.tmp.name, 'flights')
+        with loaders.TrajectoryWriter(directory=cls.log_directory) as writer:
+            writer.write_trajectory(
+                run_id=0,
+                trajectory=sol
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_equation_error(self):
+        """
+        The equation error vanishes at the parameters that flew, and
+        candidates map to and from airframe values.
+        """
+
+        problem = identification.EquationErrorProblem(
+            quad=self.nominal,
+            flights=loaders.load_flight_logs(path=self.log_directory),
+            parameters=('kf', 'Cd')
+        )
+
+        self.assertEqual(problem.n_dims, 7)
+        self.assertEqual(problem.n_samples, 2001)
+
+        theta = problem.candidate(
+            values={'kf': self.kf, 'Cd': self.Cd}
+        )
+        values = problem.values(
+            theta=theta
+        )
+        np.testing.assert_allclose(values['kf'], self.kf)
+        np.testing.assert_allclose(values['Cd'], self.Cd)
+        np.testing.assert_array_equal(values['km'], self.nominal.km)
+
+        true_errors = problem.errors(
+            theta=theta
+        )
+        nominal_errors = problem.errors(
+            theta=np.zeros(7)
+        )
+        self.assertLess(true_errors.max(), 1e-3)
+        self.assertGreater(nominal_errors.mean(), 100 * true_errors.mean())
+
+        # Drag that is zero in the nominal airframe cannot be scaled
+        with self.assertRaises(schema.ConfigError):
+            identification.EquationErrorProblem(
+                quad=NonSymmetricQuadrotor(
+                    self.nominal.r_pos, self.kf, self.nominal.km, self.nominal.masses_positions,
+                    self.nominal.I_body, None, None, self.nominal.rotor_dirs
+                ),
+                flights=[],
+                parameters=('Cd',)
+            )
+
+    def test_run_estimation(self):
+        """
+        The direct search across worker processes recovers the parameters,
+        logs every generation and writes the identified values.
+        """
+
+        output_directory = os.path.join(self.tmp.name, 'estimation')
+        os.makedirs(output_directory)
+        log_path = os.path.join(output_directory, 'estimation.log')
+        loaders.create_log_file(
+            start_time='start',
+            log_file_path=log_path
+        )
+
+        config = {
+            'workflow': 'estimation',
+            'output_directory': output_directory,
+            'simulation_config': self.sim_config,
+            'historical_parameter_set': None,
+            'estimation': {
+                'flight_logs': [self.log_directory],
+                'parameters': ['kf', 'Cd'],
+                'population_size': 20,
+                'n_generations': 400,
+                'seed': 0,
+                'n_workers': 2
+            }
+        }
+
+        results, compute_times = identification.run_estimation(
+            config=config,
+            log_path=log_path
+        )
+
+        np.testing.assert_allclose(results['parameters']['kf'], self.kf, rtol=0.01)
+        np.testing.assert_allclose(np.diag(results['parameters']['Cd']), np.diag(self.Cd), rtol=0.05)
+        np.testing.assert_allclose(results['quadrotor'].kf, results['parameters']['kf'])
+        self.assertEqual(results['history'], sorted(results['history'], reverse=True))
+
+        n_generations = len(results['history'])
+        self.assertEqual(len(compute_times['generations']), n_generations)
+
+        metrics = loaders.load_metrics(
+            metrics_path=os.path.join(output_directory, 'estimation_metrics.jsonl')
+        )
+        self.assertEqual([record['generation'] for record in metrics], list(range(1, n_generations + 1)))
+        self.assertEqual(metrics[0]['population_size'], 20)
+
+        identified = loaders.load_json(
+            path=os.path.join(output_directory, 'identified_parameters.json')
+        )
+        self.assertEqual(identified, results['parameters'])
+
+        # The identified values seed the next run as its historical set
+        config['historical_parameter_set'] = identified
+        config['estimation']['n_generations'] = 1
+        config['estimation']['n_workers'] = 1
+        results, _ = identification.run_estimation(
+            config=config
+        )
+        np.testing.assert_allclose(results['parameters']['kf'], self.kf, rtol=0.01)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestIdentification)
+    unittest.TextTestRunner(verbosity=2).run(suite)
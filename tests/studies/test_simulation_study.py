@@ -1,17 +1,596 @@
 import unittest
 
+import numpy as np
+
+from drone.studies.simulation.study import (
+    NonSymmetricQuadrotor,
+    attitude_singularity_event,
+    divergence_event,
+    euler_to_quaternion,
+    ground_contact_event,
+    quaternion_to_euler,
+    rk4_fixed,
+    setpoint_reached_event,
+    state_to_euler,
+    state_to_quaternion
+)
+
+def make_quadrotor():
+    """
+    Build the asymmetric example airframe used across the tests.
+    """
+
+    masses_positions = [
+        (1.0, np.array([0, 0, 0])),
+        (0.1, np.array([0.15, 0, 0])),
+        (0.1, np.array([-0.15, 0, 0])),
+        (0.1, np.array([0, 0.2, 0])),
+        (0.1, np.array([0, -0.2, 0.02]))
+    ]
+
+    rotor_positions = np.array([
+        [0.15, 0, 0],
+        [-0.15, 0, 0],
+        [0, 0.2, 0],
+        [0, -0.2, 0]
+    ])
+
+    return NonSymmetricQuadrotor(
+        rotor_positions,
+        kf=np.array([3e-6, 3.1e-6, 2.9e-6, 3e-6]),
+        km=np.array([1e-7, 1.05e-7, 0.95e-7, 1e-7]),
+        masses_positions=masses_positions,
+        I_body=np.diag([0.005, 0.005, 0.009]),
+        Cd=np.diag([0.1, 0.1, 0.2]),
+        Ctau=np.diag([0.01, 0.01, 0.02]),
+        # Opposite rotors share a spin direction so yaw is controllable
+        rotor_dirs=np.array([1, 1, -1, -1])
+    )
+
+def random_states(
+    rng: np.random.Generator,
+    n: int
+) -> np.ndarray:
+    """
+    Draw random states away from the pitch singularity.
+    """
+
+    X = rng.normal(size=(n, 12))
+    X[:, 6:9] = rng.uniform(-1.2, 1.2, size=(n, 3))
+
+    return X
+
 class TestSimulationStudy(unittest.TestCase):
     """
-    This class contains the tests for the MassBalance class.
+    This class contains the tests for the NonSymmetricQuadrotor class.
     """
 
+    def setUp(self):
+        self.quad = make_quadrotor()
+        self.rng = np.random.default_rng(0)
+
     def test_simulation_study(self):
         """
         Test the MassBalance class.
         """
         pass
 
+    def test_dynamics_batch_matches_dynamics(self):
+        """
+        The batched dynamics must agree with the per-state dynamics.
+        """
+
+        X = random_states(self.rng, 64)
+        Omega = self.rng.uniform(300.0, 900.0, size=(64, 4))
+
+        expected = np.array([
+            self.quad.dynamics(0.0, x, w) for x, w in zip(X, Omega)
+        ])
+
+        np.testing.assert_allclose(
+            self.quad.dynamics_batch(0.0, X, Omega), expected,
+            rtol=1e-10, atol=1e-10
+        )
+
+    def test_dynamics_batch_shared_rotor_speeds(self):
+        """
+        A single (4,) rotor speed vector is broadcast to every state.
+        """
+
+        X = random_states(self.rng, 8)
+        omega = np.array([500.0, 520.0, 480.0, 510.0])
+
+        np.testing.assert_allclose(
+            self.quad.dynamics_batch(0.0, X, omega),
+            self.quad.dynamics_batch(0.0, X, np.tile(omega, (8, 1)))
+        )
+
+    def test_cached_torque_mixer(self):
+        """
+        The cached mixer reproduces the per-rotor cross product torques.
+        """
+
+        omega = np.array([500.0, 520.0, 480.0, 510.0])
+        F_i = self.quad.kf * omega**2
+
+        expected = np.zeros(3)
+        for i in range(4):
+            expected += np.cross(self.quad.r_pos_rel[i], [0, 0, F_i[i]])
+        expected[2] += np.sum(self.quad.rotor_dirs * self.quad.km * omega**2)
+
+        np.testing.assert_allclose(self.quad.torque_mixer @ omega**2, expected)
+        np.testing.assert_allclose(self.quad.I_inv @ self.quad.I, np.eye(3), atol=1e-12)
+
+    def test_cache_invalidation(self):
+        """
+        Reassigning parameters refreshes the cached mass properties.
+        """
+
+        self.quad.kf = 2 * self.quad.kf
+        np.testing.assert_allclose(
+            self.quad.torque_mixer[:2], self.quad.torque_arm_matrix[:2] * self.quad.kf
+        )
+
+        self.quad.masses_positions = self.quad.masses_positions + [
+            (0.2, np.array([0.1, 0.1, 0]))
+        ]
+        self.assertAlmostEqual(self.quad.m, 1.6)
+        np.testing.assert_allclose(self.quad.r_pos_rel, self.quad.r_pos - self.quad.CoM)
+        np.testing.assert_allclose(self.quad.I_inv, np.linalg.inv(self.quad.I))
+
+    def test_rk4_fixed_matches_solve_ivp(self):
+        """
+        The fixed-step integrator agrees with the adaptive one.
+        """
+
+        omega = np.sqrt(self.quad.m * 9.81 / np.sum(self.quad.kf)) * np.ones(4)
+        x0 = np.zeros(12)
+        x0[9:12] = [0.1, -0.05, 0.02]
+        t_eval = np.linspace(0, 1, 11)
+
+        adaptive = self.quad.simulate(
+            lambda t, x: omega, x0, (0, 1), t_eval
+        )
+        fixed = self.quad.simulate(
+            lambda t, x: omega, x0, (0, 1), t_eval, integrator="rk4_fixed", dt=1e-3
+        )
+
+        self.assertTrue(fixed.success)
+        self.assertEqual(fixed.y.shape, (12, 11))
+        np.testing.assert_allclose(fixed.t, t_eval)
+        np.testing.assert_allclose(fixed.y, adaptive.y, atol=1e-3)
+
+    def test_rk4_fixed_order(self):
+        """
+        Integrating x' = -x lands on the exact solution with a shortened
+        final step.
+        """
+
+        t, y = rk4_fixed(lambda t, x: -x, (0, 1), np.ones(2), 0.03)
+
+        self.assertEqual(t[-1], 1.0)
+        self.assertEqual(y.shape, (2, len(t)))
+        np.testing.assert_allclose(y[:, -1], np.exp(-1.0), rtol=1e-7)
+
+    def test_rk4_fixed_rejects_bad_step(self):
+        """
+        Non-positive steps and steps longer than the span are rejected.
+        """
+
+        for dt in (0.0, -0.1, 2.0):
+            with self.assertRaises(ValueError):
+                rk4_fixed(lambda t, x: -x, (0, 1), np.ones(2), dt)
+
+    def test_rk4_fixed_rejects_t_eval_outside_span(self):
+        """
+        Output times are never extrapolated beyond t_span.
+        """
+
+        for t_eval in ([0, 2], [-0.5, 1]):
+            with self.assertRaises(ValueError):
+                rk4_fixed(lambda t, x: -x, (0, 1), np.ones(2), 0.1, t_eval)
+
+    def test_simulate_unknown_integrator(self):
+        """
+        Unknown integrators are rejected.
+        """
+
+        with self.assertRaises(ValueError):
+            self.quad.simulate(lambda t, x: np.zeros(4), np.zeros(12), (0, 1), integrator="euler")
+
+        with self.assertRaises(ValueError):
+            self.quad.simulate(lambda t, x: np.zeros(4), np.zeros(12), (0, 1), integrator="rk4_fixed")
+
+    def test_jacobian_matches_finite_differences(self):
+        """
+        The analytic jacobian agrees with central differences.
+        """
+
+        for x in random_states(self.rng, 5):
+            omega = self.rng.uniform(300.0, 900.0, size=4)
+            J = self.quad.jacobian(0.0, x, omega)
+
+            J_fd = np.empty((12, 12))
+            for j in range(12):
+                h = 1e-6 * max(1.0, abs(x[j]))
+                e = np.zeros(12)
+                e[j] = h
+                J_fd[:, j] = (
+                    self.quad.dynamics(0.0, x + e, omega) - self.quad.dynamics(0.0, x - e, omega)
+                ) / (2 * h)
+
+            np.testing.assert_allclose(J, J_fd, rtol=1e-5, atol=1e-5)
+
+    def test_simulate_implicit_method(self):
+        """
+        An implicit solver with the analytic jacobian reproduces RK45.
+        """
+
+        omega = 600.0 * np.ones(4)
+        x0 = np.zeros(12)
+        x0[9:12] = [0.1, -0.05, 0.02]
+        t_eval = np.linspace(0, 1, 11)
+
+        reference = self.quad.simulate(lambda t, x: omega, x0, (0, 1), t_eval)
+        implicit = self.quad.simulate(lambda t, x: omega, x0, (0, 1), t_eval, method="Radau")
+
+        self.assertTrue(implicit.success)
+        self.assertGreater(implicit.njev, 0)
+        np.testing.assert_allclose(implicit.y, reference.y, rtol=1e-3, atol=1e-4)
+
+    def test_quaternion_conversions(self):
+        """
+        Euler angles survive a round trip through quaternions and both
+        describe the same rotation.
+        """
+
+        X = random_states(self.rng, 20).T
+
+        np.testing.assert_allclose(state_to_euler(state_to_quaternion(X)), X, atol=1e-12)
+
+        for phi, theta, psi in X[6:9].T:
+            qw, qx, qy, qz = euler_to_quaternion(phi, theta, psi)
+            R3 = [2*(qx*qz + qw*qy), 2*(qy*qz - qw*qx), 1 - 2*(qx*qx + qy*qy)]
+            np.testing.assert_allclose(R3, self.quad.rotation_matrix(phi, theta, psi)[:, 2], atol=1e-12)
+
+        # Unnormalized quaternions map to the same angles
+        q = euler_to_quaternion(0.1, 0.2, 0.3)
+        np.testing.assert_allclose(quaternion_to_euler(3 * q), [0.1, 0.2, 0.3])
+
+    def test_dynamics_quaternion_matches_dynamics(self):
+        """
+        Both attitude representations give the same accelerations.
+        """
+
+        for x in random_states(self.rng, 10):
+            omega = self.rng.uniform(300.0, 900.0, size=4)
+            dx = self.quad.dynamics(0.0, x, omega)
+            dxq = self.quad.dynamics_quaternion(0.0, state_to_quaternion(x), omega)
+
+            np.testing.assert_allclose(dxq[0:6], dx[0:6], atol=1e-10)
+            np.testing.assert_allclose(dxq[10:13], dx[9:12], atol=1e-10)
+
+    def test_simulate_quaternion(self):
+        """
+        The quaternion mode matches the Euler mode away from the pitch
+        singularity and needs fewer steps through it.
+        """
+
+        omega = 600.0 * np.ones(4)
+        x0 = np.zeros(12)
+        x0[9:12] = [0.1, -0.05, 0.02]
+        t_eval = np.linspace(0, 1, 11)
+
+        euler = self.quad.simulate(lambda t, x: omega, x0, (0, 1), t_eval)
+        quaternion = self.quad.simulate(lambda t, x: omega, x0, (0, 1), t_eval, attitude="quaternion")
+
+        self.assertEqual(quaternion.y.shape, (12, 11))
+        np.testing.assert_allclose(quaternion.y, euler.y, atol=1e-4)
+
+        # Tumble through pitch = 90 deg without rotor or drag torques
+        self.quad.Ctau = np.zeros((3, 3))
+        x0 = np.zeros(12)
+        x0[10] = 3.0
+
+        euler = self.quad.simulate(lambda t, x: np.zeros(4), x0, (0, 1), t_eval)
+        quaternion = self.quad.simulate(lambda t, x: np.zeros(4), x0, (0, 1), t_eval, attitude="quaternion")
+
+        self.assertTrue(quaternion.success)
+        self.assertLess(quaternion.nfev, euler.nfev)
+        np.testing.assert_allclose(np.linalg.norm(quaternion.quaternion, axis=0), 1.0)
+
+        with self.assertRaises(ValueError):
+            self.quad.simulate(lambda t, x: omega, x0, (0, 1), attitude="rodrigues")
+
+    def test_discrete_control_holds_commands(self):
+        """
+        The controller runs once per period and a constant command matches
+        the continuous simulation.
+        """
+
+        omega = 600.0 * np.ones(4)
+        calls = []
+
+        def controller(t, x):
+            calls.append(t)
+            return omega
+
+        x0 = np.zeros(12)
+        x0[9:12] = [0.1, -0.05, 0.02]
+        t_eval = np.linspace(0, 1, 7)
+
+        sol = self.quad.simulate_discrete_control(controller, 50.0, x0, (0, 1), t_eval)
+        reference = self.quad.simulate(lambda t, x: omega, x0, (0, 1), t_eval)
+
+        self.assertTrue(sol.success)
+        self.assertEqual(len(calls), 50)
+        np.testing.assert_allclose(calls, sol.t_control)
+        self.assertEqual(sol.omega.shape, (4, 50))
+        np.testing.assert_allclose(sol.t, t_eval)
+        np.testing.assert_allclose(sol.y, reference.y, rtol=1e-3, atol=1e-5)
+
+        # The plant is integrated with the given solve_ivp method
+        lsoda = self.quad.simulate_discrete_control(controller, 50.0, x0, (0, 1), t_eval, method="LSODA")
+        self.assertNotEqual(lsoda.nfev, sol.nfev)
+        np.testing.assert_allclose(lsoda.y, reference.y, rtol=1e-2, atol=1e-3)
+
+    def test_discrete_control_zero_order_hold(self):
+        """
+        Between updates the plant sees the command computed at the start of
+        the period, with samples at the control times by default.
+        """
+
+        def controller(t, x):
+            return (600.0 if t < 0.25 else 0.0) * np.ones(4)
+
+        sol = self.quad.simulate_discrete_control(
+            controller, 4.0, np.zeros(12), (0, 0.6), integrator="rk4_fixed", dt=1e-3
+        )
+
+        np.testing.assert_allclose(sol.t, [0, 0.25, 0.5, 0.6])
+        np.testing.assert_allclose(sol.omega[0], [600.0, 0.0, 0.0])
+
+        # Falling (against drag) once the rotors stop at t = 0.25
+        v_z = sol.y[5]
+        self.assertLess(v_z[3] - v_z[1], -3.0)
+        self.assertGreater(v_z[3] - v_z[1], -9.81 * 0.35)
+
+        with self.assertRaises(ValueError):
+            self.quad.simulate_discrete_control(controller, 0.0, np.zeros(12), (0, 1))
+
+    def test_simulate_ensemble_matches_individual_runs(self):
+        """
+        Dispersed vehicles integrated in lockstep match separate runs.
+        """
+
+        n = 3
+        kf = self.quad.kf * self.rng.uniform(0.9, 1.1, size=(n, 4))
+        com_offset = self.rng.uniform(-0.01, 0.01, size=(n, 3))
+        X0 = np.zeros((n, 12))
+        X0[:, 9:12] = self.rng.normal(scale=0.1, size=(n, 3))
+        omega = 600.0 * np.ones(4)
+        t_eval = np.linspace(0, 0.5, 6)
+
+        ensemble = self.quad.simulate_ensemble(
+            lambda t, X: np.tile(omega, (len(X), 1)), X0, (0, 0.5), t_eval,
+            integrator="rk4_fixed", dt=1e-3, kf=kf, com_offset=com_offset
+        )
+
+        self.assertEqual(ensemble.n_vehicles, n)
+        self.assertEqual(ensemble.y.shape, (n, 12, 6))
+
+        for i in range(n):
+            quad = make_quadrotor()
+            quad.kf = kf[i]
+            quad.r_pos = quad.r_pos - com_offset[i]
+
+            sol = quad.simulate(
+                lambda t, x: omega, X0[i], (0, 0.5), t_eval, integrator="rk4_fixed", dt=1e-3
+            )
+            np.testing.assert_allclose(ensemble.y[i], sol.y, rtol=1e-9, atol=1e-12)
+
+    def test_simulate_ensemble_solve_ivp(self):
+        """
+        The adaptive ensemble run reshapes back to one block per vehicle.
+        """
+
+        X0 = np.zeros((4, 12))
+        m = self.quad.m * np.array([0.9, 1.0, 1.1, 1.2])
+
+        ensemble = self.quad.simulate_ensemble(
+            lambda t, X: 600.0 * np.ones((len(X), 4)), X0, (0, 0.2), np.linspace(0, 0.2, 5), m=m
+        )
+
+        self.assertTrue(ensemble.success)
+        self.assertEqual(ensemble.y.shape, (4, 12, 5))
+        # Heavier vehicles climb slower
+        self.assertTrue(np.all(np.diff(ensemble.y[:, 2, -1]) < 0))
+
+        with self.assertRaises(ValueError):
+            self.quad.simulate_ensemble(
+                lambda t, X: np.zeros((len(X), 4)), X0, (0, 0.2), m=np.ones(3)
+            )
+
+    def test_ensemble_parameters_inertia(self):
+        """
+        Mass dispersions scale the inertia unless a consistent inertia is
+        supplied, and CoM offsets leave the inertia about the CoM unchanged.
+        """
+
+        m = self.quad.m * np.array([0.5, 1.0, 2.0])
+        params = self.quad.ensemble_parameters(3, m=m)
+
+        np.testing.assert_allclose(params['I'][2], 2.0 * self.quad.I)
+        np.testing.assert_allclose(
+            np.einsum('nij,njk->nik', params['I_inv'], params['I']), np.tile(np.eye(3), (3, 1, 1)),
+            atol=1e-12
+        )
+
+        I = np.tile(np.diag([0.02, 0.03, 0.04]), (3, 1, 1))
+        params = self.quad.ensemble_parameters(3, m=m, I=I)
+        np.testing.assert_allclose(params['I'], I)
+
+        # A rigidly displaced airframe built the long way has the same inertia
+        offset = np.array([0.01, -0.02, 0.005])
+        shifted = make_quadrotor()
+        shifted.masses_positions = [(mass, pos + offset) for mass, pos in shifted.masses_positions]
+
+        params = self.quad.ensemble_parameters(1, com_offset=offset[None, :])
+        np.testing.assert_allclose(params['I'], shifted.I, atol=1e-15)
+        np.testing.assert_allclose(params['torque_mixer'][0], shifted.torque_mixer)
+
+    def test_ground_contact_event(self):
+        """
+        A vehicle in free fall from 1 m stops at ground contact with both
+        integrators.
+        """
+
+        x0 = np.zeros(12)
+        x0[2] = 1.0
+        t_eval = np.linspace(0, 5, 51)
+        t_contact = np.sqrt(2 / 9.81)
+
+        for integrator in ("solve_ivp", "rk4_fixed"):
+            sol = self.quad.simulate(
+                lambda t, x: np.zeros(4), x0, (0, 5), t_eval,
+                integrator=integrator, dt=1e-3, events=ground_contact_event()
+            )
+
+            self.assertEqual(sol.status, 1)
+            self.assertEqual(len(sol.t_events[0]), 1)
+            self.assertAlmostEqual(sol.t_events[0][0], t_contact, delta=0.02)
+            self.assertAlmostEqual(sol.y_events[0][0][2], 0.0, places=4)
+            self.assertLessEqual(sol.t[-1], sol.t_events[0][0] + 1e-12)
+
+    def test_non_terminal_events(self):
+        """
+        Non-terminal events are recorded without stopping the run.
+        """
+
+        omega = np.sqrt(self.quad.m * 9.81 / np.sum(self.quad.kf)) * np.ones(4)
+        x0 = np.zeros(12)
+        x0[5] = 1.0
+        event = setpoint_reached_event([0, 0, 0.5], position_tol=0.1, velocity_tol=10.0, terminal=False)
+
+        sol = self.quad.simulate(
+            lambda t, x: omega, x0, (0, 1), integrator="rk4_fixed", dt=1e-3, events=[event]
+        )
+
+        self.assertEqual(sol.status, 0)
+        self.assertAlmostEqual(sol.t[-1], 1.0)
+        self.assertEqual(len(sol.t_events[0]), 1)
+        self.assertAlmostEqual(sol.t_events[0][0], 0.4, delta=0.02)
+
+    def test_singularity_and_divergence_events(self):
+        """
+        A tumble toward pitch = 90 deg ends before the singularity, events
+        see the 12-state in quaternion mode, and a spin-up ends at the rate
+        bound.
+        """
+
+        self.quad.Ctau = np.zeros((3, 3))
+        x0 = np.zeros(12)
+        x0[10] = 3.0
+        margin = 0.1
+
+        sol = self.quad.simulate(
+            lambda t, x: np.zeros(4), x0, (0, 5), events=attitude_singularity_event(margin)
+        )
+
+        self.assertEqual(sol.status, 1)
+        self.assertAlmostEqual(sol.t_events[0][0], (np.pi / 2 - margin) / 3.0, delta=1e-3)
+        self.assertAlmostEqual(sol.y_events[0][0][7], np.pi / 2 - margin, delta=1e-3)
+
+        x0[2] = 1.0
+        sol = self.quad.simulate(
+            lambda t, x: np.zeros(4), x0, (0, 5), attitude="quaternion", events=ground_contact_event()
+        )
+
+        self.assertEqual(sol.status, 1)
+        self.assertEqual(sol.y_events[0].shape, (1, 12))
+        self.assertAlmostEqual(sol.y_events[0][0][2], 0.0, places=4)
+
+        omega = 600.0 * np.array([1.0, 1.0, 0.0, 0.0])
+        sol = self.quad.simulate(
+            lambda t, x: omega, np.zeros(12), (0, 5), integrator="rk4_fixed", dt=1e-3,
+            events=divergence_event(max_rate=5.0)
+        )
+
+        self.assertEqual(sol.status, 1)
+        self.assertLess(sol.t[-1], 5.0)
+        self.assertAlmostEqual(np.max(np.abs(sol.y_events[0][0][9:12])), 5.0, delta=0.05)
+
+    def test_record_inputs(self):
+        """
+        The applied rotor speeds and their thrust and torque are captured
+        during the integration and stored at the output times, so the
+        controller is called no more often than without recording, however
+        many output times there are.
+        """
+
+        def omega_func(t, x):
+            return 600.0 + 50.0 * np.array([np.sin(t), np.cos(t), x[2], -x[2]])
+
+        t_eval = np.linspace(0, 1, 11)
+        for integrator in ("solve_ivp", "rk4_fixed"):
+            counts = []
+            for n_eval, record_inputs in ((11, False), (11, True), (101, True)):
+                calls = []
+
+                def counted(t, x):
+                    calls.append(t)
+                    return omega_func(t, x)
+
+                sol = self.quad.simulate(
+                    counted, np.zeros(12), (0, 1), np.linspace(0, 1, n_eval), integrator=integrator, dt=1e-3,
+                    record_inputs=record_inputs
+                )
+                counts.append(len(calls))
+
+            self.assertEqual(counts[0], counts[1], integrator)
+            self.assertEqual(counts[1], counts[2], integrator)
+
+            omega = np.array([omega_func(t, x) for t, x in zip(sol.t, sol.y.T)]).T
+            if integrator == "solve_ivp":
+                # Interpolated linearly between the accepted steps
+                np.testing.assert_allclose(sol.rotor_speeds, omega, rtol=1e-2)
+            else:
+                # Each step holds its first-stage input, so the final time repeats the last step
+                np.testing.assert_allclose(sol.rotor_speeds[:, :-1], omega[:, :-1])
+            np.testing.assert_allclose(sol.thrust, self.quad.kf @ sol.rotor_speeds**2)
+            np.testing.assert_allclose(sol.torque, self.quad.torque_mixer @ sol.rotor_speeds**2)
+
+        # Stepping the solver here matches solve_ivp, events included
+        for method in ("RK45", "LSODA"):
+            reference = self.quad.simulate(
+                lambda t, x: np.zeros(4), np.r_[0, 0, 1, np.zeros(9)], (0, 1), t_eval, method=method,
+                events=ground_contact_event()
+            )
+            sol = self.quad.simulate(
+                lambda t, x: np.zeros(4), np.r_[0, 0, 1, np.zeros(9)], (0, 1), t_eval, method=method,
+                events=ground_contact_event(), record_inputs=True
+            )
+            self.assertEqual(sol.status, 1)
+            np.testing.assert_allclose(sol.t, reference.t)
+            np.testing.assert_allclose(sol.y, reference.y, atol=1e-9)
+            np.testing.assert_allclose(sol.t_events[0], reference.t_events[0])
+            np.testing.assert_allclose(sol.y_events[0], reference.y_events[0], atol=1e-9)
+            self.assertEqual(sol.rotor_speeds.shape, (4, len(sol.t)))
+
+        calls = []
+
+        def controller(t, x):
+            calls.append(t)
+            return omega_func(t, x)
+
+        sol = self.quad.simulate_discrete_control(controller, 4.0, np.zeros(12), (0, 1), t_eval, record_inputs=True)
+
+        self.assertEqual(len(calls), 4)
+        np.testing.assert_allclose(sol.rotor_speeds[:, 4], sol.omega[:, 1])
+        np.testing.assert_allclose(sol.rotor_speeds[:, 10], sol.omega[:, 3])
+        np.testing.assert_allclose(sol.thrust, self.quad.kf @ sol.rotor_speeds**2)
+        self.assertIsNone(self.quad.simulate(omega_func, np.zeros(12), (0, 1), t_eval).rotor_speeds)
+
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestSimulationStudy)
     unittest.TextTestRunner(verbosity=2).run(suite)
-    
\ No newline at end of file
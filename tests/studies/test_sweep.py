@@ -0,0 +1,162 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from drone.studies.simulation import sweep
+from drone.utils import loaders
+from drone.utils import schema
+
+CONFIG_PATH = Path(__file__).resolve().parents[2] / 'configs' / 'sweep' / 'config_sweep.json'
+
+class TestSweep(unittest.TestCase):
+    """
+    This class contains the tests for the parallel sweep runner.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = loaders.load_json(
+            path=CONFIG_PATH
+        )
+        self.config['output_directory'] = self.tmp.name
+        self.config['simulation']['t_span'] = [0.0, 0.2]
+        self.config['simulation']['n_eval'] = 11
+        self.config['sweep']['n_workers'] = 2
+        self.config['sweep']['chunk_size'] = 1
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_expand_grid(self):
+        """
+        The grid expands into the cartesian product of its values.
+        """
+
+        scenarios = sweep.expand_grid(
+            config=self.config
+        )
+
+        self.assertEqual(len(scenarios), 6)
+        self.assertEqual([s['run_id'] for s in scenarios], list(range(6)))
+        self.assertEqual(scenarios[4]['simulation']['x0'][6], 0.1)
+        self.assertEqual(scenarios[4]['airframe']['kf'], [3e-6] * 4)
+        # The base configuration is left untouched
+        self.assertEqual(self.config['simulation']['x0'], [0] * 12)
+
+    def test_run_sweep(self):
+        """
+        Every scenario is simulated and written to disk.
+        """
+
+        log_path = os.path.join(self.tmp.name, 'sweep.log')
+        loaders.create_log_file(
+            start_time='start',
+            log_file_path=log_path
+        )
+
+        # One scenario per chunk exercises the bounded submission window
+        summary, compute_times = sweep.run_sweep(
+            config=self.config,
+            log_path=log_path
+        )
+
+        self.assertEqual([entry['run_id'] for entry in summary], list(range(6)))
+        self.assertTrue(all(entry['success'] for entry in summary))
+        self.assertEqual(len(compute_times['scenarios']), 6)
+
+        reader = loaders.TrajectoryReader(
+            directory=summary[1]['path']
+        )
+        self.assertEqual(len(reader), 6)
+        self.assertEqual(reader.read(run_id=1).shape, (12, 11))
+        self.assertEqual(reader.parameters(run_id=4)['simulation.x0'][6], 0.1)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, 'summary.json')))
+
+        with open(log_path, encoding='utf-8') as log_file:
+            entries = [line for line in log_file.read().splitlines()[1:] if line]
+
+        self.assertEqual(len(entries), 6)
+        self.assertTrue(entries[-1].endswith(': 6/6 scenarios done.'))
+
+    def test_run_sweep_export(self):
+        """
+        A sweep with an export path also writes one campaign table.
+        """
+
+        try:
+            import pandas
+            import pyarrow
+        except ImportError:
+            self.skipTest('pandas and pyarrow are not installed.')
+
+        self.config['sweep']['export'] = 'campaign.parquet'
+
+        sweep.run_sweep(
+            config=self.config
+        )
+
+        path = os.path.join(self.tmp.name, 'campaign.parquet')
+        runs = loaders.read_simulation_results(
+            path=path,
+            table='runs'
+        )
+
+        self.assertEqual(sorted(runs['run_id']), list(range(6)))
+        self.assertEqual(len(loaders.read_simulation_results(path=path)), 6 * 11)
+
+    def test_events_stop_scenario(self):
+        """
+        A scenario configured with events stops early once one triggers.
+        """
+
+        scenario = sweep.expand_grid(
+            config=self.config
+        )[0]
+        scenario['simulation']['t_span'] = [0.0, 5.0]
+        scenario['simulation']['rotor_speeds'] = [0.0, 0.0, 0.0, 0.0]
+        scenario['simulation']['events'] = {'divergence': {'max_velocity': 1.0}}
+
+        result = sweep.run_scenario(
+            scenario=scenario
+        )
+
+        self.assertEqual(result['status'], 1)
+        self.assertLess(result['trajectory'].t[-1], 0.2)
+
+        scenario['simulation']['events'] = {'tumble': {}}
+        with self.assertRaises(ValueError):
+            sweep.run_scenario(
+                scenario=scenario
+            )
+
+    def test_controller_scenarios(self):
+        """
+        A controller section is part of every scenario, so design candidates
+        fly closed loop, and invalid gains fail before any work is submitted.
+        """
+
+        self.config['controller'] = {'setpoint': [0.0, 0.0, 1.0, 0.0, 0.0, 0.0]}
+        self.config['sweep']['grid'] = {'controller.kp_pos': [[1.0, 1.0, 15.0], [1.0, 1.0, 5.0]]}
+
+        scenarios = sweep.expand_grid(
+            config=self.config
+        )
+        self.assertEqual(scenarios[1]['controller']['kp_pos'], [1.0, 1.0, 5.0])
+
+        scenarios[0]['simulation']['t_span'] = [0.0, 1.0]
+        result = sweep.run_scenario(
+            scenario=scenarios[0]
+        )
+        self.assertGreater(result['trajectory'].position[2, -1], 0.3)
+
+        self.config['controller']['kd_pos'] = [2.0, 2.0]
+        with self.assertRaises(schema.ConfigError):
+            sweep.run_sweep(
+                config=self.config
+            )
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, 'trajectories')))
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestSweep)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,102 @@
+import unittest
+
+import numpy as np
+
+from drone.studies.simulation.trajectory import Trajectory
+from test_simulation_study import make_quadrotor
+
+class TestTrajectory(unittest.TestCase):
+    """
+    This class contains the tests for the trajectory container.
+    """
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.t = np.linspace(0, 1, 20)
+        self.y = rng.normal(size=(12, 20))
+
+    def test_views_share_buffer(self):
+        """
+        The named channels are views into one contiguous buffer.
+        """
+
+        rotor_speeds = np.ones((4, 20))
+        trajectory = Trajectory(self.t, self.y, rotor_speeds=rotor_speeds, thrust=np.arange(20.0))
+
+        self.assertTrue(trajectory.data.flags.c_contiguous)
+        self.assertEqual(trajectory.data.shape, (17, 20))
+        for view in (trajectory.y, trajectory.position, trajectory.euler, trajectory.body_rates,
+                     trajectory.rotor_speeds, trajectory.thrust):
+            self.assertTrue(np.shares_memory(view, trajectory.data))
+
+        np.testing.assert_array_equal(trajectory.velocity, self.y[3:6])
+        np.testing.assert_array_equal(trajectory.thrust, np.arange(20.0))
+        self.assertIsNone(trajectory.torque)
+
+        # A contiguous state array without inputs is wrapped, not copied
+        self.assertIs(Trajectory(self.t, self.y).data, self.y)
+
+        with self.assertRaises(KeyError):
+            trajectory.channel('airspeed')
+        with self.assertRaises(ValueError):
+            Trajectory(self.t, self.y[:6])
+
+    def test_float32_storage(self):
+        """
+        Single precision storage halves the buffer and keeps the metadata.
+        """
+
+        trajectory = Trajectory(self.t, self.y, status=1, message='stopped')
+        single = trajectory.astype(np.float32)
+
+        self.assertEqual(single.data.dtype, np.float32)
+        self.assertEqual(single.data.nbytes, trajectory.data.nbytes // 2)
+        self.assertEqual(single.t.dtype, np.float64)
+        self.assertEqual((single.status, single.message), (1, 'stopped'))
+        np.testing.assert_allclose(single.y, self.y, rtol=1e-6)
+
+    def test_derived_quantities(self):
+        """
+        Derived quantities match the per-sample computations and are cached.
+        """
+
+        quad = make_quadrotor()
+        trajectory = Trajectory(self.t, self.y)
+
+        for k in (0, 7, 19):
+            R = quad.rotation_matrix(*self.y[6:9, k])
+            np.testing.assert_allclose(trajectory.rotation_matrices[k], R)
+            np.testing.assert_allclose(trajectory.body_velocity[:, k], R.T @ self.y[3:6, k])
+            self.assertAlmostEqual(trajectory.tilt[k], np.arccos(R[2, 2]))
+
+        np.testing.assert_allclose(trajectory.speed, np.linalg.norm(self.y[3:6], axis=0))
+        self.assertIs(trajectory.rotation_matrices, trajectory.rotation_matrices)
+
+    def test_simulate_returns_trajectory(self):
+        """
+        simulate returns a Trajectory carrying the solver information, and
+        ensemble members are views into the ensemble result.
+        """
+
+        quad = make_quadrotor()
+        omega = 600.0 * np.ones(4)
+        t_eval = np.linspace(0, 0.5, 6)
+
+        sol = quad.simulate(lambda t, x: omega, np.zeros(12), (0, 0.5), t_eval, dtype=np.float32)
+
+        self.assertIsInstance(sol, Trajectory)
+        self.assertTrue(sol.success)
+        self.assertGreater(sol.nfev, 0)
+        self.assertEqual(sol.y.dtype, np.float32)
+        self.assertEqual(sol.y.shape, (12, 6))
+
+        ensemble = quad.simulate_ensemble(
+            lambda t, X: omega, np.zeros((3, 12)), (0, 0.5), t_eval, integrator="rk4_fixed", dt=0.01
+        )
+        member = ensemble.trajectory(1)
+        self.assertTrue(np.shares_memory(member.data, ensemble.y))
+        np.testing.assert_array_equal(member.position, ensemble.y[1, 0:3])
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestTrajectory)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,130 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from drone.studies.simulation import workflow
+from drone.utils import loaders
+from drone.utils import schema
+
+CONFIG_PATH = Path(__file__).resolve().parents[2] / 'configs' / 'simulation' / 'config_simulation.json'
+
+class TestWorkflow(unittest.TestCase):
+    """
+    This class contains the tests for the single simulation workflow.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = loaders.load_json(
+            path=CONFIG_PATH
+        )
+        self.config['output_directory'] = self.tmp.name
+        self.config['simulation']['t_span'] = [0.0, 1.0]
+        self.config['simulation']['n_eval'] = 101
+        self.config['experimental_data'] = None
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_closed_loop(self):
+        """
+        The controller lifts the airframe towards its setpoint and the
+        trajectory, inputs, summary and compute times are written out.
+        """
+
+        results, data, compute_times, flags = workflow.run_simulation(
+            config=self.config
+        )
+
+        trajectory = results['trajectory']
+        self.assertIsNone(data)
+        self.assertEqual(flags['status'], 0)
+        self.assertEqual(flags['events'], [])
+        self.assertEqual(set(compute_times), {'build', 'simulate', 'write', 'total'})
+        self.assertGreater(trajectory.position[2, -1], 0.5)
+        self.assertEqual(trajectory.rotor_speeds.shape, (4, 101))
+
+        reader = loaders.TrajectoryReader(
+            directory=results['paths']['store']
+        )
+        np.testing.assert_array_equal(reader.read_trajectory(0).y, trajectory.y)
+
+        summary = loaders.load_json(
+            path=os.path.join(self.tmp.name, 'summary.json')
+        )
+        self.assertEqual(summary['flags'], flags)
+
+    def test_discrete_control_and_events(self):
+        """
+        A controller rate selects the sampled-data loop, which rejects
+        events, and without a controller the constant rotor speeds run
+        until an event stops them.
+        """
+
+        # The default attitude gains are too stiff for a 2 ms period
+        self.config['controller'].update(
+            kp_ang=[20.0, 20.0, 10.0], kd_ang=[2.0, 2.0, 1.0], rate_hz=500.0
+        )
+        self.config['outputs']['store'] = False
+
+        self.config['simulation']['events'] = {'divergence': {}}
+        with self.assertRaisesRegex(schema.ConfigError, '^simulation.events:'):
+            workflow.run_simulation(
+                config=self.config
+            )
+
+        self.config['simulation']['events'] = {}
+
+        results, _, _, flags = workflow.run_simulation(
+            config=self.config
+        )
+
+        trajectory = results['trajectory']
+        self.assertEqual(trajectory.omega.shape, (4, 500))
+        self.assertTrue(np.all(np.isfinite(trajectory.y)))
+        self.assertGreater(trajectory.position[2, -1], 0.5)
+        self.assertEqual(results['paths'], {})
+        self.assertTrue(flags['success'])
+
+        # Idle rotors drop the airframe onto the ground
+        del self.config['controller']
+        self.config['simulation']['x0'][2] = 0.5
+        self.config['simulation']['rotor_speeds'] = [0.0] * 4
+        self.config['simulation']['events'] = {'ground_contact': {}}
+
+        _, _, _, flags = workflow.run_simulation(
+            config=self.config
+        )
+
+        self.assertTrue(flags['terminated'])
+        self.assertEqual(flags['events'], ['ground_contact'])
+        self.assertAlmostEqual(flags['t_final'], np.sqrt(2 * 0.5 / 9.81), places=2)
+
+        self.config['simulation']['attitude'] = 'quaternion'
+        self.config['controller'] = {'rate_hz': 100.0}
+        with self.assertRaises(schema.ConfigError):
+            workflow.run_simulation(
+                config=self.config
+            )
+
+    @unittest.skipIf(importlib.util.find_spec('matplotlib') is None, 'matplotlib is not installed')
+    def test_plot(self):
+        """
+        A plot of the trajectory is saved when requested.
+        """
+
+        self.config['outputs']['plot'] = True
+
+        results, _, _, _ = workflow.run_simulation(
+            config=self.config
+        )
+
+        self.assertTrue(os.path.exists(results['paths']['plot']))
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestWorkflow)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,147 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from drone import run
+from drone.utils import loaders
+
+ROOT_DIRECTORY = Path(__file__).resolve().parents[1]
+CONFIG_DIRECTORY = ROOT_DIRECTORY / 'configs'
+
+# Cumulative import time (s) allowed for drone.run, about five times the
+# cost of numpy
+IMPORT_TIME_BUDGET = 0.5
+
+# Modules that only the workflows themselves may import
+HEAVY_MODULES = (
+    'scipy',
+    'matplotlib',
+    'drone.studies.simulation.study',
+    'drone.studies.simulation.sweep',
+    'drone.studies.simulation.workflow',
+    'drone.studies.estimation.identification',
+    'drone.studies.design.study'
+)
+
+class TestRun(unittest.TestCase):
+    """
+    This class contains the tests for the command line workflows.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_run_simulation(self):
+        """
+        The simulation workflow runs from a config file and logs its
+        stages.
+        """
+
+        config = loaders.load_json(
+            path=CONFIG_DIRECTORY / 'simulation' / 'config_simulation.json'
+        )
+        config['output_directory'] = self.tmp.name
+        config['simulation']['t_span'] = [0.0, 0.5]
+        config['simulation']['n_eval'] = 51
+
+        config_path = os.path.join(self.tmp.name, 'simulation.json')
+        loaders.write_json(path=config_path, data=config)
+
+        config = loaders.load_data(
+            config_path=Path(config_path)
+        )
+        results, data, compute_times, flags = run.run_simulation(
+            config=config
+        )
+
+        self.assertEqual(len(results['trajectory']), 51)
+        self.assertIsNone(data)
+        self.assertTrue(flags['success'])
+        self.assertGreaterEqual(compute_times['total'], compute_times['simulate'])
+
+        with open(os.path.join(self.tmp.name, 'simulation.log'), encoding='utf-8') as log_file:
+            self.assertIn('Simulated 51 samples with rk4_fixed', log_file.read())
+
+    def test_run_estimation(self):
+        """
+        The estimation workflow appends every generation to its metrics
+        file through one buffered writer, closed when the run ends.
+        """
+
+        sim_config = loaders.load_json(
+            path=CONFIG_DIRECTORY / 'simulation' / 'config_simulation.json'
+        )
+        sim_config['output_directory'] = self.tmp.name
+        sim_config['simulation']['t_span'] = [0.0, 0.5]
+        sim_config['simulation']['n_eval'] = 51
+
+        run.run_simulation(
+            config=sim_config
+        )
+
+        config = {
+            'workflow': 'estimation',
+            'output_directory': self.tmp.name,
+            'simulation_config': sim_config,
+            'historical_parameter_set': None,
+            'estimation': {
+                'flight_logs': [os.path.join(self.tmp.name, 'trajectories')],
+                'parameters': ['kf'],
+                'population_size': 8,
+                'n_generations': 3,
+                'seed': 0,
+                'n_workers': 1
+            }
+        }
+
+        metrics_path = os.path.join(self.tmp.name, 'estimation_metrics.jsonl')
+        with mock.patch.object(loaders, 'LogWriter', wraps=loaders.LogWriter) as log_writer:
+            results, _ = run.run_estimation(
+                config=config
+            )
+
+        opened = [call.kwargs['log_file_path'] for call in log_writer.call_args_list]
+        self.assertEqual(opened.count(metrics_path), 1)
+        self.assertEqual(len(loaders.load_metrics(metrics_path=metrics_path)), len(results['history']))
+        self.assertNotIn(os.path.abspath(metrics_path), loaders._LOG_WRITERS)
+
+    def test_import_budget(self):
+        """
+        Importing the command line entry point leaves the study modules and
+        scipy unloaded and stays within the import time budget.
+        """
+
+        code = (
+            'import sys, drone.run; '
+            f'print(*[m for m in {HEAVY_MODULES!r} if m in sys.modules])'
+        )
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=ROOT_DIRECTORY, capture_output=True, text=True, check=True
+        )
+
+        self.assertEqual(process.stdout.strip(), '')
+
+        # Lines read 'import time: self [us] | cumulative | module'
+        cumulative = {
+            fields[2].strip(): int(fields[1]) for fields in
+            (line.split('|') for line in process.stderr.splitlines()[1:])
+        }
+        self.assertLess(cumulative['drone.run'] * 1e-6, IMPORT_TIME_BUDGET)
+
+        process = subprocess.run(
+            [sys.executable, '-m', 'drone.run', '--help'],
+            cwd=ROOT_DIRECTORY, capture_output=True, text=True, check=True
+        )
+        self.assertIn('--config', process.stdout)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestRun)
+    unittest.TextTestRunner(verbosity=2).run(suite)
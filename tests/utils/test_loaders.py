@@ -0,0 +1,549 @@
+import copy
+import os
+import pickle
+import tempfile
+import time
+import unittest
+import warnings
+
+import numpy as np
+
+from drone.studies.simulation.trajectory import Trajectory
+from drone.utils import loaders
+
+class TestTrajectoryStore(unittest.TestCase):
+    """
+    This class contains the tests for the on-disk trajectory store.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, 'trajectories')
+
+        rng = np.random.default_rng(5)
+        self.t = np.linspace(0, 1, 50)
+        self.trajectories = [
+            Trajectory(self.t, rng.normal(size=(12, 50))),
+            Trajectory(self.t, rng.normal(size=(12, 50)), rotor_speeds=rng.normal(size=(4, 50)),
+                       dtype=np.float32, status=1)
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        """
+        Written trajectories are read back as memory-mapped views with
+        their channels, parameters and status.
+        """
+
+        with loaders.TrajectoryWriter(directory=self.directory) as writer:
+            for run_id, trajectory in enumerate(self.trajectories):
+                writer.write_trajectory(
+                    run_id=run_id,
+                    trajectory=trajectory,
+                    parameters={'kf': run_id}
+                )
+
+        reader = loaders.TrajectoryReader(
+            directory=self.directory
+        )
+
+        self.assertEqual(reader.run_ids, ['0', '1'])
+        self.assertIn(1, reader)
+        self.assertEqual(reader.parameters(run_id=1), {'kf': 1})
+
+        data = reader.read(run_id=1)
+        self.assertEqual(data.dtype, np.float32)
+        self.assertTrue(np.shares_memory(data, reader._buffer))
+        np.testing.assert_array_equal(data, self.trajectories[1].data)
+        np.testing.assert_array_equal(reader.read_times(run_id=0), self.t)
+
+        rotor_speeds = reader.read(run_id=1, channel='rotor_speeds', time_slice=slice(10, 20))
+        np.testing.assert_array_equal(rotor_speeds, self.trajectories[1].rotor_speeds[:, 10:20])
+
+        trajectory = reader.read_trajectory(run_id=1)
+        self.assertEqual(trajectory.status, 1)
+        np.testing.assert_array_equal(trajectory.position, self.trajectories[1].position)
+        np.testing.assert_array_equal(trajectory.rotor_speeds, self.trajectories[1].rotor_speeds)
+
+        with self.assertRaises(KeyError):
+            reader.read(run_id=0, channel='rotor_speeds')
+        with self.assertRaises(KeyError):
+            reader.read(run_id=7)
+
+    def test_append(self):
+        """
+        A store opened in append mode keeps its earlier runs.
+        """
+
+        with loaders.TrajectoryWriter(directory=self.directory) as writer:
+            writer.write_trajectory(run_id=0, trajectory=self.trajectories[0])
+
+            with self.assertRaises(ValueError):
+                writer.write_trajectory(run_id=0, trajectory=self.trajectories[0])
+
+        with loaders.TrajectoryWriter(directory=self.directory, mode='a') as writer:
+            writer.write_trajectory(run_id=1, trajectory=self.trajectories[1])
+
+        reader = loaders.TrajectoryReader(
+            directory=self.directory
+        )
+
+        self.assertEqual(len(reader), 2)
+        np.testing.assert_array_equal(reader.read(run_id=0), self.trajectories[0].data)
+        np.testing.assert_array_equal(reader.read(run_id=1), self.trajectories[1].data)
+
+class TestExportSimulationResults(unittest.TestCase):
+    """
+    This class contains the tests for the columnar exports.
+    """
+
+    def setUp(self):
+        try:
+            import pandas
+        except ImportError:
+            self.skipTest('pandas is not installed.')
+
+        self.tmp = tempfile.TemporaryDirectory()
+
+        rng = np.random.default_rng(7)
+        self.t = np.linspace(0, 1, 30)
+        self.results = [
+            (run_id, Trajectory(self.t, rng.normal(size=(12, 30)), rotor_speeds=rng.normal(size=(4, 30))),
+             {'airframe': {'kf': [run_id, 2 * run_id]}, 'integrator': 'rk4_fixed'})
+            for run_id in range(4)
+        ]
+
+    def tearDown(self):
+        if hasattr(self, 'tmp'):
+            self.tmp.cleanup()
+
+    def check_export(self, path, file_format):
+        counts = loaders.export_simulation_results(
+            path=path,
+            results=self.results[:2],
+            mode='w',
+            file_format=file_format
+        )
+        self.assertEqual(counts, {'samples': 60, 'runs': 2})
+
+        loaders.export_simulation_results(
+            path=path,
+            results=self.results[2:]
+        )
+
+        samples = loaders.read_simulation_results(
+            path=path
+        )
+        self.assertEqual(len(samples), 120)
+        self.assertIn('omega_4', samples.columns)
+
+        selected = loaders.read_simulation_results(
+            path=path,
+            run_ids=[3],
+            columns=['run_id', 't', 'z', 'omega_2']
+        )
+        trajectory = self.results[3][1]
+        np.testing.assert_array_equal(selected['t'], self.t)
+        np.testing.assert_array_equal(selected['z'], trajectory.position[2])
+        np.testing.assert_array_equal(selected['omega_2'], trajectory.rotor_speeds[1])
+
+        runs = loaders.read_simulation_results(
+            path=path,
+            table='runs'
+        )
+        self.assertEqual(list(runs['run_id']), [0, 1, 2, 3])
+        self.assertEqual(list(runs['airframe.kf[1]']), [0, 2, 4, 6])
+        self.assertEqual(runs['integrator'][0], 'rk4_fixed')
+
+        # Writing again replaces the export
+        loaders.export_simulation_results(
+            path=path,
+            results=self.results[:1],
+            mode='w'
+        )
+        self.assertEqual(len(loaders.read_simulation_results(path=path, table='runs')), 1)
+
+    def test_parquet(self):
+        """
+        Parquet exports append part files and read back as one table.
+        """
+
+        try:
+            import pyarrow
+        except ImportError:
+            self.skipTest('pyarrow is not installed.')
+
+        self.check_export(
+            path=os.path.join(self.tmp.name, 'campaign.parquet'),
+            file_format='parquet'
+        )
+
+    def test_hdf5(self):
+        """
+        HDF5 exports append to tables in a single file.
+        """
+
+        try:
+            import tables
+        except ImportError:
+            self.skipTest('PyTables is not installed.')
+
+        self.check_export(
+            path=os.path.join(self.tmp.name, 'campaign.h5'),
+            file_format='hdf5'
+        )
+
+class TestLoadCsv(unittest.TestCase):
+    """
+    This class contains the tests for the numeric CSV loader.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data = np.column_stack((np.arange(25) * 0.01, np.arange(25) ** 2, -np.arange(25) * 0.5))
+
+        self.path = os.path.join(self.tmp.name, 'telemetry.csv')
+        np.savetxt(self.path, self.data, delimiter=',', header='t, rpm, z', comments='')
+
+        self.plain_path = os.path.join(self.tmp.name, 'plain.csv')
+        np.savetxt(self.plain_path, self.data[:, 1:2], delimiter=',', fmt='%d')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_header_and_columns(self):
+        """
+        The header is detected and columns are selected by name or index.
+        """
+
+        self.assertEqual(loaders.read_csv_header(path=self.path), ['t', 'rpm', 'z'])
+        self.assertEqual(loaders.read_csv_header(path=self.plain_path), [])
+
+        data = loaders.load_csv(path=self.path)
+        self.assertEqual(data.dtype, np.float64)
+        np.testing.assert_allclose(data, self.data)
+
+        selected = loaders.load_csv(path=self.path, usecols=['z', 0])
+        np.testing.assert_allclose(selected, self.data[:, [2, 0]])
+
+        with self.assertRaises(ValueError):
+            loaders.load_csv(path=self.path, usecols=['altitude'])
+
+    def test_dtype(self):
+        """
+        Integer files are inferred as integers unless a dtype is given.
+        """
+
+        data = loaders.load_csv(path=self.plain_path)
+        self.assertEqual(data.dtype, np.int64)
+        np.testing.assert_array_equal(data[:, 0], np.arange(25) ** 2)
+
+        self.assertEqual(loaders.load_csv(path=self.plain_path, dtype=np.float32).dtype, np.float32)
+
+    def test_chunks(self):
+        """
+        Chunked reading yields bounded chunks that add up to the file.
+        """
+
+        chunks = list(loaders.iter_csv_chunks(path=self.path, chunk_rows=10, usecols=['rpm']))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        np.testing.assert_allclose(np.concatenate(chunks)[:, 0], self.data[:, 1])
+        np.testing.assert_allclose(loaders.load_csv(path=self.path, chunk_rows=7), self.data)
+
+    def test_chunks_blank_lines(self):
+        """
+        A chunk holding only blank lines, such as a trailing one, is skipped.
+        """
+
+        path = os.path.join(self.tmp.name, 'trailing.csv')
+        with open(path, 'w', encoding='utf-8') as csvfile:
+            csvfile.write('t,z\n0.0,1.0\n0.1,0.5\n\n')
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            chunks = list(loaders.iter_csv_chunks(path=path, chunk_rows=1))
+            data = loaders.load_csv(path=path, chunk_rows=1)
+
+        self.assertEqual([chunk.shape for chunk in chunks], [(1, 2), (1, 2)])
+        np.testing.assert_allclose(data, [[0.0, 1.0], [0.1, 0.5]])
+
+    def test_flight_log(self):
+        """
+        A flight log is read by column name, whatever the column order.
+        """
+
+        labels = ['x', 'y', 'z', 'vx', 'vy', 'vz', 'phi', 'theta', 'psi', 'p', 'q', 'r',
+                  'omega_1', 'omega_2', 'omega_3', 'omega_4']
+        values = np.arange(5 * 16, dtype=float).reshape(5, 16)
+
+        path = os.path.join(self.tmp.name, 'flight.csv')
+        np.savetxt(path, np.column_stack((values, np.arange(5) * 0.1)), delimiter=',',
+                   header=','.join(labels + ['t']), comments='')
+
+        flight, = loaders.load_flight_logs(path=path)
+
+        np.testing.assert_allclose(flight.t, np.arange(5) * 0.1)
+        np.testing.assert_array_equal(flight.y, values[:, :12].T)
+        np.testing.assert_array_equal(flight.rotor_speeds, values[:, 12:].T)
+
+class TestBufferedLog(unittest.TestCase):
+    """
+    This class contains the tests for the buffered log writer.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.tmp.name, 'run.log')
+        loaders.create_log_file(
+            start_time='start',
+            log_file_path=self.log_path
+        )
+
+    def tearDown(self):
+        loaders.close_all_logs()
+        self.tmp.cleanup()
+
+    def read_log(self):
+        with open(self.log_path, encoding='utf-8') as log_file:
+            return log_file.read()
+
+    def test_buffered_entries(self):
+        """
+        Entries are held in memory until the buffer fills or the log is
+        closed, and the file content matches unbuffered logging.
+        """
+
+        writer = loaders.open_log(
+            log_file_path=self.log_path,
+            flush_interval=3600.0,
+            max_entries=3
+        )
+        self.assertIs(loaders.open_log(log_file_path=self.log_path), writer)
+
+        for i in range(4):
+            loaders.add_entry_to_log(
+                log_file_path=self.log_path,
+                entry=f'entry {i}'
+            )
+
+        self.assertEqual(self.read_log(), 'start: Log file created.\n\nentry 0\nentry 1\nentry 2')
+
+        loaders.close_log(
+            log_file_path=self.log_path
+        )
+        self.assertTrue(self.read_log().endswith('entry 2\nentry 3'))
+
+        # Without a writer entries go straight to the file again
+        loaders.add_entry_to_log(
+            log_file_path=self.log_path,
+            entry='entry 4'
+        )
+        self.assertTrue(self.read_log().endswith('entry 3\nentry 4'))
+
+    def test_background_flush(self):
+        """
+        The background thread flushes pending entries periodically.
+        """
+
+        loaders.open_log(
+            log_file_path=self.log_path,
+            flush_interval=0.05,
+            background=True
+        )
+
+        loaders.add_entry_to_log(
+            log_file_path=self.log_path,
+            entry='entry'
+        )
+
+        deadline = time.monotonic() + 5.0
+        while not self.read_log().endswith('entry') and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertTrue(self.read_log().endswith('\nentry'))
+
+        # Recreating the log file closes its writer
+        loaders.create_log_file(
+            start_time='restart',
+            log_file_path=self.log_path
+        )
+        self.assertEqual(self.read_log(), 'restart: Log file created.\n')
+
+class TestConfigResolver(unittest.TestCase):
+    """
+    This class contains the tests for the cached, lazy configuration
+    resolver.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = {
+            name: os.path.join(self.tmp.name, f'{name}.json')
+            for name in ('config', 'airframe', 'initial_state', 'setpoint', 'simulation')
+        }
+
+        loaders.write_json(path=self.paths['airframe'], data={'m': 0.5, 'kf': [1e-5, 1e-5, 1e-5, 1e-5]})
+        loaders.write_json(path=self.paths['initial_state'], data={'initial_state': {'x0': [0.0, 0.0, 1.0]}})
+        loaders.write_json(path=self.paths['setpoint'], data={'setpoint': [0.0, 0.0, 1.0]})
+        loaders.write_json(path=self.paths['simulation'], data={
+            'workflow': 'simulation',
+            'airframe': {'path': self.paths['airframe']}
+        })
+        loaders.write_json(path=self.paths['config'], data={
+            'workflow': 'estimation',
+            'airframe': {'path': self.paths['airframe']},
+            'initial_state': {'path': self.paths['initial_state']},
+            'controller': {'setpoint': {'path': self.paths['setpoint']}},
+            'simulation_config_path': self.paths['simulation']
+        })
+
+        self.resolver = loaders.ConfigResolver()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lazy_resolution(self):
+        """
+        Referenced files are only read on first access, including nested
+        and recursive references.
+        """
+
+        config = self.resolver.resolve(
+            config_path=self.paths['config']
+        )
+        self.assertEqual(self.resolver.misses, 1)
+        self.assertIn('simulation_config', config)
+
+        self.assertEqual(config['initial_state'], {'x0': [0.0, 0.0, 1.0]})
+        self.assertEqual(config['controller']['setpoint'], [0.0, 0.0, 1.0])
+        self.assertEqual(self.resolver.misses, 3)
+
+        self.assertEqual(config['simulation_config']['airframe']['m'], 0.5)
+        self.assertEqual(config.get('airframe')['kf'], [1e-5, 1e-5, 1e-5, 1e-5])
+        self.assertEqual(self.resolver.misses, 5)
+        self.assertIsNone(config.get('experimental_data'))
+
+        # Changes to the resolved config leave the cached files untouched
+        config['controller']['setpoint'] = []
+        config['airframe']['m'] = 1.0
+        config['airframe']['kf'].append(2e-5)
+        config['simulation_config']['airframe']['kf'][0] = 0.0
+        self.assertEqual(len(config['airframe']['kf']), 5)
+
+        again = self.resolver.resolve(
+            config_path=self.paths['config']
+        )
+        self.assertEqual(again['controller']['setpoint'], [0.0, 0.0, 1.0])
+        self.assertEqual(again['airframe'], {'m': 0.5, 'kf': [1e-5, 1e-5, 1e-5, 1e-5]})
+        self.assertEqual(self.resolver.misses, 5)
+
+        self.assertEqual(again.to_dict()['simulation_config']['airframe']['kf'], [1e-5, 1e-5, 1e-5, 1e-5])
+
+    def test_views(self):
+        """
+        Keys, length and iteration list the references before they are
+        read, and items, dict() and copies read them.
+        """
+
+        config = self.resolver.resolve(
+            config_path=self.paths['simulation']
+        )
+        self.assertEqual(set(config.keys()), {'workflow', 'airframe'})
+        self.assertEqual(len(config), 2)
+        self.assertEqual(sorted(config), ['airframe', 'workflow'])
+        self.assertEqual(self.resolver.misses, 1)
+
+        plain = dict(config)
+        self.assertEqual(plain['airframe'], {'m': 0.5, 'kf': [1e-5, 1e-5, 1e-5, 1e-5]})
+        self.assertEqual(dict(config.items()), plain)
+        self.assertEqual(self.resolver.misses, 2)
+
+        copied = copy.deepcopy(config)
+        self.assertIs(type(copied), dict)
+        self.assertEqual(copied, config)
+
+        self.assertEqual(config.pop('airframe')['m'], 0.5)
+        self.assertEqual(list(config), ['workflow'])
+
+    def test_cache_invalidation(self):
+        """
+        A file is parsed again once it changes on disk.
+        """
+
+        self.assertEqual(self.resolver.load(path=self.paths['airframe'])['m'], 0.5)
+        self.resolver.load(path=self.paths['airframe'])
+        self.assertEqual((self.resolver.hits, self.resolver.misses), (1, 1))
+
+        loaders.write_json(path=self.paths['airframe'], data={'m': 0.6})
+        stat = os.stat(self.paths['airframe'])
+        os.utime(self.paths['airframe'], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        self.assertEqual(self.resolver.load(path=self.paths['airframe']), {'m': 0.6})
+        self.assertEqual(self.resolver.misses, 2)
+
+    def test_snapshot(self):
+        """
+        A pickled snapshot serves its files without reading them again.
+        """
+
+        self.resolver.resolve(config_path=self.paths['config']).to_dict()
+        snapshot = pickle.loads(pickle.dumps(self.resolver.snapshot()))
+
+        os.remove(self.paths['setpoint'])
+        resolver = loaders.ConfigResolver.from_snapshot(
+            snapshot=snapshot
+        )
+        config = resolver.resolve(
+            config_path=self.paths['config']
+        )
+
+        self.assertEqual(config['controller']['setpoint'], [0.0, 0.0, 1.0])
+        self.assertEqual(config['simulation_config']['airframe']['m'], 0.5)
+        self.assertEqual(resolver.misses, 0)
+
+    def test_load_data(self):
+        """
+        Estimation configs load their simulation config recursively through
+        the resolver, and the experimental data is read on first access.
+        """
+
+        sim_config = loaders.load_json(
+            path=os.path.join(os.path.dirname(__file__), '..', '..', 'configs', 'simulation', 'config_simulation.json')
+        )
+        sim_config['output_directory'] = self.tmp.name
+        loaders.write_json(path=self.paths['simulation'], data=sim_config)
+
+        data_path = os.path.join(self.tmp.name, 'flight.json')
+        loaders.write_json(path=data_path, data={'t': [0.0, 0.1]})
+        loaders.write_json(path=self.paths['config'], data={
+            'workflow': 'estimation',
+            'output_directory': self.tmp.name,
+            'simulation_config_path': self.paths['simulation'],
+            'experimental_data_path': data_path,
+            'estimation': {'flight_logs': [os.path.join(self.tmp.name, 'trajectories')]}
+        })
+
+        previous = loaders.get_config_resolver().snapshot()
+        loaders.install_config_snapshot(snapshot={})
+        try:
+            config = loaders.load_data(config_path=self.paths['config'])
+            resolver = loaders.get_config_resolver()
+
+            self.assertIsInstance(config, loaders.LazyConfig)
+            self.assertIsInstance(config['simulation_config'], loaders.LazyConfig)
+            self.assertIsNone(config['historical_parameter_set'])
+            self.assertNotIn('simulation_config_path', config)
+            self.assertNotIn('experimental_data_path', config)
+            self.assertEqual(resolver.misses, 2)
+
+            self.assertEqual(config['experimental_data'], {'t': [0.0, 0.1]})
+            self.assertEqual(resolver.misses, 3)
+
+        finally:
+            loaders.install_config_snapshot(snapshot=previous)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
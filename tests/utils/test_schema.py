@@ -0,0 +1,198 @@
+import dataclasses
+import inspect
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from drone.studies.design.study import PIDController
+from drone.studies.simulation.study import (
+    NonSymmetricQuadrotor,
+    attitude_singularity_event,
+    build_quadrotor,
+    divergence_event,
+    ground_contact_event,
+    setpoint_reached_event
+)
+from drone.utils import loaders
+from drone.utils import schema
+
+CONFIG_PATH = Path(__file__).resolve().parents[2] / 'configs' / 'simulation' / 'config_simulation.json'
+
+class TestSchema(unittest.TestCase):
+    """
+    This class contains the tests for the quadrotor configuration schema.
+    """
+
+    def setUp(self):
+        self.config = loaders.load_json(
+            path=CONFIG_PATH
+        )
+
+    def assertConfigError(self, path):
+        with self.assertRaises(schema.ConfigError) as context:
+            schema.QuadrotorConfig.from_config(
+                config=self.config
+            )
+
+        self.assertTrue(str(context.exception).startswith(path), str(context.exception))
+
+    def test_valid_config(self):
+        """
+        The shipped simulation config validates into typed, frozen and
+        slotted settings.
+        """
+
+        settings = schema.QuadrotorConfig.from_config(
+            config=self.config
+        )
+
+        self.assertEqual(settings.airframe.kf.shape, (4,))
+        self.assertEqual(settings.simulation.integrator.name, 'rk4_fixed')
+        self.assertEqual(settings.simulation.t_eval.shape, (500,))
+        self.assertEqual(dict(settings.simulation.events)['attitude_singularity'], {'margin': 0.1})
+        self.assertIsNone(settings.controller.rate_hz)
+        self.assertTrue(settings.outputs.record_inputs)
+
+        self.assertFalse(hasattr(settings.airframe, '__dict__'))
+        self.assertFalse(settings.airframe.kf.flags.writeable)
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            settings.simulation.n_eval = 10
+
+    def test_errors_name_the_entry(self):
+        """
+        Invalid entries fail with the dotted path of the entry.
+        """
+
+        self.config['airframe']['kf'] = [3e-6] * 3
+        self.assertConfigError('airframe.kf:')
+
+        self.setUp()
+        self.config['airframe']['masses_positions'][1] = [0.1, [0.15, 0.0]]
+        self.assertConfigError('airframe.masses_positions[1]:')
+
+        self.setUp()
+        self.config['simulation']['dt'] = None
+        self.assertConfigError('simulation.dt:')
+
+        self.setUp()
+        self.config['simulation']['events']['tumble'] = {}
+        self.assertConfigError('simulation.events:')
+
+        self.setUp()
+        self.config['simulation']['method'] = 'RK4'
+        self.assertConfigError('simulation.method:')
+
+        self.setUp()
+        self.config['controller']['kp_angle'] = [1.0, 1.0, 1.0]
+        self.assertConfigError('controller:')
+
+        self.setUp()
+        self.config['outputs']['dtype'] = 'float16'
+        self.assertConfigError('outputs.dtype:')
+
+        self.setUp()
+        del self.config['simulation']['t_span']
+        self.assertConfigError('simulation.t_span:')
+
+    def test_event_options(self):
+        """
+        Event options are checked against the keyword arguments of the
+        event factories, so the events of a valid config can be built.
+        """
+
+        self.config['simulation']['events'] = {'divergence': {'max_postion': 1.0}, 'setpoint_reached': {}}
+        self.assertConfigError('simulation.events.divergence:')
+
+        self.config['simulation']['events'] = {'setpoint_reached': {}}
+        self.assertConfigError('simulation.events.setpoint_reached.setpoint:')
+
+        self.config['simulation']['events'] = {'ground_contact': {'terminal': 'yes'}}
+        self.assertConfigError('simulation.events.ground_contact.terminal:')
+
+        self.config['simulation']['events'] = {'divergence': {'max_rate': -1.0}}
+        self.assertConfigError('simulation.events.divergence.max_rate:')
+
+        factories = {
+            'ground_contact': ground_contact_event,
+            'attitude_singularity': attitude_singularity_event,
+            'divergence': divergence_event,
+            'setpoint_reached': setpoint_reached_event
+        }
+        for name, factory in factories.items():
+            self.assertEqual(schema.EVENT_OPTIONS[name], tuple(inspect.signature(factory).parameters), name)
+
+        self.config['simulation']['events'] = {
+            'divergence': {'max_position': 1.0},
+            'setpoint_reached': {'setpoint': [0.0, 0.0, 1.0], 'terminal': False}
+        }
+        settings = schema.QuadrotorConfig.from_config(
+            config=self.config
+        )
+        events = [factories[name](**options) for name, options in settings.simulation.events]
+        self.assertEqual([event.terminal for event in events], [True, False])
+
+    def test_estimation(self):
+        """
+        The estimation section takes defaults for the search and rejects
+        unknown parameters and too small populations.
+        """
+
+        design = loaders.load_json(
+            path=CONFIG_PATH.parents[1] / 'design' / 'config_design.json'
+        )
+        settings = schema.EstimationConfig.from_config(
+            section=design['estimation']
+        )
+        self.assertEqual(settings.parameters, ('kf', 'km', 'Cd', 'I_body'))
+
+        settings = schema.EstimationConfig.from_config(
+            section={'flight_logs': 'flight.csv'}
+        )
+        self.assertEqual(settings.flight_logs, ('flight.csv',))
+        self.assertEqual(settings.parameters, schema.IDENTIFIABLE_PARAMETERS)
+        self.assertIsNone(settings.n_workers)
+
+        for section, path in (
+            ({}, 'estimation.flight_logs:'),
+            ({'flight_logs': 'a.csv', 'parameters': ['mass']}, 'estimation.parameters:'),
+            ({'flight_logs': 'a.csv', 'population_size': 3}, 'estimation.population_size:'),
+            ({'flight_logs': 'a.csv', 'bounds': 0.5}, 'estimation.bounds:')
+        ):
+            with self.assertRaises(schema.ConfigError) as context:
+                schema.EstimationConfig.from_config(
+                    section=section
+                )
+            self.assertTrue(str(context.exception).startswith(path), str(context.exception))
+
+    def test_consumers(self):
+        """
+        The quadrotor and controller are built from the validated settings.
+        """
+
+        settings = schema.QuadrotorConfig.from_config(
+            config=self.config
+        )
+
+        quad = NonSymmetricQuadrotor.from_config(
+            airframe=settings.airframe
+        )
+        reference = build_quadrotor(
+            airframe=self.config['airframe']
+        )
+
+        np.testing.assert_allclose(quad.I, reference.I)
+        np.testing.assert_allclose(quad.torque_mixer, reference.torque_mixer)
+
+        pid = PIDController.from_config(
+            quad=quad,
+            controller=settings.controller
+        )
+        np.testing.assert_allclose(pid.kd_ang, self.config['controller']['kd_ang'])
+
+        # Changing the quadrotor leaves the validated settings untouched
+        quad.kf *= 2
+        self.assertEqual(settings.airframe.kf[0], 3e-6)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
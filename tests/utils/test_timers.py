@@ -0,0 +1,151 @@
+import os
+import tempfile
+import unittest
+import warnings
+
+import numpy as np
+
+from drone.utils import loaders
+from drone.utils import timers
+
+def geometric_mean_rows_loop(data):
+    """
+    Row by row reference for the vectorized implementation.
+    """
+
+    geometric_means = []
+    max_val = -np.inf
+
+    for row in data:
+        row_no_zeros = row[row != 0]
+
+        if row_no_zeros.size > 0:
+            geometric_means.append(np.exp(np.mean(np.log(row_no_zeros))))
+            max_val = max(np.append(row_no_zeros, max_val))
+
+        else:
+            geometric_means.append(np.nan)
+
+    return np.array(geometric_means), max_val
+
+class TestGeometricMean(unittest.TestCase):
+    """
+    This class contains the tests for the geometric mean statistics.
+    """
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.data = rng.uniform(0.1, 10.0, size=(200, 30))
+        self.data[rng.uniform(size=self.data.shape) < 0.3] = 0.0
+        self.data[[3, 50, 199]] = 0.0
+
+    def test_matches_loop(self):
+        """
+        The vectorized implementation matches the row loop, including the
+        NaN of all-zero rows.
+        """
+
+        geometric_means, max_val = timers.geometric_mean_rows(
+            data=self.data
+        )
+        reference, reference_max = geometric_mean_rows_loop(self.data)
+
+        np.testing.assert_allclose(geometric_means, reference)
+        self.assertTrue(np.isnan(geometric_means[[3, 50, 199]]).all())
+        self.assertEqual(max_val, reference_max)
+
+        geometric_means, max_val = timers.geometric_mean_rows(
+            data=np.zeros((2, 3))
+        )
+        self.assertTrue(np.isnan(geometric_means).all())
+        self.assertEqual(max_val, -np.inf)
+
+    def test_streaming_statistics(self):
+        """
+        Streaming the rows in blocks gives the statistics of the whole
+        matrix.
+        """
+
+        geometric_means, max_val = timers.geometric_mean_rows(
+            data=self.data
+        )
+
+        stats = timers.GeometricMeanStatistics()
+        for block in np.array_split(self.data, 7):
+            stats.update(block)
+
+        self.assertEqual(stats.n_rows, 200)
+        self.assertEqual(stats.n_valid, 197)
+        self.assertAlmostEqual(stats.min_geometric_mean, np.nanmin(geometric_means))
+        self.assertAlmostEqual(stats.max_geometric_mean, np.nanmax(geometric_means))
+        self.assertAlmostEqual(stats.mean_geometric_mean, np.nanmean(geometric_means))
+        self.assertEqual(stats.max_val, max_val)
+
+        stats.reset()
+        stats.update(np.zeros(4))
+        self.assertTrue(np.isnan(stats.min_geometric_mean))
+        self.assertTrue(np.isnan(stats.mean_geometric_mean))
+
+class TestEstimationLog(unittest.TestCase):
+    """
+    This class contains the tests for the per-generation estimation log.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.tmp.name, 'estimation.log')
+        self.start_time = timers.start_logging(
+            log_path=self.log_path,
+            purpose='estimating parameters'
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_metrics_records(self):
+        """
+        Every generation appends one machine-readable record next to the
+        text log.
+        """
+
+        population = np.array([[1.0, 4.0], [2.0, 8.0], [0.0, 0.0]])
+
+        start_time = timers.update_parameter_estimation_log_direct_search(
+            start_time=self.start_time,
+            log_path=self.log_path,
+            n_gen=0,
+            solution_set=population,
+            duration=1.5
+        )
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            timers.update_parameter_estimation_log_direct_search(
+                start_time=start_time,
+                log_path=self.log_path,
+                n_gen=1,
+                solution_set=np.zeros((2, 2)),
+                duration=3.0
+            )
+
+        metrics_path = os.path.join(self.tmp.name, 'estimation_metrics.jsonl')
+        self.assertEqual(timers.get_metrics_path(log_path=self.log_path), metrics_path)
+
+        records = loaders.load_metrics(
+            metrics_path=metrics_path
+        )
+
+        self.assertEqual([record['generation'] for record in records], [0, 1])
+        self.assertEqual(records[0]['population_size'], 3)
+        self.assertAlmostEqual(records[0]['min_geometric_mean'], 2.0)
+        self.assertAlmostEqual(records[0]['max_geometric_mean'], 4.0)
+        self.assertEqual(records[0]['max_signal'], 8.0)
+        self.assertEqual(records[1]['overall_time'], 3.0)
+        self.assertIsNone(records[1]['min_geometric_mean'])
+        self.assertIsNone(records[1]['max_signal'])
+
+        with open(self.log_path, encoding='utf-8') as log_file:
+            self.assertIn('Generation number: 1.', log_file.read())
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)